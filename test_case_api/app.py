@@ -10,11 +10,15 @@ Generates detailed system-level integration/black-box test cases using Ollama
 """
 
 
-import requests, os, logging, json
+import requests, os, io, re, logging, json, threading, time, hashlib, sqlite3, tempfile, uuid, codecs, math, random, queue, socket
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Deque, Callable
 from datetime import datetime
 from dotenv import load_dotenv                  # Load environment variables from .env file  
 
@@ -32,264 +36,4445 @@ CORS(app)
 OLLAMA_BASE_URL         = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
 DEFAULT_MODEL           = os.getenv("OLLAMA_MODEL", "llama3:latest")
 OLLAMA_TIMEOUT          = int(os.getenv("OLLAMA_TIMEOUT", "180"))
+OLLAMA_CONNECT_TIMEOUT  = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT     = float(os.getenv("OLLAMA_READ_TIMEOUT", str(OLLAMA_TIMEOUT)))
+OLLAMA_PROBE_TIMEOUT    = float(os.getenv("OLLAMA_PROBE_TIMEOUT", "5"))
+OLLAMA_POOL_SIZE        = max(1, int(os.getenv("OLLAMA_POOL_SIZE", "16")))
+# Additional inference nodes: comma separated "url=weight" list (weight optional);
+# defaults to OLLAMA_BASE_URL alone
+OLLAMA_BACKENDS_SPEC    = os.getenv("OLLAMA_BACKENDS", "") or OLLAMA_BASE_URL
+BACKEND_FAILURE_THRESHOLD = max(1, int(os.getenv("BACKEND_FAILURE_THRESHOLD", "3")))
+BACKEND_EJECT_SECONDS   = float(os.getenv("BACKEND_EJECT_SECONDS", "30"))
+BACKEND_MODELS_TTL      = float(os.getenv("BACKEND_MODELS_TTL", "60"))
+# Retries of transient generation failures (timeouts, connection errors, 5xx, no healthy
+# backend): up to OLLAMA_RETRY_ATTEMPTS with full-jitter exponential backoff. The retry
+# budget allows OLLAMA_RETRY_BUDGET_RATIO retries per call on top of a burst of
+# OLLAMA_RETRY_BUDGET_BURST, so an outage cannot multiply the load on Ollama
+OLLAMA_RETRY_ATTEMPTS   = max(0, int(os.getenv("OLLAMA_RETRY_ATTEMPTS", "5")))
+OLLAMA_RETRY_BACKOFF    = float(os.getenv("OLLAMA_RETRY_BACKOFF", "1"))
+OLLAMA_RETRY_BACKOFF_MAX = float(os.getenv("OLLAMA_RETRY_BACKOFF_MAX", "15"))
+OLLAMA_RETRY_BUDGET_RATIO = float(os.getenv("OLLAMA_RETRY_BUDGET_RATIO", "0.2"))
+OLLAMA_RETRY_BUDGET_BURST = float(os.getenv("OLLAMA_RETRY_BUDGET_BURST", "20"))
+# Hedged generations (needs several backends): a generation still running after the
+# HEDGE_PERCENTILE latency of its model (known once HEDGE_MIN_SAMPLES generations
+# finished) is duplicated on another backend; the first result wins. Hedges are
+# capped at HEDGE_BUDGET_PERCENT of the generations
+HEDGE_ENABLED           = os.getenv("HEDGE_ENABLED", "False").lower() == "true"
+HEDGE_PERCENTILE        = min(99.9, max(1.0, float(os.getenv("HEDGE_PERCENTILE", "90"))))
+HEDGE_BUDGET_PERCENT    = max(0.0, float(os.getenv("HEDGE_BUDGET_PERCENT", "10")))
+HEDGE_MIN_SAMPLES       = max(1, int(os.getenv("HEDGE_MIN_SAMPLES", "20")))
+# Latest generation latencies kept per model for the percentile
+HEDGE_LATENCY_WINDOW    = max(10, int(os.getenv("HEDGE_LATENCY_WINDOW", "200")))
+# Background refresh of backend status served by /health, /models and /
+STATUS_REFRESH_INTERVAL = float(os.getenv("STATUS_REFRESH_INTERVAL", "10"))
 SYSTEM_INSTRUCTION_FILE = Path(__file__).parent / "instructions" / "system_instructions.md"
+# Generation prompt templates per product line (<name>.txt, selected by PRODUCT_LINE)
+PROMPT_TEMPLATES_DIR    = Path(os.getenv("PROMPT_TEMPLATES_DIR", str(Path(__file__).parent / "prompts")))
+PROMPT_TEMPLATE         = os.getenv("PROMPT_TEMPLATE", "default")
+# Seconds between stat() checks of the instructions file for external edits
+INSTRUCTIONS_CHECK_INTERVAL = float(os.getenv("INSTRUCTIONS_CHECK_INTERVAL", "2"))
 MAX_FILE_SIZE_MB        = int(os.getenv("MAX_FILE_SIZE_MB", "10"))
 MAX_FILE_BYTES          = MAX_FILE_SIZE_MB * 1024 * 1024
+
+# Sampling options sent with every generation (OLLAMA_SEED is optional)
+GENERATION_OPTIONS      = {
+    "temperature": float(os.getenv("OLLAMA_TEMPERATURE", "0.7")),
+    "top_k": int(os.getenv("OLLAMA_TOP_K", "40")),
+    "top_p": float(os.getenv("OLLAMA_TOP_P", "0.9")),
+}
+if os.getenv("OLLAMA_SEED", "").strip():
+    GENERATION_OPTIONS["seed"] = int(os.getenv("OLLAMA_SEED"))
+# Fixed context window: Ollama reloads the model (dropping its prompt cache) whenever
+# num_ctx changes between calls, and its default is too small for the prompts we send
+OLLAMA_NUM_CTX          = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+if OLLAMA_NUM_CTX > 0:
+    GENERATION_OPTIONS["num_ctx"] = OLLAMA_NUM_CTX
+# How long Ollama keeps the model loaded after a call: a duration ("30m"),
+# seconds, or -1 to keep it loaded indefinitely
+def parse_keep_alive(spec: str) -> Any:
+    """Ollama keep_alive value: whole seconds as an int, durations ("30m") as is"""
+    spec = spec.strip()
+    return int(spec) if spec.lstrip("-").isdigit() else spec
+
+
+OLLAMA_KEEP_ALIVE       = parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
+# Models preloaded on every backend at startup, and again when a backend comes back,
+# with an empty prompt (comma separated; empty disables). /health/ready reports
+# not ready until the startup warm-up has finished
+WARMUP_MODELS           = [m.strip() for m in os.getenv("WARMUP_MODELS", DEFAULT_MODEL).split(",") if m.strip()]
+WARMUP_KEEP_ALIVE       = parse_keep_alive(os.getenv("WARMUP_KEEP_ALIVE", "24h"))
+# Seconds allowed for loading one model
+WARMUP_TIMEOUT          = float(os.getenv("WARMUP_TIMEOUT", "300"))
+# Models no backend could load are retried with exponential backoff (seconds);
+# the instance stays not ready until each of them is loaded somewhere
+WARMUP_RETRY_BACKOFF    = float(os.getenv("WARMUP_RETRY_BACKOFF", "5"))
+WARMUP_RETRY_BACKOFF_MAX = float(os.getenv("WARMUP_RETRY_BACKOFF_MAX", "300"))
+
+# Result cache: in-memory LRU in front of an on-disk SQLite store
+RESULT_CACHE_ENABLED    = os.getenv("RESULT_CACHE_ENABLED", "True").lower() == "true"
+RESULT_CACHE_FILE       = Path(os.getenv("RESULT_CACHE_FILE", str(Path(__file__).parent / "cache" / "results.sqlite3")))
+RESULT_CACHE_MEMORY_ENTRIES = int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "256"))
+RESULT_CACHE_DISK_ENTRIES   = int(os.getenv("RESULT_CACHE_DISK_ENTRIES", "10000"))
+RESULT_CACHE_TTL_SECONDS    = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
 debug_mode              = os.getenv("DEBUG_MODE", False)
 
+# SSE endpoints relay Ollama tokens as 'delta' events when stream_tokens is requested
+STREAM_TOKENS_DEFAULT   = os.getenv("STREAM_TOKENS_DEFAULT", "False").lower() == "true"
+
+# Seconds between keep-alive comments on idle SSE streams
+SSE_HEARTBEAT_SECONDS   = float(os.getenv("SSE_HEARTBEAT_SECONDS", "5"))
+# Upload limit for /generate/file/stream, which parses incrementally (0 = unlimited)
+MAX_STREAM_FILE_SIZE_MB = int(os.getenv("MAX_STREAM_FILE_SIZE_MB", "0"))
+
+# Asynchronous jobs: SQLite-backed queue drained by background workers
+JOBS_DB_FILE            = Path(os.getenv("JOBS_DB_FILE", str(Path(__file__).parent / "jobs" / "jobs.sqlite3")))
+JOB_WORKERS             = max(1, int(os.getenv("JOB_WORKERS", "1")))
+JOB_POLL_INTERVAL       = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_LEASE_SECONDS       = int(os.getenv("JOB_LEASE_SECONDS", "600"))
+
+# Concurrency: number of generations kept in flight per batch/file request,
+# plus optional per-model caps, e.g. MODEL_CONCURRENCY="llama3:latest=2,mistral:instruct=1"
+GENERATION_WORKERS      = max(1, int(os.getenv("GENERATION_WORKERS", "4")))
+MODEL_CONCURRENCY_SPEC  = os.getenv("MODEL_CONCURRENCY", "")
+
+# In-batch deduplication: requirements whose prompt-relevant fields are identical
+# (ignoring the fields listed here) are generated once per batch
+BATCH_DEDUP_ENABLED     = os.getenv("BATCH_DEDUP_ENABLED", "True").lower() == "true"
+DEDUP_IGNORE_FIELDS     = frozenset(f.strip() for f in os.getenv("DEDUP_IGNORE_FIELDS", "REQUIREMENTS_ID,PARENT_ID").split(",") if f.strip())
+
+# Priority scheduling of Ollama generations: at most GENERATION_SLOTS run at once and
+# waiting calls (and requirements queued for the generation pool) are served
+# interactive > batch > background; every PRIORITY_AGING_SECONDS of waiting promotes
+# a call by one class so bulk work keeps progressing
+GENERATION_SLOTS        = max(1, int(os.getenv("GENERATION_SLOTS", str(GENERATION_WORKERS))))
+PRIORITY_AGING_SECONDS  = float(os.getenv("PRIORITY_AGING_SECONDS", "30"))
+
+# Adaptive concurrency (AIMD) per backend and model, below GENERATION_SLOTS: the limit
+# grows by one per limit's worth of calls while the latency per generated token stays
+# within CONCURRENCY_LATENCY_TOLERANCE x its baseline, and is multiplied by
+# CONCURRENCY_BACKOFF after a slower call, a timeout or a 429/5xx response
+CONCURRENCY_ADAPTIVE    = os.getenv("CONCURRENCY_ADAPTIVE", "True").lower() == "true"
+CONCURRENCY_MIN_LIMIT   = max(1.0, float(os.getenv("CONCURRENCY_MIN_LIMIT", "1")))
+CONCURRENCY_MAX_LIMIT   = max(CONCURRENCY_MIN_LIMIT, float(os.getenv("CONCURRENCY_MAX_LIMIT", "") or GENERATION_SLOTS))
+CONCURRENCY_INITIAL_LIMIT = min(CONCURRENCY_MAX_LIMIT, max(CONCURRENCY_MIN_LIMIT, float(os.getenv("CONCURRENCY_INITIAL_LIMIT", "2"))))
+CONCURRENCY_LATENCY_TOLERANCE = max(1.0, float(os.getenv("CONCURRENCY_LATENCY_TOLERANCE", "1.5")))
+CONCURRENCY_BACKOFF     = min(0.95, max(0.1, float(os.getenv("CONCURRENCY_BACKOFF", "0.7"))))
+
+# Prompt packing: up to PROMPT_PACK_SIZE requirements (grouped by PARENT_ID) share
+# one Ollama call on the batch/file/job paths; 1 disables packing
+PROMPT_PACK_SIZE        = max(1, int(os.getenv("PROMPT_PACK_SIZE", "1")))
+
+# Section repair: generated test cases are checked against the numbered sections of
+# their prompt template; missing or empty sections are generated with a short
+# follow-up prompt and spliced in instead of regenerating the whole test case
+SECTION_REPAIR_ENABLED  = os.getenv("SECTION_REPAIR_ENABLED", "True").lower() == "true"
+
+# Admission control: requests beyond these caps are rejected up front (0 = unlimited).
+# In-flight counts requirements accepted by the synchronous and streaming endpoints
+# that have not completed yet; queued counts requirements waiting in the job queue;
+# larger sets than MAX_REQUIREMENTS_PER_REQUEST must go through /jobs
+MAX_IN_FLIGHT_REQUIREMENTS  = int(os.getenv("MAX_IN_FLIGHT_REQUIREMENTS", "2000"))
+MAX_QUEUED_REQUIREMENTS     = int(os.getenv("MAX_QUEUED_REQUIREMENTS", "20000"))
+MAX_REQUIREMENTS_PER_REQUEST = int(os.getenv("MAX_REQUIREMENTS_PER_REQUEST", "1000"))
+# Retry-After is the excess divided by the throughput of the last window, or the
+# default while nothing completed in that window
+THROUGHPUT_WINDOW_SECONDS   = float(os.getenv("THROUGHPUT_WINDOW_SECONDS", "300"))
+RETRY_AFTER_DEFAULT_SECONDS = int(os.getenv("RETRY_AFTER_DEFAULT_SECONDS", "30"))
+
+# Deadline applied to generation requests without an X-Deadline header (0 = none)
+DEFAULT_DEADLINE_SECONDS    = float(os.getenv("DEFAULT_DEADLINE_SECONDS", "0"))
+
+
+def parse_model_concurrency(spec: str) -> Dict[str, int]:
+    """Parse a 'model=limit,model=limit' string into a dict of per-model limits"""
+    limits = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, _, value = item.rpartition("=")
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            logger.warning(f"Ignoring invalid MODEL_CONCURRENCY entry: {item}")
+    return limits
+
+
+MODEL_CONCURRENCY       = parse_model_concurrency(MODEL_CONCURRENCY_SPEC)
+
+
+def parse_backends(spec: str) -> List[Tuple[str, float]]:
+    """Parse a 'url=weight,url' string into (url, weight) pairs"""
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, weight = item, 1.0
+        if "=" in item:
+            url, _, value = item.rpartition("=")
+            try:
+                weight = max(0.01, float(value))
+            except ValueError:
+                logger.warning(f"Ignoring invalid weight in OLLAMA_BACKENDS entry: {item}")
+                weight = 1.0
+        backends.append((url.strip().rstrip("/"), weight))
+    return backends
+
+
+OLLAMA_BACKENDS         = parse_backends(OLLAMA_BACKENDS_SPEC)
+
 if debug_mode == True:
     print(f"          OLLAMA_BASE_URL: {OLLAMA_BASE_URL}")
     print(f".           DEFAULT_MODEL: {DEFAULT_MODEL}")
     print(f".          OLLAMA_TIMEOUT: {OLLAMA_TIMEOUT}")
+    print(f".  OLLAMA_CONNECT_TIMEOUT: {OLLAMA_CONNECT_TIMEOUT}")
+    print(f".     OLLAMA_READ_TIMEOUT: {OLLAMA_READ_TIMEOUT}")
+    print(f".        OLLAMA_POOL_SIZE: {OLLAMA_POOL_SIZE}")
+    print(f".         OLLAMA_BACKENDS: {OLLAMA_BACKENDS}")
     print(f".        MAX_FILE_SIZE_MB: {MAX_FILE_SIZE_MB}")  
+    print(f".      GENERATION_WORKERS: {GENERATION_WORKERS}")
+    print(f".       MODEL_CONCURRENCY: {MODEL_CONCURRENCY}")
     print(f"  SYSTEM_INSTRUCTION_FILE: {SYSTEM_INSTRUCTION_FILE}")
     print(f"Current Working Directory: {Path.cwd()}")
 
-# Load system instructions from file
-# ==================== Helper Functions ====================
-def load_system_instructions() -> str:
-    """Load system instructions for test case generation"""
-    if SYSTEM_INSTRUCTION_FILE.exists():
+# ==================== Metrics ====================
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metric:
+    """
+    Base of the Prometheus-style metrics rendered by /metrics
+
+    Values are either recorded directly or computed at scrape time by a
+    callback returning {label values tuple: value}.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[Any, ...], Any] = {}
+        metrics_registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                items = list(self.callback().items())
+            except Exception as e:
+                logger.warning(f"Metric {self.name} callback failed: {e}")
+                return []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in items]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][i] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]})
+                     for key, v in self._values.items()]
+        lines = []
+        for key, entry in items:
+            for bound, count in zip(self.buckets, entry["buckets"]):
+                labels = _format_labels(self.labelnames, key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {entry['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {entry['sum']:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {entry['count']}")
+        return lines
+
+
+metrics_registry: List[Metric] = []
+
+HTTP_LATENCY_BUCKETS        = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+GENERATION_LATENCY_BUCKETS  = (0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+PROMPT_EVAL_BUCKETS         = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+http_requests_total         = Counter("testcase_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+http_request_duration       = Histogram("testcase_http_request_duration_seconds", "Time to produce the HTTP response (streaming bodies excluded)", ("route", "method"), HTTP_LATENCY_BUCKETS)
+generations_total           = Counter("testcase_generations_total", "Ollama generations by model and outcome", ("model", "status"))
+generation_duration         = Histogram("testcase_generation_duration_seconds", "Ollama generation latency by model", ("model",), GENERATION_LATENCY_BUCKETS)
+generation_queue_depth      = Gauge("testcase_generation_queue_depth", "Requirements submitted to the generation pool and waiting for a slot")
+scheduler_wait_duration     = Histogram("testcase_scheduler_wait_seconds", "Time generations waited for a slot, by priority class", ("priority",), GENERATION_LATENCY_BUCKETS)
+deduplicated_requirements_total = Counter("testcase_deduplicated_requirements_total", "Requirements answered from an identical requirement of the same batch")
+admission_rejections_total  = Counter("testcase_admission_rejections_total", "Requests rejected by admission control, by reason", ("reason",))
+section_repairs_total       = Counter("testcase_section_repairs_total", "Missing or empty test case sections, by repair outcome", ("section", "outcome"))
+packed_requirements_total   = Counter("testcase_packed_requirements_total", "Requirements sent in packed prompts, by whether their output split cleanly", ("outcome",))
+ollama_retries_total        = Counter("testcase_ollama_retries_total", "Failed Ollama calls by retry decision", ("model", "outcome"))
+ollama_hedges_total         = Counter("testcase_ollama_hedges_total", "Slow generations considered for a hedge, by outcome", ("model", "outcome"))
+ollama_prompt_tokens_total  = Counter("testcase_ollama_prompt_tokens_total", "Prompt tokens evaluated by Ollama (prompt_eval_count)", ("model",))
+ollama_eval_tokens_total    = Counter("testcase_ollama_eval_tokens_total", "Tokens generated by Ollama (eval_count)", ("model",))
+ollama_prompt_eval_seconds_total = Counter("testcase_ollama_prompt_eval_seconds_total", "Time Ollama spent evaluating prompts (prompt_eval_duration)", ("model",))
+ollama_eval_seconds_total   = Counter("testcase_ollama_eval_seconds_total", "Time Ollama spent generating tokens (eval_duration)", ("model",))
+ollama_load_seconds_total   = Counter("testcase_ollama_load_seconds_total", "Time Ollama spent loading models (load_duration)", ("model",))
+ollama_prompt_eval_duration = Histogram("testcase_ollama_prompt_eval_duration_seconds", "Prompt evaluation time per call; low values mean the prompt prefix was reused from the KV cache", ("model",), PROMPT_EVAL_BUCKETS)
+ollama_eval_tokens_per_second = Gauge("testcase_ollama_eval_tokens_per_second", "Generation speed of the latest call", ("model",))
+ollama_prompt_tokens_per_second = Gauge("testcase_ollama_prompt_tokens_per_second", "Prompt evaluation speed of the latest call", ("model",))
+
+
+def record_ollama_stats(model: str, data: Dict[str, Any]) -> None:
+    """Turn the timing fields of a final /api/generate response into metrics"""
+    prompt_tokens = data.get("prompt_eval_count") or 0
+    eval_tokens = data.get("eval_count") or 0
+    # Ollama reports durations in nanoseconds
+    prompt_seconds = (data.get("prompt_eval_duration") or 0) / 1e9
+    eval_seconds = (data.get("eval_duration") or 0) / 1e9
+    load_seconds = (data.get("load_duration") or 0) / 1e9
+
+    ollama_prompt_tokens_total.inc(prompt_tokens, model=model)
+    ollama_eval_tokens_total.inc(eval_tokens, model=model)
+    ollama_prompt_eval_seconds_total.inc(prompt_seconds, model=model)
+    ollama_eval_seconds_total.inc(eval_seconds, model=model)
+    ollama_load_seconds_total.inc(load_seconds, model=model)
+    if "prompt_eval_duration" in data:
+        ollama_prompt_eval_duration.observe(prompt_seconds, model=model)
+    # prompt_eval_count only covers tokens that were not served from the prompt cache
+    logger.info(
+        f"Ollama stats for {model}: prompt_eval_count={prompt_tokens} "
+        f"prompt_eval_duration={prompt_seconds * 1000:.0f}ms eval_count={eval_tokens} "
+        f"eval_duration={eval_seconds:.2f}s load_duration={load_seconds * 1000:.0f}ms"
+    )
+    if eval_seconds > 0:
+        ollama_eval_tokens_per_second.set(eval_tokens / eval_seconds, model=model)
+    if prompt_seconds > 0:
+        ollama_prompt_tokens_per_second.set(prompt_tokens / prompt_seconds, model=model)
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in metrics_registry) + "\n"
+
+
+# ==================== Ollama Transport ====================
+class NoBackendAvailable(Exception):
+    """Raised when no healthy Ollama backend can serve a generation"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        # Seconds until the soonest open circuit is probed again (None when none is open)
+        self.retry_after = retry_after
+
+
+class OllamaError(Exception):
+    """A failed Ollama generation; retryable when repeating the call may succeed"""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class OllamaUnavailable(OllamaError):
+    """A generation refused because every backend that could serve it has its circuit open"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message, retryable=True)
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(seconds: Optional[float]) -> int:
+    """Whole seconds for a Retry-After header (at least 1)"""
+    return max(1, math.ceil(seconds or 0))
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Transient failures: no healthy backend, connection errors, timeouts, 429 and 5xx responses"""
+    if isinstance(error, (NoBackendAvailable, requests.exceptions.ConnectionError,
+                          requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return False
+
+
+class AdaptiveLimit:
+    """
+    AIMD concurrency limit of one model on one backend
+
+    The signal is the latency per generated token (model load time excluded),
+    compared with a baseline that follows the fastest recent calls and drifts
+    up slowly. A success within `tolerance` x baseline while the limit was in
+    use (at least half of it in flight) raises the limit by 1/limit, i.e. by
+    one per limit's worth of calls. A slower success, a timeout or an overload
+    response multiplies it by `backoff`, once per congestion episode: calls
+    that started before the latest decrease cannot decrease it again.
+    """
+
+    BASELINE_DRIFT = 0.02
+
+    def __init__(self, initial: float, minimum: float, maximum: float, tolerance: float, backoff: float):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.baseline: Optional[float] = None
+        self.last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def capacity(self) -> int:
+        return int(self.limit)
+
+    def on_success(self, started: float, seconds_per_token: float, saturated: bool) -> None:
+        if self.baseline is None or seconds_per_token < self.baseline:
+            self.baseline = seconds_per_token
+        else:
+            self.baseline += (seconds_per_token - self.baseline) * self.BASELINE_DRIFT
+        if seconds_per_token > self.baseline * self.tolerance:
+            self.on_overload(started)
+        elif saturated and self.limit < self.maximum:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.increases += 1
+
+    def on_overload(self, started: float) -> None:
+        if started < self.last_decrease:
+            return
+        self.limit = max(self.minimum, self.limit * self.backoff)
+        self.last_decrease = time.monotonic()
+        self.decreases += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "baseline_ms_per_token": round(self.baseline * 1000, 2) if self.baseline is not None else None,
+            "increases_total": self.increases,
+            "decreases_total": self.decreases
+        }
+
+
+class OllamaBackend:
+    """One Ollama server: its pooled session, routing weight and passive health state"""
+
+    def __init__(self, url: str, weight: float, pool_size: int):
+        self.url = url.rstrip("/")
+        self.weight = weight
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Transport counters
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+        # Routing / health state; circuit is "closed", "open" (ejected) or
+        # "half_open" (probe succeeded, one trial generation at a time)
+        self.generations_in_flight = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.circuit = "closed"
+        self.probing = False
+        self.models: Optional[set] = None
+        self.models_checked_at = 0.0
+        # Adaptive concurrency limit per model
+        self.limits: Dict[str, AdaptiveLimit] = {}
+
+    def limit_for(self, model: str) -> AdaptiveLimit:
+        # Called with the transport lock held
+        limit = self.limits.get(model)
+        if limit is None:
+            limit = self.limits[model] = AdaptiveLimit(
+                CONCURRENCY_INITIAL_LIMIT, CONCURRENCY_MIN_LIMIT, CONCURRENCY_MAX_LIMIT,
+                CONCURRENCY_LATENCY_TOLERANCE, CONCURRENCY_BACKOFF
+            )
+        return limit
+
+    def is_healthy(self) -> bool:
+        return self.circuit != "open"
+
+    def open_circuit(self, now: float) -> None:
+        # Called with the transport lock held
+        self.circuit = "open"
+        self.consecutive_failures = max(self.consecutive_failures, BACKEND_FAILURE_THRESHOLD)
+        self.ejected_until = now + BACKEND_EJECT_SECONDS
+
+    def record_failure(self, now: float) -> bool:
+        """
+        Count a failed generation or probe; True when it opened the circuit
+
+        A closed circuit opens after BACKEND_FAILURE_THRESHOLD failures in a
+        row, a half-open one on its first failure. An open circuit whose
+        ejection expired (the re-probe failed) is ejected again.
+        """
+        # Called with the transport lock held
+        self.consecutive_failures += 1
+        if self.circuit == "open":
+            if now >= self.ejected_until:
+                self.open_circuit(now)
+            return False
+        if self.circuit == "half_open" or self.consecutive_failures >= BACKEND_FAILURE_THRESHOLD:
+            self.open_circuit(now)
+            return True
+        return False
+
+
+class OllamaTransport:
+    """
+    Pooled keep-alive HTTP transport shared by every Ollama call
+
+    Holds one requests.Session per backend with an HTTPAdapter connection pool,
+    so TCP connections are reused across requirements, probes and threads.
+    Requests beyond the pool size block until a connection is released; the
+    in-flight counters make that saturation visible through /stats.
+
+    Generations are routed with route(): the healthy backend that has the model
+    and the fewest in-flight generations relative to its weight wins. Each
+    backend has a circuit breaker: BACKEND_FAILURE_THRESHOLD failures in a row
+    open it, failing generations fast for BACKEND_EJECT_SECONDS. The backend
+    is then probed; a successful probe half-opens the circuit and lets a
+    single trial generation through, whose outcome closes or re-opens it.
+    """
+
+    def __init__(self, backends: List[Tuple[str, float]], pool_size: int, connect_timeout: float, read_timeout: float):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._lock = threading.Lock()
+        self.backends: Dict[str, OllamaBackend] = {}
+        for url, weight in backends:
+            self.add_backend(url, weight)
+        self.default_backend = next(iter(self.backends))
+
+    def add_backend(self, base_url: str, weight: float = 1.0) -> None:
+        """Create the pooled session for a backend (no-op if it already exists)"""
+        base_url = base_url.rstrip("/")
+        with self._lock:
+            if base_url not in self.backends:
+                self.backends[base_url] = OllamaBackend(base_url, weight, self.pool_size)
+
+    def request(self, method: str, path: str, base_url: str = None, timeout: Any = None, **kwargs) -> requests.Response:
+        """Send a request to a backend through its pooled session"""
+        base_url = (base_url or self.default_backend).rstrip("/")
+        if base_url not in self.backends:
+            self.add_backend(base_url)
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        elif not isinstance(timeout, tuple):
+            timeout = (min(self.connect_timeout, timeout), timeout)
+
+        backend = self.backends[base_url]
+        with self._lock:
+            backend.in_flight += 1
+            backend.requests_total += 1
+            backend.peak_in_flight = max(backend.peak_in_flight, backend.in_flight)
         try:
-            with open(SYSTEM_INSTRUCTION_FILE, 'r', encoding='utf-8') as f:
-                return f.read()
+            return backend.session.request(method, f"{base_url}{path}", timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                backend.errors_total += 1
+            raise
+        finally:
+            with self._lock:
+                backend.in_flight -= 1
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    # ---------- routing ----------
+    def probe(self, backend: OllamaBackend) -> bool:
+        """Fetch /api/tags from a backend, refreshing its model list and health"""
+        try:
+            response = self.get("/api/tags", base_url=backend.url, timeout=OLLAMA_PROBE_TIMEOUT)
+            response.raise_for_status()
+            models = {model['name'] for model in response.json().get('models', [])}
         except Exception as e:
-            logger.warning(f"Failed to load system instructions: {e}")
-    
-    # Default instructions if file not found
-    return """You are an expert QA engineer specializing in system-level integration and black-box testing.
-Your task is to generate comprehensive, detailed test cases based on requirements.
+            with self._lock:
+                # Counts toward the failure threshold like a failed generation
+                backend.probing = False
+                trial = backend.circuit == "half_open"
+                opened = backend.record_failure(time.time())
+                failures = backend.consecutive_failures
+            logger.warning(f"Ollama backend {backend.url} probe failed: {e}")
+            if opened:
+                self._log_circuit_opened(backend, trial, failures)
+            return False
 
-Guidelines:
-- Focus on system-level integration testing (black-box approach)
-- Each test case should be independent and executable
-- Include clear preconditions, steps, and expected results
-- Test both normal operation and edge cases
-- Use clear, unambiguous language
-- Include data values and specific parameters
-- Consider boundary conditions and error scenarios
-- Test case should verify the requirement is met from end-user perspective"""
+        with self._lock:
+            was_open = backend.circuit == "open"
+            backend.models = models
+            backend.models_checked_at = time.time()
+            backend.probing = False
+            if was_open:
+                backend.circuit = "half_open"
+                backend.ejected_until = 0.0
+        if was_open:
+            logger.info(f"Ollama backend {backend.url} answers probes again; circuit half-open for a trial generation")
+        return True
 
-#SYSTEM prompt from the instruction file
-def build_system_prompt() -> str:
-    """Build the system prompt for Ollama"""
-    return load_system_instructions()
+    @staticmethod
+    def _log_circuit_opened(backend: OllamaBackend, trial: bool, failures: int) -> None:
+        logger.warning(
+            f"Opening circuit of Ollama backend {backend.url} for {BACKEND_EJECT_SECONDS}s "
+            + ("after a failed half-open trial" if trial else f"after {failures} consecutive failures")
+        )
 
-    ### #generic prompt to generate test cases from requirement
-    ### #this is including the actual requirement details [DESCRIPTION, CATEGORY, etc]
-    ### def build_generation_prompt(requirement: Dict[str, Any]) -> str:
-    ###     """Build the prompt for test case generation from a requirement"""
-    ###     
-    ###     prompt = """Based on the following requirement specification, generate a detailed system-level integration test case (black-box testing approach).
-    ### 
-    ### REQUIREMENT DETAILS:
-    ### """
-    ###     
-    ###     # Add all requirement fields to the prompt
-    ###     for key, value in requirement.items():
-    ###         if key != "Test_Case" and value:
-    ###             prompt += f"\n{key}: {value}"
-    ###     
-    ###         if debug_mode:
-    ###             print(f". Added to prompt: {key}: {value}")
-    ###             print(f"Current prompt state:\n{prompt}")   
-    ### 
-    ###     prompt += """
-    ### 
-    ### Please generate a comprehensive test case that includes:
-    ### 1. Test Case Title: A clear, concise title
-    ### 2. Objective: What this test case verifies
-    ### 3. Preconditions: Any setup required before test execution
-    ### 4. Test Steps: Detailed numbered steps with actions and expected results
-    ### 5. Expected Result: The final expected state/output
-    ### 6. Postconditions: Any cleanup or state verification after test
-    ### 7. Test Data: Specific values, ranges, or parameters used
-    ### 8. Edge Cases: Any edge cases or boundary conditions tested
-    ### 
-    ### Format the response as a clear, structured text that describes the test case in detail.
-    ### Do NOT use markdown formatting or code blocks.
-    ### Do NOT include any explanation or preamble - just the test case content."""
-    ###
-    ###    return prompt
+    def _probe_async(self, backend: OllamaBackend) -> None:
+        # Called with self._lock held
+        if backend.probing:
+            return
+        backend.probing = True
+        threading.Thread(target=self.probe, args=(backend,), name="backend-probe", daemon=True).start()
 
+    def _select(self, model: str, exclude: Tuple[str, ...] = ()) -> OllamaBackend:
+        # Called with self._lock held
+        now = time.time()
+        healthy = []
+        reopens = []
+        for backend in self.backends.values():
+            if backend.url in exclude:
+                continue
+            if backend.circuit == "open":
+                if now >= backend.ejected_until:
+                    # Ejection expired: re-probe before routing traffic to it again
+                    self._probe_async(backend)
+                reopens.append(max(0.0, backend.ejected_until - now))
+                continue
+            if backend.circuit == "half_open" and backend.generations_in_flight > 0:
+                # Only one trial generation while half-open
+                continue
+            if backend.is_healthy():
+                if backend.models is None or now - backend.models_checked_at > BACKEND_MODELS_TTL:
+                    self._probe_async(backend)
+                healthy.append(backend)
 
-def build_generation_prompt(requirement: Dict[str, Any]) -> str:
-    """Build the prompt for test case generation from a requirement (SolaHD DC UPS B Series context)"""
+        if not healthy:
+            raise NoBackendAvailable("No healthy Ollama backend available", min(reopens) if reopens else None)
 
-    prompt = """Based on the following requirement specification, generate a detailed system-level integration test case (black-box testing approach).
+        # Prefer backends known to have the model; unknown model lists count as candidates
+        candidates = [b for b in healthy if b.models is None or model in b.models] or healthy
+        if CONCURRENCY_ADAPTIVE:
+            # Backends below their adaptive limit first (the scheduler keeps the total within the limits)
+            candidates = [b for b in candidates if b.limit_for(model).in_flight < b.limit_for(model).capacity] or candidates
+        return min(candidates, key=lambda b: (b.generations_in_flight + 1) / b.weight)
 
-PRODUCT CONTEXT:
-- SolaHD SDU DC UPS “B” Series (Models: SDU1024B-EIP, SDU2024B-EIP, SDU1024B-MBUS, SDU2024B-MBUS)
-- Output: 24V DC, 10A or 20A (model dependent)
-- Communications: EtherNet/IP, Modbus, GUI/webserver; telemetry includes input/output voltage/current, battery voltage, SoC, SoH, temperature, event logs, alarms; remote ON/OFF; LED indicators; PC safe shutdown/restart
-- Battery Management: VRLA and LiFePO4 (auto-detect/user-select), hot-swappable, external battery modules; charging stops at 28V; auto-recharge; dead battery detection (<10V); auto/manual self-test
-- Protections & Thresholds: Input undervoltage (<21.6V for 10ms), input overvoltage (>29V for 10ms), battery undervoltage (<21.6V for 100ms), battery overvoltage (>28.4V for 500ms), battery dead (<10V for 100ms), output overcurrent (>150% rated for 5ms), PowerBoost (140% rated for 6s), overtemperature (shutdown/auto-recovery)
-- Environmental: –15°C to +50°C (ordinary), –15°C to +40°C (hazardous), 0–95% RH, altitude ≤3000m
-- QA Alignment: Requirement-driven, traceable black-box validation per SQAV; entry/exit criteria, defect management, traceability
-REQUIREMENT DETAILS:
-"""
+    def capacity(self, model: str) -> Optional[int]:
+        """
+        Concurrent generations of a model the backends currently accept (sum of their adaptive limits)
+
+        None means unlimited: adaptive concurrency is off, or no backend is
+        healthy and calls may as well go ahead and fail fast.
+        """
+        if not CONCURRENCY_ADAPTIVE:
+            return None
+        with self._lock:
+            healthy = [b for b in self.backends.values() if b.is_healthy()]
+            candidates = [b for b in healthy if b.models is None or model in b.models] or healthy
+            if not candidates:
+                return None
+            # A half-open backend takes a single trial generation
+            return sum(1 if b.circuit == "half_open" else b.limit_for(model).capacity for b in candidates)
 
-    # Add all requirement fields to the prompt
-    for key, value in requirement.items():
-        if key != "Test_Case" and value:
-            prompt += f"\n{key}: {value}"
+    @contextmanager
+    def route(self, model: str, exclude: Tuple[str, ...] = (), usage: Optional[Dict[str, Any]] = None) -> Iterator[OllamaBackend]:
+        """
+        Pick a backend for one generation (other than the excluded URLs) and track its outcome
 
-        # Optional debug output (if you use debug_mode)
-        if 'debug_mode' in globals() and debug_mode:
-            print(f". Added to prompt: {key}: {value}")
-            print(f"Current prompt state:\n{prompt}")
+        Connection errors, timeouts and 5xx responses count as backend failures;
+        any other outcome resets the backend's failure counter. The caller puts
+        the final Ollama response into usage; its token counts feed the
+        adaptive limit of the model on the backend, which timeouts and 429/5xx
+        responses decrease.
+        """
+        with self._lock:
+            backend = self._select(model, exclude)
+            backend.generations_in_flight += 1
+            limit = backend.limit_for(model)
+            limit.in_flight += 1
+            saturated = limit.in_flight * 2 >= limit.limit
+        started = time.monotonic()
+        outcome = "success"
+        overloaded = False
+        try:
+            yield backend
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            outcome = "failure"
+            overloaded = isinstance(e, requests.exceptions.Timeout)
+            raise
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 0
+            outcome = "failure" if status >= 500 else "error"
+            overloaded = status >= 500 or status == 429
+            raise
+        except BaseException:
+            # Includes a streaming consumer going away; says nothing about the backend
+            outcome = "error"
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                backend.generations_in_flight -= 1
+                limit.in_flight -= 1
+                if CONCURRENCY_ADAPTIVE:
+                    if overloaded:
+                        limit.on_overload(started)
+                    elif outcome == "success" and usage and usage.get("eval_count"):
+                        load_seconds = (usage.get("load_duration") or 0) / 1e9
+                        limit.on_success(started, max(0.0, elapsed - load_seconds) / usage["eval_count"], saturated)
+                if outcome == "failure":
+                    trial = backend.circuit == "half_open"
+                    if backend.record_failure(time.time()):
+                        self._log_circuit_opened(backend, trial, backend.consecutive_failures)
+                elif outcome == "success":
+                    backend.consecutive_failures = 0
+                    if backend.circuit == "half_open":
+                        backend.circuit = "closed"
+                        logger.info(f"Ollama backend {backend.url} recovered; circuit closed")
 
-    prompt += """
+    def can_route(self, model: str, exclude: Tuple[str, ...] = ()) -> bool:
+        """Whether route() would currently find a backend other than the excluded ones"""
+        return self.unavailable_for(model, exclude) is None
+
+    def unavailable_for(self, model: str, exclude: Tuple[str, ...] = ()) -> Optional[float]:
+        """None when route() would find a backend now, else the seconds until the soonest circuit reopens"""
+        with self._lock:
+            try:
+                self._select(model, exclude)
+            except NoBackendAvailable as e:
+                return e.retry_after or 0.0
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage and routing state per backend"""
+        backends = {}
+        with self._lock:
+            for base_url, backend in self.backends.items():
+                open_connections = 0
+                idle_connections = 0
+                pools = backend.session.get_adapter(base_url).poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    open_connections += pool.num_connections
+                    if pool.pool is not None:
+                        # Unused slots are stored as None placeholders
+                        idle_connections += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                backends[base_url] = {
+                    "in_flight": backend.in_flight,
+                    "peak_in_flight": backend.peak_in_flight,
+                    "requests_total": backend.requests_total,
+                    "errors_total": backend.errors_total,
+                    "pool_size": self.pool_size,
+                    "waiting_for_connection": max(0, backend.in_flight - self.pool_size),
+                    "saturation": round(min(backend.in_flight, self.pool_size) / self.pool_size, 3),
+                    "connections_opened": open_connections,
+                    "idle_connections": idle_connections,
+                    "weight": backend.weight,
+                    "healthy": backend.is_healthy(),
+                    "circuit": backend.circuit,
+                    "generations_in_flight": backend.generations_in_flight,
+                    "consecutive_failures": backend.consecutive_failures,
+                    "models": sorted(backend.models) if backend.models is not None else None,
+                    "concurrency": {model: limit.stats() for model, limit in backend.limits.items()},
+                }
+        return {
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "backends": backends,
+        }
+
+
+ollama_transport = OllamaTransport(OLLAMA_BACKENDS, OLLAMA_POOL_SIZE, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)
+
+
+# ==================== Model Warm-up ====================
+class ModelWarmup:
+    """
+    Preloads models on the backends so no request pays the model load time
+
+    Sends an empty prompt per model and backend, which makes Ollama load the
+    model (with the same options as generations, so it is not reloaded for a
+    different num_ctx) and keep it for `keep_alive`. The instance is not
+    ready while the startup warm-up, or the warm-up of a backend that came
+    back, is running, nor while a model is not loaded on any backend; those
+    models are retried with exponential backoff from `retry_backoff` up to
+    `retry_backoff_max` seconds.
+    """
+
+    def __init__(self, transport: OllamaTransport, models: List[str], keep_alive: Any, timeout: float,
+                 retry_backoff: float, retry_backoff_max: float):
+        self.transport = transport
+        self.models = models
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._started = False
+        self._completed = False
+        self._cold_runs = 0
+
+    def _missing(self) -> List[str]:
+        # Called with self._lock held
+        return [
+            model for model in self.models
+            if not any(results.get(model, {}).get("status") == "loaded" for results in self._results.values())
+        ]
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return not self.models or (self._completed and self._cold_runs == 0 and not self._missing())
+
+    @property
+    def state(self) -> str:
+        """running (a cold warm-up is in progress), failed (a model is loaded nowhere) or done"""
+        with self._lock:
+            if self.models and (not self._completed or self._cold_runs > 0):
+                return "running"
+            return "failed" if self._missing() else "done"
+
+    def failures(self) -> Dict[str, Dict[str, str]]:
+        """Models not loaded on any backend, with the error of each backend that failed to load them"""
+        with self._lock:
+            return {
+                model: {
+                    url: results[model].get("error", "")
+                    for url, results in self._results.items()
+                    if results.get(model, {}).get("status") == "failed"
+                }
+                for model in self._missing()
+            }
+
+    def warm(self, base_url: str, model: str) -> Dict[str, Any]:
+        """Load one model on one backend"""
+        payload = {
+            "model": model,
+            "prompt": "",
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": dict(GENERATION_OPTIONS)
+        }
+        started = time.monotonic()
+        try:
+            response = self.transport.post("/api/generate", base_url=base_url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            logger.warning(f"Warm-up of {model} on {base_url} failed: {e}")
+            return {"status": "failed", "error": str(e), "at": datetime.now().isoformat()}
+        load_seconds = (data.get("load_duration") or 0) / 1e9
+        logger.info(f"Warmed up {model} on {base_url} in {time.monotonic() - started:.1f}s (load_duration={load_seconds:.1f}s)")
+        return {
+            "status": "loaded",
+            "seconds": round(time.monotonic() - started, 3),
+            "load_seconds": round(load_seconds, 3),
+            "at": datetime.now().isoformat()
+        }
+
+    def run(self, models: Optional[List[str]] = None, backends: Optional[List[str]] = None, cold: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Warm the models on the backends (default: all), in parallel per backend
+
+        cold marks the instance not ready until this run has finished.
+        """
+        models = self.models if models is None else models
+        backends = list(self.transport.backends) if backends is None else backends
+        if cold:
+            with self._lock:
+                self._cold_runs += 1
+
+        def warm_backend(base_url: str) -> Dict[str, Any]:
+            results = {}
+            for model in models:
+                results[model] = self.warm(base_url, model)
+                with self._lock:
+                    self._results.setdefault(base_url, {})[model] = results[model]
+            return results
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(backends)), thread_name_prefix="warmup") as pool:
+                return dict(zip(backends, pool.map(warm_backend, backends)))
+        finally:
+            if cold:
+                with self._lock:
+                    self._cold_runs -= 1
+
+    def start(self) -> None:
+        """Run the startup warm-up in the background (idempotent)"""
+        with self._lock:
+            if self._started or not self.models:
+                return
+            self._started = True
+            self._cold_runs += 1
+
+        def startup():
+            try:
+                self.run()
+            finally:
+                with self._lock:
+                    self._cold_runs -= 1
+                    self._completed = True
+                logger.info("Model warm-up finished")
+            self._retry_missing()
+
+        threading.Thread(target=startup, name="model-warmup", daemon=True).start()
+        logger.info(f"Warming up {', '.join(self.models)} on {len(self.transport.backends)} backend(s)")
+
+    def _retry_missing(self, sleep: Callable[[float], None] = time.sleep) -> None:
+        """Warm the models no backend has loaded until each is loaded somewhere, backing off exponentially"""
+        delay = self.retry_backoff
+        while True:
+            with self._lock:
+                missing = self._missing()
+            if not missing:
+                return
+            logger.warning(f"Model(s) {', '.join(missing)} not loaded on any backend; retrying warm-up in {delay:.0f}s")
+            sleep(delay)
+            delay = min(self.retry_backoff_max, delay * 2)
+            with self._lock:
+                # A warm-up through /admin/warmup or a reconnect may have loaded them meanwhile
+                missing = self._missing()
+            if missing:
+                self.run(models=missing)
+
+    def backend_reconnected(self, base_url: str) -> None:
+        """Warm a backend that came back (e.g. Ollama restarted and lost its loaded models)"""
+        if not self.models:
+            return
+        logger.info(f"Ollama backend {base_url} is back; warming up its models")
+        threading.Thread(target=self.run, kwargs={"backends": [base_url], "cold": True},
+                         name="model-warmup", daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        ready = self.ready
+        with self._lock:
+            return {
+                "models": list(self.models),
+                "keep_alive": self.keep_alive,
+                "ready": ready,
+                "running": self._cold_runs > 0,
+                "not_loaded": self._missing(),
+                "backends": {url: dict(results) for url, results in self._results.items()}
+            }
+
+
+model_warmup = ModelWarmup(
+    ollama_transport, WARMUP_MODELS, WARMUP_KEEP_ALIVE, WARMUP_TIMEOUT, WARMUP_RETRY_BACKOFF, WARMUP_RETRY_BACKOFF_MAX
+)
+
+
+# ==================== Backend Status ====================
+class BackendStatusMonitor:
+    """
+    Background poller of /api/tags and /api/ps on every backend
+
+    /health, /models and / answer from the latest snapshot instead of calling
+    Ollama on every hit, so probes stay fast while Ollama is busy generating.
+    The snapshot carries its age so callers can tell how fresh it is.
+    """
+
+    def __init__(self, transport: OllamaTransport, interval: float, on_reconnect: Optional[Callable[[str], None]] = None):
+        self.transport = transport
+        self.interval = interval
+        self.on_reconnect = on_reconnect
+        self._lock = threading.Lock()
+        self._backends: Dict[str, Dict[str, Any]] = {}
+        self._refreshed_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> None:
+        """Poll every backend once and replace the snapshot"""
+        backends = {}
+        for backend in list(self.transport.backends.values()):
+            probed = self.transport.probe(backend)
+            # A failed poll alone does not disconnect a backend: it stays connected
+            # (with its last known models) until its circuit opens
+            status = {
+                "connected": probed or backend.is_healthy(),
+                "last_probe": "ok" if probed else "failed",
+                "models": sorted(backend.models or ()) if probed or backend.is_healthy() else [],
+                "loaded_models": [],
+                "checked_at": datetime.now().isoformat(),
+            }
+            if probed:
+                try:
+                    response = self.transport.get("/api/ps", base_url=backend.url, timeout=OLLAMA_PROBE_TIMEOUT)
+                    response.raise_for_status()
+                    status["loaded_models"] = [model['name'] for model in response.json().get('models', [])]
+                except Exception as e:
+                    logger.debug(f"Could not read loaded models from {backend.url}: {e}")
+            backends[backend.url] = status
+        with self._lock:
+            reconnected = [url for url, status in backends.items()
+                           if status["connected"] and url in self._backends and not self._backends[url]["connected"]]
+            self._backends = backends
+            self._refreshed_at = time.monotonic()
+        if self.on_reconnect is not None:
+            for url in reconnected:
+                self.on_reconnect(url)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Latest backend status, however old; refreshed synchronously only before the first poll
+
+        A stale snapshot (the refresher stuck behind a slow backend) is returned
+        as is; its age_seconds tells the caller.
+        """
+        with self._lock:
+            refreshed_at = self._refreshed_at
+        if refreshed_at is None:
+            self.refresh()
+        with self._lock:
+            backends = self._backends
+            age = time.monotonic() - self._refreshed_at
+        models = sorted({name for status in backends.values() for name in status["models"]})
+        return {
+            "connected": any(status["connected"] for status in backends.values()),
+            "models": models,
+            "backends": backends,
+            "age_seconds": round(age, 3),
+        }
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Backend status refresh failed: {e}")
+            time.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background refresher (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="backend-status", daemon=True)
+            self._thread.start()
+        logger.info(f"Backend status refresher started (every {self.interval:g}s)")
+
+
+backend_monitor = BackendStatusMonitor(ollama_transport, STATUS_REFRESH_INTERVAL, model_warmup.backend_reconnected)
+
+
+# ==================== Result Cache ====================
+class ResultCache:
+    """
+    Content-addressed cache of generated test cases
+
+    Entries are keyed on a hash of (model, system prompt, generation prompt,
+    sampling options incl. seed). Lookups go to an in-memory LRU first and fall
+    back to a SQLite store on disk, so results survive restarts. Both tiers
+    enforce the TTL and their own size limit.
+    """
+
+    def __init__(self, db_path: Path, memory_entries: int, disk_entries: int, ttl_seconds: int):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._db = None
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str, options: Dict[str, Any]) -> str:
+        """Hash everything that influences the generated text"""
+        material = json.dumps(
+            {"model": model, "system": system_prompt, "prompt": prompt, "options": options},
+            sort_keys=True, ensure_ascii=False
+        )
+        return ResultCache.hash_text(material)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Called with self._lock held
+        if self._db is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, system_hash TEXT, value TEXT, created_at REAL, last_access REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: str, value: str, system_hash: str, created_at: float) -> None:
+        # Called with self._lock held
+        self._memory[key] = (value, system_hash, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached text for a key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, system_hash, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            try:
+                db = self._connection()
+                row = db.execute(
+                    "SELECT value, system_hash, created_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, system_hash, created_at = row
+                    if now - created_at <= self.ttl_seconds:
+                        db.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+                        db.commit()
+                        self._remember(key, value, system_hash, created_at)
+                        self._counters["disk_hits"] += 1
+                        return value
+                    db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Result cache read failed: {e}")
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, value: str, system_prompt: str) -> None:
+        """Store a generated text in both tiers and enforce the disk size limit"""
+        now = time.time()
+        system_hash = self.hash_text(system_prompt)
+        with self._lock:
+            self._remember(key, value, system_hash, now)
+            self._counters["stores"] += 1
+            try:
+                db = self._connection()
+                db.execute(
+                    "INSERT OR REPLACE INTO results (key, system_hash, value, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)", (key, system_hash, value, now, now)
+                )
+                db.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+                excess = db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.disk_entries
+                if excess > 0:
+                    db.execute(
+                        "DELETE FROM results WHERE key IN "
+                        "(SELECT key FROM results ORDER BY last_access LIMIT ?)", (excess,)
+                    )
+                    self._counters["evictions"] += excess
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Result cache write failed: {e}")
+
+    def invalidate_system_prompt(self, system_prompt: str) -> int:
+        """Drop every entry generated with a different system prompt"""
+        system_hash = self.hash_text(system_prompt)
+        with self._lock:
+            stale = [key for key, entry in self._memory.items() if entry[1] != system_hash]
+            for key in stale:
+                del self._memory[key]
+            removed = len(stale)
+            try:
+                db = self._connection()
+                cursor = db.execute("DELETE FROM results WHERE system_hash != ?", (system_hash,))
+                db.commit()
+                removed = max(removed, cursor.rowcount)
+            except sqlite3.Error as e:
+                logger.warning(f"Result cache invalidation failed: {e}")
+        logger.info(f"Result cache invalidated {removed} entries after system prompt change")
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            try:
+                db = self._connection()
+                db.execute("DELETE FROM results")
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Result cache clear failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            disk_entries = None
+            try:
+                disk_entries = self._connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            except sqlite3.Error:
+                pass
+            memory_entries = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        counters.update({
+            "enabled": RESULT_CACHE_ENABLED,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "disk_entries": disk_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "file_path": str(self.db_path),
+        })
+        return counters
+
+
+result_cache = ResultCache(RESULT_CACHE_FILE, RESULT_CACHE_MEMORY_ENTRIES, RESULT_CACHE_DISK_ENTRIES, RESULT_CACHE_TTL_SECONDS)
+
+
+# ==================== Cancellation ====================
+# How often blocked waits re-check their cancellation token
+CANCEL_POLL_INTERVAL = 0.25
+
+
+class GenerationCancelled(Exception):
+    """Everyone waiting for a generation went away or ran out of time"""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation of the work done for one request
+
+    Cancelled explicitly when the client disconnects, or implicitly once the
+    deadline passes. Waits for a scheduler slot or an identical in-flight
+    generation poll it; Ollama calls check it between streamed chunks and
+    close the connection, which makes Ollama stop generating.
+    """
+
+    def __init__(self, deadline_seconds: Optional[float] = None):
+        self._event = threading.Event()
+        self._reason = None
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+
+    def cancel(self, reason: str = "Client disconnected") -> None:
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    @property
+    def reason(self) -> str:
+        return self._reason or "Deadline exceeded"
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline (None without one)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise GenerationCancelled(self.reason)
+
+    def timeout(self, default: float) -> float:
+        """default, shortened to the time left until the deadline"""
+        remaining = self.remaining()
+        return default if remaining is None else max(0.001, min(default, remaining))
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep, raising GenerationCancelled as soon as the token fires"""
+        end = time.monotonic() + seconds
+        while True:
+            self.check()
+            left = end - time.monotonic()
+            if left <= 0:
+                return
+            self._event.wait(min(left, CANCEL_POLL_INTERVAL))
+
+
+class SharedCancel(CancelToken):
+    """
+    Cancellation of a generation shared by several requests (single-flight)
+
+    Cancelled only when every joined request is; a request without a token
+    keeps the generation alive, and the deadline is the latest one.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._tokens: List[CancelToken] = []
+        self._unbounded = False
+
+    def join(self, token: Optional[CancelToken]) -> None:
+        if token is None:
+            self._unbounded = True
+        else:
+            self._tokens.append(token)
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        return not self._unbounded and bool(self._tokens) and all(token.cancelled for token in self._tokens)
+
+    @property
+    def reason(self) -> str:
+        return self._reason or (self._tokens[0].reason if self._tokens else "Cancelled")
+
+    def remaining(self) -> Optional[float]:
+        if self._unbounded or not self._tokens:
+            return None
+        remaining = [token.remaining() for token in self._tokens]
+        return None if None in remaining else max(remaining)
+
+
+class ChildCancel(CancelToken):
+    """
+    Cancellation of one of several calls made for a request (e.g. a hedge)
+
+    Can be cancelled on its own, and is cancelled whenever its parent is; the
+    deadline is the parent's.
+    """
+
+    def __init__(self, parent: Optional[CancelToken]):
+        super().__init__()
+        self.parent = parent
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def reason(self) -> str:
+        return self._reason or (self.parent.reason if self.parent is not None else "Cancelled")
+
+    def remaining(self) -> Optional[float]:
+        return self.parent.remaining() if self.parent is not None else None
+
+
+# ==================== Retries ====================
+class RetryBudget:
+    """
+    Token bucket limiting retries to a share of the Ollama calls
+
+    Every call deposits `ratio` tokens (the bucket holds at most `burst`) and
+    every retry spends one. A short outage is bridged by the burst, while a
+    long one settles at ratio retries per call instead of multiplying the load.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._balance = burst
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._balance = min(self.burst, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._balance < 1:
+                self.exhausted += 1
+                return False
+            self._balance -= 1
+            self.retries += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "balance": round(self._balance, 2),
+                "ratio": self.ratio,
+                "burst": self.burst,
+                "retries_total": self.retries,
+                "exhausted_total": self.exhausted
+            }
+
+
+retry_budget = RetryBudget(OLLAMA_RETRY_BUDGET_RATIO, OLLAMA_RETRY_BUDGET_BURST)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number attempt + 1"""
+    return random.uniform(0, min(OLLAMA_RETRY_BACKOFF_MAX, OLLAMA_RETRY_BACKOFF * 2 ** attempt))
+
+
+def retry_failed_call(error: BaseException, attempt: int, model: str, cancel: Optional[CancelToken] = None) -> bool:
+    """
+    Decide whether a failed Ollama call is repeated, sleeping the backoff if so
+
+    Only retryable OllamaErrors are repeated, at most OLLAMA_RETRY_ATTEMPTS
+    times, while the retry budget allows and the backoff ends before the
+    request deadline. Calls refused by open circuits never reached Ollama and
+    do not spend the budget. Raises GenerationCancelled if cancelled while
+    sleeping.
+    """
+    model = model or DEFAULT_MODEL
+    if not getattr(error, "retryable", False):
+        return False
+    if attempt >= OLLAMA_RETRY_ATTEMPTS:
+        ollama_retries_total.inc(model=model, outcome="attempts_exhausted")
+        return False
+    delay = backoff_delay(attempt)
+    remaining = cancel.remaining() if cancel is not None else None
+    if remaining is not None and remaining <= delay:
+        ollama_retries_total.inc(model=model, outcome="deadline")
+        return False
+    if not isinstance(error, OllamaUnavailable) and not retry_budget.withdraw():
+        ollama_retries_total.inc(model=model, outcome="budget_exhausted")
+        logger.warning(f"Retry budget exhausted, not retrying Ollama call: {error}")
+        return False
+    ollama_retries_total.inc(model=model, outcome="retried")
+    logger.warning(f"Ollama call failed ({error}); retry {attempt + 1}/{OLLAMA_RETRY_ATTEMPTS} in {delay:.1f}s")
+    if cancel is not None:
+        cancel.sleep(delay)
+    else:
+        time.sleep(delay)
+    return True
+
+
+# ==================== Hedging ====================
+class HedgePolicy:
+    """
+    When a slow generation gets a duplicate on a second backend
+
+    Keeps the latest `window` successful generation latencies per model and
+    kind of call ("single" requirement, "packed" prompt or section "repair",
+    whose lengths differ too much to share a percentile). Once `min_samples`
+    are known, a generation still running after their `percentile` is due for
+    a hedge, which is granted while hedges stay within `budget_percent` of all
+    hedgeable generations. Only the slowest tail is duplicated, so the extra
+    load on Ollama stays small.
+    """
+
+    def __init__(self, percentile: float, budget_percent: float, min_samples: int, window: int):
+        self.percentile = percentile
+        self.budget_percent = budget_percent
+        self.min_samples = min_samples
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self.calls = 0
+        self.hedges = 0
+        self.wins = 0
+        self.denied = 0
+
+    def observe(self, model: str, seconds: float, kind: str = "single") -> None:
+        with self._lock:
+            latencies = self._latencies.get((model, kind))
+            if latencies is None:
+                latencies = self._latencies[(model, kind)] = deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def delay(self, model: str, kind: str = "single") -> Optional[float]:
+        """Seconds after which a generation of the model and kind is hedged (None: not enough samples)"""
+        with self._lock:
+            latencies = sorted(self._latencies.get((model, kind), ()))
+        if len(latencies) < self.min_samples:
+            return None
+        index = min(len(latencies) - 1, math.ceil(len(latencies) * self.percentile / 100) - 1)
+        return latencies[index]
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def try_hedge(self) -> bool:
+        """Spend one hedge of the budget if it allows"""
+        with self._lock:
+            if self.hedges + 1 > self.calls * self.budget_percent / 100:
+                self.denied += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def record_win(self) -> None:
+        with self._lock:
+            self.wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            windows = list(self._latencies)
+            stats = {
+                "enabled": HEDGE_ENABLED,
+                "percentile": self.percentile,
+                "budget_percent": self.budget_percent,
+                "calls_total": self.calls,
+                "hedges_total": self.hedges,
+                "hedge_wins_total": self.wins,
+                "budget_denied_total": self.denied,
+                "hedge_rate_percent": round(100.0 * self.hedges / self.calls, 2) if self.calls else 0.0,
+            }
+        stats["delay_seconds"] = {}
+        for model, kind in windows:
+            delay = self.delay(model, kind)
+            if delay is not None:
+                stats["delay_seconds"].setdefault(model, {})[kind] = round(delay, 3)
+        return stats
+
+
+hedge_policy = HedgePolicy(HEDGE_PERCENTILE, HEDGE_BUDGET_PERCENT, HEDGE_MIN_SAMPLES, HEDGE_LATENCY_WINDOW)
+
+
+# ==================== Generation Scheduler ====================
+PRIORITY_CLASSES = ("interactive", "batch", "background")
+
+
+def parse_priority(value: Any, default: str) -> str:
+    """Validate a priority class name (case-insensitive); empty values give the default"""
+    if value is None or str(value).strip() == "":
+        return default
+    priority = str(value).strip().lower()
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"priority must be one of: {', '.join(PRIORITY_CLASSES)}")
+    return priority
+
+
+class PriorityTicket:
+    """
+    Priority of one generation call
+
+    Mutable so a queued call can be promoted, e.g. when an interactive request
+    joins an identical background generation through single-flight.
+    """
+
+    def __init__(self, priority: str = "interactive"):
+        self.priority = priority
+
+    @property
+    def rank(self) -> int:
+        return PRIORITY_CLASSES.index(self.priority)
+
+    def promote(self, priority: str) -> None:
+        if PRIORITY_CLASSES.index(priority) < self.rank:
+            self.priority = priority
+
+
+class GenerationScheduler:
+    """
+    Priority-ordered admission of Ollama generations
+
+    At most `slots` generations run at once, and no more generations of a
+    model than `capacity(model)` allows (the adaptive limits of the backends;
+    None means no limit). When a call cannot run, it queues and freed slots
+    are handed to the runnable waiter with the best effective rank: the class
+    rank (interactive 0, batch 1, background 2) minus one for every
+    `aging_seconds` it has waited, ties broken by arrival order. An
+    interactive request therefore waits for at most one running generation,
+    while batch and background work cannot starve. Waiters re-check every
+    CANCEL_POLL_INTERVAL, so capacity that grows without a release (a backend
+    coming back) is used as well.
+    """
+
+    def __init__(self, slots: int, aging_seconds: float, capacity: Optional[Callable[[str], Optional[int]]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.slots = slots
+        self.aging_seconds = aging_seconds
+        self.capacity = capacity
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._busy_by_model: Dict[str, int] = {}
+        self._polled_at = 0.0
+        self._seq = 0
+        self._waiters: List[Dict[str, Any]] = []
+        self.granted = {priority: 0 for priority in PRIORITY_CLASSES}
+
+    def _effective_rank(self, waiter: Dict[str, Any], now: float) -> Tuple[float, int]:
+        waited = now - waiter["enqueued"]
+        aging = waited / self.aging_seconds if self.aging_seconds > 0 else 0.0
+        return waiter["ticket"].rank - aging, waiter["seq"]
+
+    def _dispatch(self) -> None:
+        # Called with self._lock held: hand free slots to the best runnable waiters
+        now = self.clock()
+        capacities: Dict[str, Optional[int]] = {}
+        while self._waiters and self._busy < self.slots:
+            runnable = []
+            for waiter in self._waiters:
+                model = waiter["model"]
+                if model is None or self.capacity is None:
+                    runnable.append(waiter)
+                    continue
+                if model not in capacities:
+                    capacities[model] = self.capacity(model)
+                if capacities[model] is None or self._busy_by_model.get(model, 0) < capacities[model]:
+                    runnable.append(waiter)
+            if not runnable:
+                return
+            waiter = min(runnable, key=lambda w: self._effective_rank(w, now))
+            self._waiters.remove(waiter)
+            self._busy += 1
+            if waiter["model"] is not None:
+                self._busy_by_model[waiter["model"]] = self._busy_by_model.get(waiter["model"], 0) + 1
+            self.granted[waiter["ticket"].priority] += 1
+            waiter["ready"].set()
+
+    def acquire(self, ticket: PriorityTicket, cancel: Optional[CancelToken] = None, model: Optional[str] = None) -> None:
+        """Wait for a slot; raises GenerationCancelled if cancel fires while queued"""
+        if cancel is not None:
+            cancel.check()
+        started = self.clock()
+        with self._lock:
+            self._seq += 1
+            waiter = {"ticket": ticket, "model": model, "seq": self._seq, "enqueued": started, "ready": threading.Event()}
+            self._waiters.append(waiter)
+            self._dispatch()
+        # _dispatch() hands slots over directly, so _busy is already accounted for
+        while not waiter["ready"].wait(CANCEL_POLL_INTERVAL):
+            with self._lock:
+                # One re-check per interval is enough, however many callers wait
+                if self.clock() - self._polled_at >= CANCEL_POLL_INTERVAL:
+                    self._polled_at = self.clock()
+                    self._dispatch()
+                if waiter["ready"].is_set():
+                    break
+                if cancel is not None and cancel.cancelled:
+                    self._waiters.remove(waiter)
+                    raise GenerationCancelled(cancel.reason)
+        scheduler_wait_duration.observe(self.clock() - started, priority=ticket.priority)
+
+    def release(self, model: Optional[str] = None) -> None:
+        with self._lock:
+            self._busy -= 1
+            if model is not None:
+                self._busy_by_model[model] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: Any = "interactive", cancel: Optional[CancelToken] = None, model: Optional[str] = None) -> Iterator[None]:
+        """Hold a generation slot (for a model); priority is a class name or a PriorityTicket"""
+        ticket = priority if isinstance(priority, PriorityTicket) else PriorityTicket(priority)
+        self.acquire(ticket, cancel, model)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waiting = {priority: 0 for priority in PRIORITY_CLASSES}
+            for waiter in self._waiters:
+                waiting[waiter["ticket"].priority] += 1
+            return {
+                "slots": self.slots,
+                "busy": self._busy,
+                "busy_by_model": {model: n for model, n in self._busy_by_model.items() if n},
+                "waiting": waiting,
+                "granted_total": dict(self.granted),
+                "aging_seconds": self.aging_seconds
+            }
+
+
+generation_scheduler = GenerationScheduler(GENERATION_SLOTS, PRIORITY_AGING_SECONDS, ollama_transport.capacity)
+
+
+# ==================== Single Flight ====================
+class InFlightCall:
+    """A generation other callers with the same key can wait for"""
+
+    def __init__(self, priority: str = "interactive", cancel: Optional[CancelToken] = None):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        # Followers currently blocked in wait(), guarded by _waiters_lock
+        self.waiters = 0
+        self._waiters_lock = threading.Lock()
+        # Shared with the scheduler so a more urgent waiter promotes the call
+        self.ticket = PriorityTicket(priority)
+        # The call is only abandoned once every request waiting for it is
+        self.cancel = SharedCancel()
+        self.cancel.join(cancel)
+
+    def join(self) -> None:
+        with self._waiters_lock:
+            self.waiters += 1
+
+    def wait(self, cancel: Optional[CancelToken] = None) -> Any:
+        """Wait for the result (after join()); raises GenerationCancelled if cancel fires first"""
+        try:
+            while not self.done.wait(CANCEL_POLL_INTERVAL if cancel is not None else None):
+                cancel.check()
+        finally:
+            with self._waiters_lock:
+                self.waiters -= 1
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one execution
+
+    The first caller of a key runs the work; callers arriving while it is in
+    flight block until it finishes and share its result or exception. The key
+    is forgotten as soon as the call completes, so later callers start afresh
+    (by then the result cache normally answers them).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, InFlightCall] = {}
+        self.shared = 0
+
+    def begin(self, key: str, priority: str = "interactive", cancel: Optional[CancelToken] = None) -> Tuple[InFlightCall, bool]:
+        """Return (call, leader); the leader must call finish() when done"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.join()
+                self.shared += 1
+                call.ticket.promote(priority)
+                call.cancel.join(cancel)
+                return call, False
+            call = InFlightCall(priority, cancel)
+            self._calls[key] = call
+            return call, True
+
+    def lead(self, key: str, priority: str = "interactive", cancel: Optional[CancelToken] = None) -> Optional[InFlightCall]:
+        """Start a call for key and return it, or None (joining nothing) if one is already in flight"""
+        with self._lock:
+            if key in self._calls:
+                return None
+            call = InFlightCall(priority, cancel)
+            self._calls[key] = call
+            return call
+
+    def finish(self, key: str, call: InFlightCall, value: Any = None, error: Optional[BaseException] = None) -> None:
+        if error is not None and not isinstance(error, Exception):
+            # e.g. GeneratorExit when a streaming client went away
+            error = GenerationCancelled("Identical in-flight generation was cancelled")
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.value = value
+        call.error = error
+        call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+                "shared_total": self.shared
+            }
+
+
+generation_flights = SingleFlight()
+
+
+# ==================== Admission Control ====================
+class AdmissionRejected(Exception):
+    """A request was refused before any work started (429 overload, 413 too many requirements, 503 all circuits open)"""
+
+    def __init__(self, message: str, status_code: int = 429, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """
+    Requirements admitted for one request
+
+    count is None when the number of requirements is not known up front
+    (incrementally parsed uploads); the reservation then grows as they are
+    read, within the controller's caps: reading stops with AdmissionRejected
+    (413 past max_per_request, 429 past the in-flight cap while the request
+    still has requirements of its own in flight). Completed requirements are
+    returned to the controller one by one and whatever is left when the
+    request ends is returned by release().
+    """
+
+    def __init__(self, controller: "AdmissionController", count: Optional[int]):
+        self.controller = controller
+        self.reserved = count or 0
+        self.completed = 0
+        self.seen = 0
+        self.released = False
+
+    def track_input(self, requirements: Iterable[Any]) -> Iterator[Any]:
+        for requirement in requirements:
+            self.seen += 1
+            limit = self.controller.max_per_request
+            if limit and self.seen > limit:
+                self.controller._reject(
+                    "request_size", f"More than {limit} requirements in one request; submit larger sets to /jobs", 413
+                )
+            if self.seen > self.reserved:
+                self.controller.reserve_more(self.seen - self.reserved, self.reserved - self.completed)
+                self.reserved = self.seen
+            yield requirement
+
+    def complete(self) -> None:
+        counted = not self.released and self.completed < self.reserved
+        if counted:
+            self.completed += 1
+        self.controller._complete(1, counted)
+
+    def track(self, results: Iterator[Any]) -> Iterator[Any]:
+        """Pass through generation results, completing one requirement per result"""
+        try:
+            for item in results:
+                if item is not None:
+                    self.complete()
+                yield item
+        finally:
+            self.release()
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._reserve(self.completed - self.reserved)
+
+    def __enter__(self) -> "AdmissionTicket":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """
+    Load shedding in front of the generation endpoints
+
+    Rejects work that cannot start soon instead of letting it queue until the
+    Ollama read timeout: a request is refused with 429 when its requirements
+    would push the in-flight or job queue totals past their caps, and with 413
+    when it carries more than max_per_request requirements. Retry-After is the
+    time the recent requirement throughput needs to work off the excess.
+    """
+
+    def __init__(self, max_in_flight: int, max_queued: int, max_per_request: int,
+                 window_seconds: float, default_retry_after: int):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.max_per_request = max_per_request
+        self.window_seconds = window_seconds
+        self.default_retry_after = default_retry_after
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completions: Deque[float] = deque()
+        self._started = time.monotonic()
+        self.rejected = 0
+
+    def _prune(self, now: float) -> None:
+        while self._completions and now - self._completions[0] > self.window_seconds:
+            self._completions.popleft()
+
+    def _reserve(self, count: int) -> None:
+        with self._lock:
+            self._in_flight += count
+
+    def _complete(self, count: int = 1, counted: bool = True) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if counted:
+                self._in_flight -= count
+            self._completions.extend([now] * count)
+            self._prune(now)
+
+    def record_completion(self, count: int = 1) -> None:
+        """Count requirements completed outside an admitted request (jobs) towards throughput"""
+        self._complete(count, counted=False)
+
+    def throughput(self) -> float:
+        """Requirements completed per second over the last window"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            completed = len(self._completions)
+        elapsed = min(self.window_seconds, now - self._started)
+        return completed / elapsed if elapsed > 0 else 0.0
+
+    def retry_after(self, excess: int) -> int:
+        rate = self.throughput()
+        if rate <= 0:
+            return self.default_retry_after
+        return max(1, min(3600, math.ceil(excess / rate)))
+
+    def _reject(self, reason: str, message: str, status_code: int = 429, excess: int = 0,
+                retry_after: Optional[int] = None) -> None:
+        admission_rejections_total.inc(reason=reason)
+        with self._lock:
+            self.rejected += 1
+        if status_code == 429:
+            retry_after = self.retry_after(excess)
+        logger.warning(f"Admission rejected ({reason}): {message}")
+        raise AdmissionRejected(message, status_code, retry_after)
+
+    def admit(self, count: Optional[int] = None) -> AdmissionTicket:
+        """
+        Reserve in-flight capacity for a synchronous or streaming request
+
+        count is the number of requirements, or None when unknown (checked
+        against the cap as a single requirement). An idle server always admits
+        one request, so a cap below max_per_request cannot lock requests out.
+        """
+        if count is not None and self.max_per_request and count > self.max_per_request:
+            self._reject(
+                "request_size",
+                f"{count} requirements exceed the limit of {self.max_per_request} per request; submit larger sets to /jobs",
+                413
+            )
+        needed = count or 1
+        with self._lock:
+            in_flight = self._in_flight
+            if not self.max_in_flight or in_flight == 0 or in_flight + needed <= self.max_in_flight:
+                self._in_flight += count or 0
+                return AdmissionTicket(self, count)
+        self._reject(
+            "in_flight",
+            f"Server busy: {in_flight} requirements in flight (limit {self.max_in_flight})",
+            excess=in_flight + needed - self.max_in_flight
+        )
+
+    def reserve_more(self, count: int, outstanding: int) -> None:
+        """
+        Grow the reservation of a request admitted without a known size
+
+        Checked against the in-flight cap like admit(); a request with none of
+        its requirements outstanding may always take one more, so it cannot be
+        locked out halfway.
+        """
+        with self._lock:
+            in_flight = self._in_flight
+            if not self.max_in_flight or outstanding == 0 or in_flight + count <= self.max_in_flight:
+                self._in_flight += count
+                return
+        self._reject(
+            "in_flight",
+            f"Server busy: {in_flight} requirements in flight (limit {self.max_in_flight}); stopped reading the request",
+            excess=in_flight + count - self.max_in_flight
+        )
+
+    def admit_backends(self, model: Optional[str]) -> None:
+        """
+        Fail fast with 503 while every backend that could serve the model has its circuit open
+
+        Retry-After is the time until the soonest circuit is probed again.
+        """
+        reopens_in = ollama_transport.unavailable_for(model or DEFAULT_MODEL)
+        if reopens_in is not None:
+            self._reject(
+                "backends_unavailable",
+                "No healthy Ollama backend available: every circuit is open",
+                503, retry_after=retry_after_seconds(reopens_in)
+            )
+
+    def admit_queued(self, count: int, pending: int) -> None:
+        """Check that count more requirements fit in the job queue holding pending"""
+        if self.max_queued and pending > 0 and pending + count > self.max_queued:
+            self._reject(
+                "queue_full",
+                f"Job queue full: {pending} requirements pending (limit {self.max_queued})",
+                excess=pending + count - self.max_queued
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self._in_flight
+            rejected = self.rejected
+        return {
+            "in_flight_requirements": in_flight,
+            "max_in_flight_requirements": self.max_in_flight,
+            "max_queued_requirements": self.max_queued,
+            "max_requirements_per_request": self.max_per_request,
+            "throughput_per_second": round(self.throughput(), 4),
+            "rejected_total": rejected
+        }
+
+
+admission = AdmissionController(
+    MAX_IN_FLIGHT_REQUIREMENTS,
+    MAX_QUEUED_REQUIREMENTS,
+    MAX_REQUIREMENTS_PER_REQUEST,
+    THROUGHPUT_WINDOW_SECONDS,
+    RETRY_AFTER_DEFAULT_SECONDS
+)
+
+
+# ==================== System Instructions ====================
+DEFAULT_SYSTEM_INSTRUCTIONS = """You are an expert QA engineer specializing in system-level integration and black-box testing.
+Your task is to generate comprehensive, detailed test cases based on requirements.
+
+Guidelines:
+- Focus on system-level integration testing (black-box approach)
+- Each test case should be independent and executable
+- Include clear preconditions, steps, and expected results
+- Test both normal operation and edge cases
+- Use clear, unambiguous language
+- Include data values and specific parameters
+- Consider boundary conditions and error scenarios
+- Test case should verify the requirement is met from end-user perspective"""
+
+
+class InstructionsStore:
+    """
+    In-memory copy of the system instructions file
+
+    The file is re-read only when its (mtime, inode, size) signature changes, and
+    the signature itself is checked at most every INSTRUCTIONS_CHECK_INTERVAL
+    seconds. Updates are written to a temp file and renamed over the original,
+    so readers always see either the old or the new content, never a partial write.
+    """
+
+    def __init__(self, path: Path, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._text: Optional[str] = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def get(self) -> str:
+        """Return the current instructions, reloading them if the file changed"""
+        now = time.monotonic()
+        if self._text is not None and now - self._checked_at < self.check_interval:
+            return self._text
+
+        with self._lock:
+            if self._text is not None and now - self._checked_at < self.check_interval:
+                return self._text
+            signature = self._file_signature()
+            if self._text is None or signature != self._signature:
+                self._text = self._read() if signature is not None else DEFAULT_SYSTEM_INSTRUCTIONS
+                self._signature = signature
+                logger.info(f"System instructions loaded ({len(self._text)} chars)")
+            self._checked_at = now
+            return self._text
+
+    def _read(self) -> str:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except Exception as e:
+            logger.warning(f"Failed to load system instructions: {e}")
+            return DEFAULT_SYSTEM_INSTRUCTIONS
+
+    def update(self, instructions: str) -> None:
+        """Atomically replace the instructions file and the in-memory copy"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), prefix=".instructions-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(instructions)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # mkstemp creates the file owner-only; keep the original permissions
+                mode = os.stat(self.path).st_mode & 0o777 if self.path.exists() else 0o644
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            self._text = instructions
+            self._signature = self._file_signature()
+            self._checked_at = time.monotonic()
+
+
+instructions_store = InstructionsStore(SYSTEM_INSTRUCTION_FILE, INSTRUCTIONS_CHECK_INTERVAL)
+
+
+# ==================== Prompt Templates ====================
+# Fixed blocks of the built-in "default" template (SolaHD DC UPS B Series)
+PRODUCT_CONTEXT = """PRODUCT CONTEXT:
+- SolaHD SDU DC UPS “B” Series (Models: SDU1024B-EIP, SDU2024B-EIP, SDU1024B-MBUS, SDU2024B-MBUS)
+- Output: 24V DC, 10A or 20A (model dependent)
+- Communications: EtherNet/IP, Modbus, GUI/webserver; telemetry includes input/output voltage/current, battery voltage, SoC, SoH, temperature, event logs, alarms; remote ON/OFF; LED indicators; PC safe shutdown/restart
+- Battery Management: VRLA and LiFePO4 (auto-detect/user-select), hot-swappable, external battery modules; charging stops at 28V; auto-recharge; dead battery detection (<10V); auto/manual self-test
+- Protections & Thresholds: Input undervoltage (<21.6V for 10ms), input overvoltage (>29V for 10ms), battery undervoltage (<21.6V for 100ms), battery overvoltage (>28.4V for 500ms), battery dead (<10V for 100ms), output overcurrent (>150% rated for 5ms), PowerBoost (140% rated for 6s), overtemperature (shutdown/auto-recovery)
+- Environmental: –15°C to +50°C (ordinary), –15°C to +40°C (hazardous), 0–95% RH, altitude ≤3000m
+- QA Alignment: Requirement-driven, traceable black-box validation per SQAV; entry/exit criteria, defect management, traceability
+"""
+
+TEST_CASE_SECTIONS = """Please generate a comprehensive test case that includes:
+1. Test Case Title: A clear, concise title
+2. Objective: What this test case verifies
+3. References: Requirement ID/Title; related SRS/TRD/QA Manual sections
+4. Preconditions: Any setup required before test execution (equipment, configuration, model, battery type, protocol, safety)
+5. Test Steps: Detailed numbered steps with actions and expected results (use observable outputs, telemetry, indicators, logs)
+6. Expected Result: The final expected state/output with specific pass/fail criteria
+7. Postconditions: Any cleanup or state verification after test
+8. Test Data: Specific values, ranges, or parameters used (cover both 10A/20A, VRLA/LiFePO4 if relevant)
+9. Edge Cases: Any edge cases, boundary conditions, or negative scenarios tested (e.g., transient events, comms loss, hot-swap, self-test timing)
+10. Observability: What to check via GUI/EtherNet/IP/Modbus, LED states, event logs, alarms, PC shutdown sequencing
+11. Traceability: Requirement-to-Test mapping notes"""
+
+OUTPUT_FORMAT_RULES = """Format the response as a clear, structured text that describes the test case in detail.
+Do NOT use markdown formatting or code blocks.
+Do NOT include any explanation or preamble - just the test case content."""
+
+# Everything before the requirement fields is identical for every call, so together
+# with the system prompt it forms a byte-identical prefix Ollama can reuse from its
+# KV cache. Keep anything that varies per requirement after this prefix.
+GENERATION_PROMPT_PREFIX = (
+    "Based on the following requirement specification, generate a detailed system-level "
+    "integration test case (black-box testing approach).\n\n"
+    + PRODUCT_CONTEXT
+    + "REQUIREMENT DETAILS:\n"
+)
+
+GENERATION_PROMPT_SUFFIX = "\n\n" + TEST_CASE_SECTIONS + "\n\n" + OUTPUT_FORMAT_RULES
+
+PACKED_OUTPUT_FORMAT = (
+    "PACKED OUTPUT FORMAT: the {count} requirements above each need their own test case. "
+    "Write one complete test case per requirement, in the order given, "
+    "each wrapped exactly like this:\n"
+    "### BEGIN TEST CASE <REQUIREMENTS_ID> ###\n"
+    "<test case content>\n"
+    "### END TEST CASE <REQUIREMENTS_ID> ###\n"
+    "Do NOT write anything outside these blocks."
+)
+
+
+SECTION_REPAIR_PROMPT = (
+    "The test case below, written for the requirement that follows, is missing these sections "
+    "or has them empty:\n{definitions}\n\n"
+    "REQUIREMENT DETAILS:{details}\n\n"
+    "EXISTING TEST CASE:\n{test_case}\n\n"
+    "MISSING SECTIONS ONLY: write just the sections listed above, consistent with the existing "
+    "test case, each starting on a new line with its number and name exactly as listed "
+    "(e.g. \"{example}: ...\"). Do NOT repeat the other sections. "
+    "Do NOT use markdown formatting or add any preamble."
+)
+
+_SECTION_DEFINITION_RE = re.compile(r"^[ \t]*(\d+)\.[ \t]*([A-Za-z][^:\n]*?)[ \t]*:.*$", re.MULTILINE)
+
+
+def parse_test_case_sections(text: str) -> List[Tuple[int, str, str]]:
+    """The numbered "N. Name: description" lines of a prompt, as (number, name, line)"""
+    return [(int(m.group(1)), m.group(2), m.group(0).strip()) for m in _SECTION_DEFINITION_RE.finditer(text)]
+
+
+class PromptTemplate:
+    """
+    Generation prompt with its fixed text split around the requirement details
+
+    The prefix and suffix are built once; rendering only formats the variable
+    requirement fields and joins the three parts. A template file is plain text
+    containing the {requirement_details} marker exactly once. The numbered
+    section list of the suffix ("1. Test Case Title: ...") is what generated
+    test cases are validated against.
+    """
+    DETAILS_MARKER = "{requirement_details}"
+
+    def __init__(self, name: str, prefix: str, suffix: str, source: str = "built-in"):
+        self.name = name
+        self.prefix = prefix
+        self.suffix = suffix
+        self.source = source
+        self.sections = parse_test_case_sections(suffix)
+
+    @classmethod
+    def from_file(cls, name: str, path: Path) -> "PromptTemplate":
+        text = path.read_text(encoding="utf-8")
+        prefix, marker, suffix = text.partition(cls.DETAILS_MARKER)
+        if not marker or cls.DETAILS_MARKER in suffix:
+            raise ValueError(f"{path.name} must contain {cls.DETAILS_MARKER} exactly once")
+        # Editors add a trailing newline that the built-in prompt never had
+        return cls(name, prefix, suffix.rstrip("\n"), str(path))
+
+    @staticmethod
+    def render_details(requirement: Dict[str, Any]) -> str:
+        """Requirement fields as "KEY: value" lines (each prefixed with a newline)"""
+        return "".join(
+            f"\n{key}: {value}" for key, value in requirement.items() if key != "Test_Case" and value
+        )
+
+    def render(self, requirement: Dict[str, Any]) -> str:
+        details = self.render_details(requirement)
+        if debug_mode:
+            print(f"Prompt details ({self.name}):{details}")
+        return "".join((self.prefix, details, self.suffix))
+
+    def render_repair(self, requirement: Dict[str, Any], test_case: str, missing: List[str]) -> str:
+        """Follow-up prompt asking only for the missing sections of a test case"""
+        definitions = [line for _, name, line in self.sections if name in missing]
+        example = next(f"{number}. {name}" for number, name, _ in self.sections if name in missing)
+        return SECTION_REPAIR_PROMPT.format(
+            definitions="\n".join(definitions),
+            details=self.render_details(requirement),
+            test_case=test_case,
+            example=example
+        )
+
+    def render_packed(self, requirements: List[Dict[str, Any]]) -> str:
+        """
+        Render one prompt for several requirements
+
+        Shares the prefix of single prompts; each requirement is introduced by a
+        <<<REQUIREMENT id>>> line and the model is asked to wrap every test case
+        in BEGIN/END TEST CASE markers so split_packed_output can recover them.
+        """
+        details = "\n".join(
+            f"\n<<<REQUIREMENT {requirement['REQUIREMENTS_ID']}>>>{self.render_details(requirement)}"
+            for requirement in requirements
+        )
+        return "".join((
+            self.prefix, details, self.suffix, "\n\n", PACKED_OUTPUT_FORMAT.format(count=len(requirements))
+        ))
+
+
+class PromptTemplateRegistry:
+    """
+    Prompt templates by product line, loaded once at startup
+
+    Holds the built-in default plus every *.txt file in PROMPT_TEMPLATES_DIR
+    (named after the file stem; a "default.txt" replaces the built-in one).
+    Requirements select a template through their PRODUCT_LINE field and fall
+    back to PROMPT_TEMPLATE.
+    """
+
+    def __init__(self, default: PromptTemplate, directory: Path, default_name: str = "default"):
+        self.templates: Dict[str, PromptTemplate] = {default.name: default}
+        self.default_name = default_name
+        self._unknown_logged = set()
+        self.load_directory(directory)
+        if self.default_name not in self.templates:
+            logger.warning(f"Prompt template '{self.default_name}' not found, using the built-in default")
+            self.default_name = default.name
+
+    def load_directory(self, directory: Path) -> int:
+        if not directory.is_dir():
+            return 0
+        loaded = 0
+        for path in sorted(directory.glob("*.txt")):
+            try:
+                self.templates[path.stem] = PromptTemplate.from_file(path.stem, path)
+                loaded += 1
+            except (OSError, UnicodeDecodeError, ValueError) as e:
+                logger.error(f"Skipping prompt template {path}: {e}")
+        logger.info(f"Loaded {loaded} prompt template(s) from {directory}")
+        return loaded
+
+    def get(self, name: Optional[str] = None) -> PromptTemplate:
+        name = name or self.default_name
+        template = self.templates.get(name)
+        if template is None:
+            if name not in self._unknown_logged:
+                self._unknown_logged.add(name)
+                logger.warning(f"Unknown product line '{name}', using prompt template '{self.default_name}'")
+            template = self.templates[self.default_name]
+        return template
+
+    def for_requirement(self, requirement: Dict[str, Any]) -> PromptTemplate:
+        return self.get(requirement.get("PRODUCT_LINE") or None)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "default": self.default_name,
+            "templates": {name: template.source for name, template in sorted(self.templates.items())}
+        }
+
+
+prompt_templates = PromptTemplateRegistry(
+    PromptTemplate("default", GENERATION_PROMPT_PREFIX, GENERATION_PROMPT_SUFFIX),
+    PROMPT_TEMPLATES_DIR,
+    PROMPT_TEMPLATE
+)
+
+
+# ==================== Helper Functions ====================
+def load_system_instructions() -> str:
+    """Load system instructions for test case generation"""
+    return instructions_store.get()
+
+#SYSTEM prompt from the instruction file
+def build_system_prompt() -> str:
+    """Build the system prompt for Ollama"""
+    return load_system_instructions()
+
+    ### #generic prompt to generate test cases from requirement
+    ### #this is including the actual requirement details [DESCRIPTION, CATEGORY, etc]
+    ### def build_generation_prompt(requirement: Dict[str, Any]) -> str:
+    ###     """Build the prompt for test case generation from a requirement"""
+    ###     
+    ###     prompt = """Based on the following requirement specification, generate a detailed system-level integration test case (black-box testing approach).
+    ### 
+    ### REQUIREMENT DETAILS:
+    ### """
+    ###     
+    ###     # Add all requirement fields to the prompt
+    ###     for key, value in requirement.items():
+    ###         if key != "Test_Case" and value:
+    ###             prompt += f"\n{key}: {value}"
+    ###     
+    ###         if debug_mode:
+    ###             print(f". Added to prompt: {key}: {value}")
+    ###             print(f"Current prompt state:\n{prompt}")   
+    ### 
+    ###     prompt += """
+    ### 
+    ### Please generate a comprehensive test case that includes:
+    ### 1. Test Case Title: A clear, concise title
+    ### 2. Objective: What this test case verifies
+    ### 3. Preconditions: Any setup required before test execution
+    ### 4. Test Steps: Detailed numbered steps with actions and expected results
+    ### 5. Expected Result: The final expected state/output
+    ### 6. Postconditions: Any cleanup or state verification after test
+    ### 7. Test Data: Specific values, ranges, or parameters used
+    ### 8. Edge Cases: Any edge cases or boundary conditions tested
+    ### 
+    ### Format the response as a clear, structured text that describes the test case in detail.
+    ### Do NOT use markdown formatting or code blocks.
+    ### Do NOT include any explanation or preamble - just the test case content."""
+    ###
+    ###    return prompt
+
+
+def build_generation_prompt(requirement: Dict[str, Any]) -> str:
+    """Build the prompt for test case generation from a requirement (SolaHD DC UPS B Series context by default)"""
+    return prompt_templates.for_requirement(requirement).render(requirement)
+
+
+def build_packed_generation_prompt(requirements: List[Dict[str, Any]]) -> str:
+    """Build one prompt asking for the test cases of several requirements (all using the same template)"""
+    return prompt_templates.for_requirement(requirements[0]).render_packed(requirements)
+
+
+_PACKED_BLOCK_RE = re.compile(
+    r"^[ \t]*### BEGIN TEST CASE (.+?) ###[ \t]*$(.*?)^[ \t]*### END TEST CASE \1 ###[ \t]*$",
+    re.MULTILINE | re.DOTALL
+)
+
+
+def split_packed_output(text: str, requirement_ids: List[str]) -> Dict[str, str]:
+    """
+    Split the output of a packed prompt into per-requirement test cases
+
+    Only blocks that are complete, non-empty and appear exactly once for an
+    expected requirement id are returned; anything else is left out so the
+    caller can regenerate those requirements individually.
+    """
+    expected = set(requirement_ids)
+    blocks: Dict[str, List[str]] = {}
+    for match in _PACKED_BLOCK_RE.finditer(text):
+        req_id = match.group(1).strip()
+        if req_id in expected:
+            blocks.setdefault(req_id, []).append(match.group(2).strip())
+    return {req_id: contents[0] for req_id, contents in blocks.items() if len(contents) == 1 and contents[0]}
+
+
+def locate_sections(text: str, sections: List[Tuple[int, str, str]]) -> Dict[str, Tuple[int, int, int]]:
+    """
+    Find the section headings of a generated test case
+
+    Returns (heading start, content start, end) per section found, by name; a
+    section ends where the next one found begins. Numbered headings
+    ("10. Observability:") are preferred, so an "Expected Result:" line inside
+    the test steps is not mistaken for section 6.
+    """
+    found = []
+    starts = set()
+    for number, name, _ in sections:
+        heading = r"[ \t]*\**[ \t]*" + re.escape(name) + r"[ \t]*\**[ \t]*(?::|$)"
+        match = (re.search(rf"^[ \t#*>-]*{number}[.)]" + heading, text, re.MULTILINE | re.IGNORECASE)
+                 or re.search(r"^[ \t#*>-]*" + heading, text, re.MULTILINE | re.IGNORECASE))
+        if match and match.start() not in starts:
+            starts.add(match.start())
+            found.append((match.start(), match.end(), name))
+    found.sort()
+    return {
+        name: (start, content_start, found[i + 1][0] if i + 1 < len(found) else len(text))
+        for i, (start, content_start, name) in enumerate(found)
+    }
+
+
+def find_missing_sections(text: str, sections: List[Tuple[int, str, str]]) -> List[str]:
+    """Sections whose heading is absent or whose content is empty, in template order"""
+    spans = locate_sections(text, sections)
+    return [
+        name for _, name, _ in sections
+        if name not in spans or not text[spans[name][1]:spans[name][2]].strip()
+    ]
+
+
+def splice_sections(text: str, sections: List[Tuple[int, str, str]], repairs: Dict[str, str]) -> str:
+    """
+    Put repaired section blocks into a test case
+
+    An empty section is replaced in place; a missing one is inserted before
+    the next section (in template order) that is present, or appended.
+    """
+    spans = locate_sections(text, sections)
+    separator = "\n\n" if "\n\n" in text.strip() else "\n"
+    names = [name for _, name, _ in sections]
+    edits = []
+    for pos, name in enumerate(names):
+        if name not in repairs:
+            continue
+        if name in spans:
+            edits.append((spans[name][0], spans[name][2], repairs[name] + separator))
+            continue
+        following = [spans[n][0] for n in names[pos + 1:] if n in spans and n not in repairs]
+        if following:
+            edits.append((following[0], following[0], repairs[name] + separator))
+        else:
+            edits.append((len(text), len(text), separator + repairs[name]))
+    # Apply from the end so earlier offsets stay valid; at equal offsets the later
+    # section goes first, so the earlier one ends up in front of it
+    for _, (start, end, replacement) in sorted(enumerate(edits), key=lambda item: (item[1][0], item[0]), reverse=True):
+        text = text[:start] + replacement + text[end:]
+    return text.strip()
+
+
+def build_ollama_payload(prompt: str, system_prompt: str, model: str, stream: bool = False) -> Dict[str, Any]:
+    """Build the /api/generate request body"""
+    return {
+        "model": model,
+        "prompt": prompt,
+        "system": system_prompt,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": dict(GENERATION_OPTIONS)
+    }
+
+#call the ollama api to generate the test case and return the generated text 
+def call_ollama_generate(
+    prompt: str,
+    system_prompt: str,
+    model: str = None,
+    priority: Any = "interactive",
+    cancel: Optional[CancelToken] = None,
+    kind: str = "single"
+) -> str:
+    """
+    Call Ollama API to generate test case (waiting for a scheduler slot of the given priority)
+
+    Transient failures are retried with backoff (see retry_failed_call); an
+    OllamaError is raised once they are exhausted or for fatal errors. With a
+    cancellation token the response is streamed internally, so the call can be
+    abandoned between chunks instead of running to completion. With
+    HEDGE_ENABLED and several backends, slow attempts are hedged (see
+    hedged_generate_once); kind ("single", "packed" or "repair") selects the
+    latency window the hedge delay comes from.
+    """
+    hedged = HEDGE_ENABLED and len(ollama_transport.backends) > 1
+    retry_budget.deposit()
+    attempt = 0
+    while True:
+        try:
+            if hedged:
+                return hedged_generate_once(prompt, system_prompt, model, priority, cancel, kind)
+            if cancel is not None:
+                return "".join(stream_ollama_generate_once(prompt, system_prompt, model, priority, cancel, kind=kind)).strip()
+            return call_ollama_generate_once(prompt, system_prompt, model, priority, kind)
+        except OllamaError as e:
+            if not retry_failed_call(e, attempt, model, cancel):
+                raise
+            attempt += 1
+
+
+def call_ollama_generate_once(
+    prompt: str,
+    system_prompt: str,
+    model: str = None,
+    priority: Any = "interactive",
+    kind: str = "single"
+) -> str:
+    """A single non-streaming generation attempt"""
+    model = model or DEFAULT_MODEL
+    backend_url = OLLAMA_BASE_URL
+    
+    try:
+        payload = build_ollama_payload(prompt, system_prompt, model)
+        if debug_mode:
+            print(f"Calling Ollama API with model: {model}")
+            print(f"Payload: {json.dumps(payload, indent=2)}")
+        with generation_scheduler.slot(priority, model=model):
+            started = time.monotonic()
+            usage: Dict[str, Any] = {}
+            with ollama_transport.route(model, usage=usage) as backend:
+                backend_url = backend.url
+                logger.info(f"Calling Ollama API with model: {model} on {backend.url}")
+                response = ollama_transport.post("/api/generate", base_url=backend.url, json=payload)
+                response.raise_for_status()
+                data = response.json()
+                usage.update(data)
+        
+        duration = time.monotonic() - started
+        generation_duration.observe(duration, model=model)
+        hedge_policy.observe(model, duration, kind)
+        generations_total.inc(model=model, status="success")
+        record_ollama_stats(model, data)
+        generated_text = data.get("response", "").strip()
+        
+        if debug_mode:
+            print(f"Generated text: {generated_text}")
+        logger.info("Test case generated successfully")
+        return generated_text
+        
+    except requests.exceptions.Timeout as e:
+        generations_total.inc(model=model, status="timeout")
+        raise OllamaError(f"Ollama API timeout after {OLLAMA_READ_TIMEOUT:g} seconds", retryable=True) from e
+    except NoBackendAvailable as e:
+        generations_total.inc(model=model, status="error")
+        raise OllamaUnavailable(str(e), e.retry_after) from e
+    except requests.exceptions.ConnectionError as e:
+        generations_total.inc(model=model, status="error")
+        raise OllamaError(f"Could not connect to Ollama at {backend_url}", retryable=True) from e
+    except Exception as e:
+        generations_total.inc(model=model, status="error")
+        raise OllamaError(f"Ollama API error: {str(e)}", is_retryable_error(e)) from e
+
+
+def hedged_generate_once(
+    prompt: str,
+    system_prompt: str,
+    model: str = None,
+    priority: Any = "interactive",
+    cancel: Optional[CancelToken] = None,
+    kind: str = "single"
+) -> str:
+    """
+    A generation attempt that is duplicated on a second backend when slow
+
+    The primary call runs on its own thread. Once it has been generating for
+    longer than the hedge delay of its model and kind, a hedge is sent to another
+    healthy backend (through the scheduler like any call) if the hedge budget
+    allows. The first successful result is returned and the other call is
+    cancelled, which closes its connection so Ollama stops generating. When
+    both fail, the primary's error is raised.
+    """
+    model = model or DEFAULT_MODEL
+    hedge_policy.record_call()
+    delay = hedge_policy.delay(model, kind)
+    results: "queue.Queue[Tuple[str, Optional[str], Optional[BaseException]]]" = queue.Queue()
+    calls: Dict[str, Tuple[ChildCancel, Dict[str, Any]]] = {}
+
+    def start(name: str, exclude: Tuple[str, ...]) -> None:
+        token = ChildCancel(cancel)
+        placement = {"exclude": exclude}
+        calls[name] = (token, placement)
+
+        def run():
+            try:
+                text = "".join(stream_ollama_generate_once(prompt, system_prompt, model, priority, token, placement, kind))
+                results.put((name, text.strip(), None))
+            except BaseException as e:
+                results.put((name, None, e))
+
+        threading.Thread(target=run, name=f"generation-{name}", daemon=True).start()
+
+    start("primary", ())
+    hedge_due = delay is not None
+    try:
+        while True:
+            timeout = None
+            if hedge_due:
+                # The delay counts from the moment the primary reached a backend, not its scheduler wait
+                started = calls["primary"][1].get("started")
+                timeout = CANCEL_POLL_INTERVAL if started is None else max(0.0, started + delay - time.monotonic())
+            try:
+                name, text, error = results.get(timeout=timeout)
+            except queue.Empty:
+                started = calls["primary"][1].get("started")
+                if started is None or time.monotonic() < started + delay:
+                    continue
+                hedge_due = False
+                exclude = (calls["primary"][1]["backend"],)
+                if not ollama_transport.can_route(model, exclude):
+                    ollama_hedges_total.inc(model=model, outcome="no_backend")
+                elif not hedge_policy.try_hedge():
+                    ollama_hedges_total.inc(model=model, outcome="budget_exhausted")
+                else:
+                    ollama_hedges_total.inc(model=model, outcome="sent")
+                    logger.info(f"Generation on {exclude[0]} slower than {delay:.1f}s; hedging on another backend")
+                    start("hedge", exclude)
+                continue
+
+            if error is not None and len(calls) > 1:
+                # The other call may still succeed; report the primary's error if it does not
+                other_name, other_text, other_error = results.get()
+                if other_error is None:
+                    name, text, error = other_name, other_text, None
+                elif name != "primary":
+                    error = other_error
+            if error is not None:
+                raise error
+            if len(calls) > 1:
+                ollama_hedges_total.inc(model=model, outcome="won" if name == "hedge" else "lost")
+                if name == "hedge":
+                    hedge_policy.record_win()
+            return text
+    finally:
+        # Stop whichever call is still running (a no-op for the finished ones)
+        for token, _ in calls.values():
+            token.cancel("Hedged generation finished elsewhere")
+
+#call the ollama api with streaming enabled and relay the generated tokens
+def stream_ollama_generate(
+    prompt: str,
+    system_prompt: str,
+    model: str = None,
+    priority: Any = "interactive",
+    cancel: Optional[CancelToken] = None
+) -> Iterator[str]:
+    """
+    Call Ollama API with "stream": true and yield text chunks as they arrive
+
+    The cancellation token is checked before every chunk; once it fires the
+    connection is closed (Ollama then stops generating) and GenerationCancelled
+    is raised. Its deadline also bounds the read timeout. Transient failures
+    before the first chunk are retried like in call_ollama_generate.
+    """
+    retry_budget.deposit()
+    attempt = 0
+    while True:
+        relayed = False
+        try:
+            for text in stream_ollama_generate_once(prompt, system_prompt, model, priority, cancel):
+                relayed = True
+                yield text
+            return
+        except OllamaError as e:
+            # Text already relayed cannot be taken back
+            if relayed or not retry_failed_call(e, attempt, model, cancel):
+                raise
+            attempt += 1
+
+
+def stream_ollama_generate_once(
+    prompt: str,
+    system_prompt: str,
+    model: str = None,
+    priority: Any = "interactive",
+    cancel: Optional[CancelToken] = None,
+    placement: Optional[Dict[str, Any]] = None,
+    kind: str = "single"
+) -> Iterator[str]:
+    """
+    A single streaming generation attempt
+
+    placement, when given, may list backend URLs to avoid under "exclude" and
+    receives the chosen "backend" and the monotonic time it "started".
+    """
+    model = model or DEFAULT_MODEL
+    backend_url = OLLAMA_BASE_URL
+    placement = placement if placement is not None else {}
+    
+    try:
+        payload = build_ollama_payload(prompt, system_prompt, model, stream=True)
+        timeout = cancel.timeout(OLLAMA_READ_TIMEOUT) if cancel is not None else None
+        with generation_scheduler.slot(priority, cancel, model):
+            started = time.monotonic()
+            usage: Dict[str, Any] = {}
+            with ollama_transport.route(model, placement.get("exclude", ()), usage) as backend:
+                backend_url = backend.url
+                placement["backend"] = backend.url
+                placement["started"] = time.monotonic()
+                logger.info(f"Calling Ollama API (streaming) with model: {model} on {backend.url}")
+                try:
+                    with ollama_transport.post("/api/generate", base_url=backend.url, json=payload, stream=True, timeout=timeout) as response:
+                        response.raise_for_status()
+                        for line in response.iter_lines():
+                            if cancel is not None:
+                                cancel.check()
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            if chunk.get("error"):
+                                raise Exception(chunk["error"])
+                            if chunk.get("response"):
+                                yield chunk["response"]
+                            if chunk.get("done"):
+                                # The final chunk carries the timing statistics
+                                record_ollama_stats(model, chunk)
+                                usage.update(chunk)
+                                break
+                except requests.exceptions.Timeout:
+                    # Our own deadline ran out, not the backend: keep it out of the failure count
+                    if cancel is not None and cancel.cancelled:
+                        raise GenerationCancelled(cancel.reason) from None
+                    raise
+        duration = time.monotonic() - started
+        generation_duration.observe(duration, model=model)
+        hedge_policy.observe(model, duration, kind)
+        generations_total.inc(model=model, status="success")
+        logger.info("Test case generated successfully")
+        
+    except GenerationCancelled as e:
+        generations_total.inc(model=model, status="cancelled")
+        logger.info(f"Ollama generation abandoned: {e}")
+        raise
+    except requests.exceptions.Timeout as e:
+        generations_total.inc(model=model, status="timeout")
+        raise OllamaError(f"Ollama API timeout after {OLLAMA_READ_TIMEOUT:g} seconds", retryable=True) from e
+    except NoBackendAvailable as e:
+        generations_total.inc(model=model, status="error")
+        raise OllamaUnavailable(str(e), e.retry_after) from e
+    except requests.exceptions.ConnectionError as e:
+        generations_total.inc(model=model, status="error")
+        raise OllamaError(f"Could not connect to Ollama at {backend_url}", retryable=True) from e
+    except Exception as e:
+        generations_total.inc(model=model, status="error")
+        raise OllamaError(f"Ollama API error: {str(e)}", is_retryable_error(e)) from e
+
+#look up the result cache before calling ollama; store fresh generations
+def generate_cached(
+    prompt: str,
+    system_prompt: str,
+    model: str = None,
+    priority: str = "interactive",
+    cancel: Optional[CancelToken] = None,
+    kind: str = "single"
+) -> str:
+    """
+    Return the test case text from the result cache, generating it on a miss
+
+    Concurrent misses for the same (model, system prompt, prompt, options) key
+    share a single Ollama call through generation_flights; the call runs with
+    the most urgent priority among the requests waiting for it, and is only
+    cancelled when all of them are.
+    """
+    key = ResultCache.make_key(model or DEFAULT_MODEL, system_prompt, prompt, GENERATION_OPTIONS)
+    if RESULT_CACHE_ENABLED:
+        cached = result_cache.get(key)
+        if cached is not None:
+            logger.info("Test case served from result cache")
+            return cached
+
+    def generate() -> str:
+        # The previous holder of this key may have finished between our miss and now
+        if RESULT_CACHE_ENABLED:
+            cached = result_cache.get(key)
+            if cached is not None:
+                return cached
+        generated_text = call_ollama_generate(
+            prompt, system_prompt, model, call.ticket, call.cancel if cancel is not None else None, kind
+        )
+        if RESULT_CACHE_ENABLED and generated_text:
+            result_cache.put(key, generated_text, system_prompt)
+        return generated_text
+
+    call, leader = generation_flights.begin(key, priority, cancel)
+    if not leader:
+        logger.info("Identical generation already in flight, waiting for its result")
+        try:
+            return call.wait(cancel)
+        except GenerationCancelled:
+            if cancel is not None and cancel.cancelled:
+                raise
+            # Everyone else gave up on it just before we joined: start over
+            return generate_cached(prompt, system_prompt, model, priority, cancel, kind)
+    try:
+        generated_text = generate()
+    except BaseException as e:
+        generation_flights.finish(key, call, error=e)
+        raise
+    generation_flights.finish(key, call, generated_text)
+    return generated_text
+
+def repair_test_case(
+    requirement: Dict[str, Any],
+    test_case: str,
+    system_prompt: str,
+    model: str = None,
+    priority: Any = "interactive",
+    cancel: Optional[CancelToken] = None
+) -> Tuple[str, List[str]]:
+    """
+    Regenerate only the missing or empty sections of a generated test case
+
+    Returns the (possibly spliced) test case and the names of the sections
+    that were repaired. Output that follows none of the section headings is
+    left alone, as is everything when the follow-up call fails.
+    """
+    template = prompt_templates.for_requirement(requirement)
+    sections = template.sections
+    if not SECTION_REPAIR_ENABLED or not sections or not test_case:
+        return test_case, []
+    missing = find_missing_sections(test_case, sections)
+    if not missing:
+        return test_case, []
+    if len(missing) == len(sections):
+        logger.warning(f"Test case for {requirement.get('REQUIREMENTS_ID')} has none of the expected sections; not repairing")
+        return test_case, []
+
+    logger.info(f"Test case for {requirement.get('REQUIREMENTS_ID')} lacks {', '.join(missing)}; generating only those sections")
+    try:
+        # Through the cache/single-flight, so identical requests share one repair call
+        generated = generate_cached(
+            template.render_repair(requirement, test_case, missing), system_prompt, model, priority, cancel, "repair"
+        )
+    except GenerationCancelled:
+        raise
+    except Exception as e:
+        logger.warning(f"Section repair failed, keeping the incomplete test case: {e}")
+        for name in missing:
+            section_repairs_total.inc(section=name, outcome="failed")
+        return test_case, []
+
+    # Locate every section so extra ones the model added do not end up inside a repaired block
+    spans = locate_sections(generated, sections)
+    repairs = {
+        name: generated[start:end].strip()
+        for name, (start, content_start, end) in spans.items()
+        if name in missing and generated[content_start:end].strip()
+    }
+    for name in missing:
+        section_repairs_total.inc(section=name, outcome="repaired" if name in repairs else "failed")
+    if not repairs:
+        return test_case, []
+    repaired = [name for name in missing if name in repairs]
+    return splice_sections(test_case, sections, repairs), repaired
+
+
+def complete_test_case(
+    requirement: Dict[str, Any],
+    test_case: str,
+    system_prompt: str,
+    key: Optional[str],
+    model: str = None,
+    priority: Any = "interactive",
+    cancel: Optional[CancelToken] = None
+) -> Tuple[str, List[str]]:
+    """repair_test_case, storing a repaired test case under its result cache key"""
+    test_case, repaired = repair_test_case(requirement, test_case, system_prompt, model, priority, cancel)
+    if repaired and RESULT_CACHE_ENABLED and key is not None:
+        result_cache.put(key, test_case, system_prompt)
+    return test_case, repaired
+
+def validate_requirement(data: Dict[str, Any]) -> bool:
+    """Validate that the requirement has required fields"""
+    required_fields = ["REQUIREMENTS_ID", "DESCRIPTION", "CATEGORY"]
+    return all(field in data for field in required_fields)
+
+#consolidate the prompt, call to ollama, and return the test case
+#output is an array or results with test cases
+def generate_test_case_for_requirement(
+    requirement: Dict[str, Any],
+    model: str = None,
+    priority: str = "interactive",
+    cancel: Optional[CancelToken] = None
+) -> Dict[str, Any]:
+    """Generate a test case for a single requirement"""
+    
+    if not validate_requirement(requirement):
+        raise ValueError("Requirement missing required fields: REQUIREMENTS_ID, DESCRIPTION, CATEGORY")
+    
+    # Build prompts
+    system_prompt       = build_system_prompt()
+    generation_prompt   = build_generation_prompt(requirement)
+    
+    # Generate test case using Ollama (or reuse an identical earlier generation)
+    test_case_content = generate_cached(generation_prompt, system_prompt, model, priority, cancel)
+    key = ResultCache.make_key(model or DEFAULT_MODEL, system_prompt, generation_prompt, GENERATION_OPTIONS)
+    test_case_content, repaired = complete_test_case(
+        requirement, test_case_content, system_prompt, key, model, priority, cancel
+    )
+    
+    # Create output with test case
+    output = requirement.copy()
+    output["Test_Case"] = test_case_content
+    output["Repaired_Sections"] = repaired
+    output["Generated_At"] = datetime.now().isoformat()
+    
+    return output
+
+#token streaming variant used by the SSE endpoints when "stream_tokens" is requested
+def stream_test_case_for_requirement(
+    requirement: Dict[str, Any],
+    model: str = None,
+    priority: str = "interactive",
+    cancel: Optional[CancelToken] = None
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Generate a test case for a single requirement, relaying tokens as they arrive
+
+    Yields ("delta", text) for every chunk produced by Ollama, then a final
+    ("result", output) with the same shape generate_test_case_for_requirement returns.
+    A result cache hit yields only the final result; when the same prompt is
+    already being generated elsewhere its text arrives as a single delta. If
+    that generation is abandoned, this request takes it over and restarts it,
+    as it does once if it fails.
+    """
+    if not validate_requirement(requirement):
+        raise ValueError("Requirement missing required fields: REQUIREMENTS_ID, DESCRIPTION, CATEGORY")
+
+    system_prompt       = build_system_prompt()
+    generation_prompt   = build_generation_prompt(requirement)
+
+    key = ResultCache.make_key(model or DEFAULT_MODEL, system_prompt, generation_prompt, GENERATION_OPTIONS)
+    test_case_content = None
+    if RESULT_CACHE_ENABLED:
+        test_case_content = result_cache.get(key)
+
+    rejoined_failed = False
+    semaphore = get_model_semaphore(model or DEFAULT_MODEL)
+    while test_case_content is None:
+        # Take the model's slot before joining generation_flights, as the pool
+        # workers do: a leader never waits for a slot, so a worker holding one
+        # while it follows this key cannot deadlock with us
+        semaphore.acquire()
+        call, leader = generation_flights.begin(key, priority, cancel)
+        if not leader:
+            semaphore.release()
+            # Someone else is generating this exact prompt: relay their text in one piece
+            logger.info("Identical generation already in flight, waiting for its result")
+            try:
+                test_case_content = call.wait(cancel)
+            except GenerationCancelled:
+                if cancel is not None and cancel.cancelled:
+                    raise
+                # Everyone else gave up on it (e.g. the leading stream's client went away): start over
+                continue
+            except OllamaError:
+                # A streaming leader cannot retry once it relayed text; nothing was relayed here yet
+                if rejoined_failed:
+                    raise
+                rejoined_failed = True
+                continue
+            yield "delta", test_case_content
+        else:
+            try:
+                chunks = []
+                for text in stream_ollama_generate(generation_prompt, system_prompt, model, call.ticket, call.cancel):
+                    chunks.append(text)
+                    yield "delta", text
+                test_case_content = "".join(chunks).strip()
+                if RESULT_CACHE_ENABLED and test_case_content:
+                    result_cache.put(key, test_case_content, system_prompt)
+            except BaseException as e:
+                generation_flights.finish(key, call, error=e)
+                raise
+            finally:
+                semaphore.release()
+            generation_flights.finish(key, call, test_case_content)
+
+    completed, repaired = complete_test_case(
+        requirement, test_case_content, system_prompt, key, model, priority, cancel
+    )
+    if repaired:
+        # The relayed text lacks these sections; send them, the result has the spliced text
+        spans = locate_sections(completed, prompt_templates.for_requirement(requirement).sections)
+        yield "delta", "\n\n" + "\n\n".join(completed[spans[name][0]:spans[name][2]].strip() for name in repaired)
+
+    output = requirement.copy()
+    output["Test_Case"] = completed
+    output["Repaired_Sections"] = repaired
+    output["Generated_At"] = datetime.now().isoformat()
+
+    yield "result", output
+
+
+# ==================== Generation Pool ====================
+class PriorityExecutor:
+    """
+    Thread pool that starts queued work by priority class
+
+    Like ThreadPoolExecutor, but a free worker takes the queued task with the
+    best effective rank rather than the oldest one, ranked as in
+    GenerationScheduler: the class rank minus one for every `aging_seconds`
+    it has waited, ties broken by arrival order. A batch request queued behind
+    the backlog of a running background job therefore gets the next free
+    worker. Workers are started on demand, up to max_workers.
+    """
+
+    def __init__(self, max_workers: int, aging_seconds: float, thread_name_prefix: str = "worker",
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_workers = max_workers
+        self.aging_seconds = aging_seconds
+        self.thread_name_prefix = thread_name_prefix
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._queue: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._threads: List[threading.Thread] = []
+        self._idle = 0
+
+    def submit(self, priority: Any, fn: Callable[..., Any], *args: Any) -> Future:
+        """Queue fn(*args); priority is a class name or a PriorityTicket"""
+        ticket = priority if isinstance(priority, PriorityTicket) else PriorityTicket(priority)
+        future: Future = Future()
+        with self._lock:
+            self._seq += 1
+            self._queue.append({
+                "ticket": ticket, "seq": self._seq, "enqueued": self.clock(), "future": future, "call": (fn, args)
+            })
+            if self._idle:
+                # Taken off the idle count here, so the next submit does not count on the same worker
+                self._idle -= 1
+                self._work.notify()
+            elif len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._run, name=f"{self.thread_name_prefix}_{len(self._threads)}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+        return future
+
+    def _take(self) -> Dict[str, Any]:
+        # Called with self._lock held and a non-empty queue
+        now = self.clock()
+
+        def effective_rank(task: Dict[str, Any]) -> Tuple[float, int]:
+            aging = (now - task["enqueued"]) / self.aging_seconds if self.aging_seconds > 0 else 0.0
+            return task["ticket"].rank - aging, task["seq"]
+
+        task = min(self._queue, key=effective_rank)
+        self._queue.remove(task)
+        return task
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._idle += 1
+                    self._work.wait()
+                task = self._take()
+            future = task["future"]
+            # False when the future was cancelled while queued
+            if not future.set_running_or_notify_cancel():
+                continue
+            fn, args = task["call"]
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = {priority: 0 for priority in PRIORITY_CLASSES}
+            for task in self._queue:
+                queued[task["ticket"].priority] += 1
+            return {"workers": len(self._threads), "max_workers": self.max_workers, "queued": queued}
+
+
+# Shared bounded executor: batch and file endpoints keep up to GENERATION_WORKERS
+# generations in flight, and each model is additionally capped by MODEL_CONCURRENCY.
+# Queued work is started by priority class, like the Ollama calls themselves.
+generation_executor = PriorityExecutor(GENERATION_WORKERS, PRIORITY_AGING_SECONDS, thread_name_prefix="generation")
+_model_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_model_semaphores_lock = threading.Lock()
+
+
+def get_model_semaphore(model: str) -> threading.BoundedSemaphore:
+    """Return the semaphore enforcing the concurrency limit of a model"""
+    with _model_semaphores_lock:
+        semaphore = _model_semaphores.get(model)
+        if semaphore is None:
+            limit = MODEL_CONCURRENCY.get(model, GENERATION_WORKERS)
+            semaphore = threading.BoundedSemaphore(limit)
+            _model_semaphores[model] = semaphore
+        return semaphore
+
+
+def generate_with_model_limit(
+    requirement: Dict[str, Any],
+    model: str = None,
+    priority: str = "batch",
+    cancel: Optional[CancelToken] = None
+) -> Dict[str, Any]:
+    """Generate a test case while holding a slot of the model's concurrency limit"""
+    semaphore = get_model_semaphore(model or DEFAULT_MODEL)
+    semaphore.acquire()
+    generation_queue_depth.dec()
+    try:
+        return generate_test_case_for_requirement(requirement, model, priority, cancel)
+    finally:
+        semaphore.release()
+
+
+def generate_packed_test_cases(
+    requirements: List[Dict[str, Any]],
+    model: str = None,
+    priority: str = "batch",
+    cancel: Optional[CancelToken] = None
+) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+    """
+    Generate test cases for several requirements with a single packed prompt
+
+    Cached requirements, and those an identical request is already
+    generating, are left out of the prompt and take the single path, which
+    answers them from the cache or the in-flight call and repairs missing
+    sections. The packed output is split back per requirement and repaired
+    before it is cached; every requirement whose block is missing or malformed
+    (or all of them, if the packed call fails) falls back to an individual
+    generation. Identical requests arriving meanwhile wait for the packed
+    call (generation_flights). Returns (result, error) pairs in the order of
+    the input.
+    """
+    system_prompt = build_system_prompt()
+    outcomes: List[Optional[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]] = [None] * len(requirements)
+    keys = {}
+    flights: Dict[int, InFlightCall] = {}
+    to_pack = []
+
+    # A pack of one (e.g. an invalid requirement) goes straight to the single path
+    for pos, requirement in enumerate(requirements if len(requirements) > 1 else []):
+        key = ResultCache.make_key(
+            model or DEFAULT_MODEL, system_prompt, build_generation_prompt(requirement), GENERATION_OPTIONS
+        )
+        if RESULT_CACHE_ENABLED and result_cache.get(key) is not None:
+            continue
+        call = generation_flights.lead(key, priority, cancel)
+        if call is None:
+            continue
+        keys[pos] = key
+        flights[pos] = call
+        to_pack.append(pos)
+
+    try:
+        if len(to_pack) > 1:
+            packed = [requirements[pos] for pos in to_pack]
+            ids = [requirement["REQUIREMENTS_ID"] for requirement in packed]
+            try:
+                logger.info(f"Generating {len(packed)} requirements in one packed prompt: {', '.join(map(str, ids))}")
+                generated_text = call_ollama_generate(
+                    build_packed_generation_prompt(packed), system_prompt, model, priority, cancel, "packed"
+                )
+                blocks = split_packed_output(generated_text, ids)
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                logger.warning(f"Packed generation failed, falling back to single requirements: {e}")
+                blocks = {}
+
+            for pos, req_id in zip(to_pack, ids):
+                test_case_content = blocks.get(req_id)
+                if test_case_content is None:
+                    packed_requirements_total.inc(outcome="fallback")
+                    continue
+                packed_requirements_total.inc(outcome="split")
+                test_case_content, repaired = repair_test_case(
+                    requirements[pos], test_case_content, system_prompt, model, priority, cancel
+                )
+                if RESULT_CACHE_ENABLED:
+                    result_cache.put(keys[pos], test_case_content, system_prompt)
+                generation_flights.finish(keys[pos], flights.pop(pos), test_case_content)
+                output = requirements[pos].copy()
+                output["Test_Case"] = test_case_content
+                output["Repaired_Sections"] = repaired
+                output["Generated_At"] = datetime.now().isoformat()
+                outcomes[pos] = (output, None)
+
+            missing = [str(req_id) for pos, req_id in zip(to_pack, ids) if outcomes[pos] is None]
+            if missing:
+                logger.warning(f"Packed output did not split cleanly for {', '.join(missing)}; generating them individually")
+    finally:
+        # Requests waiting on the requirements left over start over (and join the fallback below)
+        for pos, call in flights.items():
+            generation_flights.finish(keys[pos], call, error=GenerationCancelled("Packed generation did not produce this requirement"))
+
+    for pos, outcome in enumerate(outcomes):
+        if outcome is None:
+            try:
+                outcomes[pos] = (generate_test_case_for_requirement(requirements[pos], model, priority, cancel), None)
+            except Exception as e:
+                outcomes[pos] = (None, e)
+
+    return outcomes
+
+
+def generate_pack_with_model_limit(
+    pack: List[Dict[str, Any]],
+    model: str = None,
+    priority: str = "batch",
+    cancel: Optional[CancelToken] = None
+) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+    """Generate a pack of requirements while holding one slot of the model's concurrency limit"""
+    semaphore = get_model_semaphore(model or DEFAULT_MODEL)
+    semaphore.acquire()
+    generation_queue_depth.dec()
+    try:
+        return generate_packed_test_cases(pack, model, priority, cancel)
+    finally:
+        semaphore.release()
+
+
+def iter_requirement_packs(
+    indexed_requirements: Iterable[Tuple[int, Any]],
+    pack_size: int
+) -> Iterator[List[Tuple[int, Any]]]:
+    """
+    Group (index, requirement) pairs into packs of up to pack_size
+
+    Requirements sharing a PARENT_ID are packed together: a parent's pack is
+    emitted as soon as it is full. To bound the read-ahead, once
+    pack_size * GENERATION_WORKERS requirements are waiting the oldest group is
+    emitted, topped up from the next groups; the same happens at the end of the
+    input. Packs never mix prompt templates (PRODUCT_LINE). A pack never holds
+    the same REQUIREMENTS_ID twice, and invalid requirements are passed on
+    alone so they fail individually.
+    """
+    groups: "OrderedDict[Any, List[Tuple[int, Any]]]" = OrderedDict()
+    waiting = 0
+    window = pack_size * GENERATION_WORKERS
+
+    def oldest_template_groups() -> List[Any]:
+        """Oldest group first, followed by the other groups using the same template"""
+        template_name = next(iter(groups))[0]
+        return [key for key in groups if key[0] == template_name]
+
+    def take(parents: List[Any]) -> List[Tuple[int, Any]]:
+        nonlocal waiting
+        pack = []
+        ids = set()
+        for parent in parents:
+            remaining = []
+            for item in groups[parent]:
+                req_id = item[1]["REQUIREMENTS_ID"]
+                if len(pack) < pack_size and req_id not in ids:
+                    pack.append(item)
+                    ids.add(req_id)
+                else:
+                    remaining.append(item)
+            if remaining:
+                groups[parent] = remaining
+            else:
+                del groups[parent]
+            if len(pack) == pack_size:
+                break
+        waiting -= len(pack)
+        return pack
+
+    for idx, requirement in indexed_requirements:
+        if not isinstance(requirement, dict) or not validate_requirement(requirement):
+            yield [(idx, requirement)]
+            continue
+        # Requirements of different product lines use different templates and never share a pack
+        parent = (prompt_templates.for_requirement(requirement).name, requirement.get("PARENT_ID") or None)
+        groups.setdefault(parent, []).append((idx, requirement))
+        waiting += 1
+        if len(groups[parent]) >= pack_size:
+            yield take([parent])
+        while waiting >= window:
+            yield take(oldest_template_groups())
+
+    while groups:
+        yield take(oldest_template_groups())
+
+
+class BatchDeduplicator:
+    """
+    Generate each unique requirement of a batch once
+
+    Requirements are keyed by a hash of their canonicalized prompt-relevant
+    fields (whitespace collapsed, DEDUP_IGNORE_FIELDS such as REQUIREMENTS_ID
+    left out). filter() passes only the first occurrence of each key on;
+    duplicates wait for it and are answered by resolve(), or queued in ready
+    when the first occurrence already finished. Fanned-out results carry a
+    "deduplicated_from" field with the REQUIREMENTS_ID that was generated; the
+    ignored fields the prompt names (the leader's IDs) are rewritten to the
+    duplicate's own values in its Test_Case.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._leaders: Dict[int, str] = {}
+        self.ready: List[Tuple[int, Any, Optional[Dict[str, Any]], Optional[Exception]]] = []
+
+    @staticmethod
+    def key(requirement: Any) -> Optional[str]:
+        """Hash of the fields that shape the prompt, or None if the requirement is not deduplicated"""
+        if not isinstance(requirement, dict) or not validate_requirement(requirement):
+            return None
+        canonical = {
+            key: " ".join(str(value).split())
+            for key, value in requirement.items()
+            if key != "Test_Case" and key not in DEDUP_IGNORE_FIELDS and value
+        }
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def retarget(text: str, leader: Dict[str, Any], follower: Dict[str, Any]) -> str:
+        """Replace the leader's values of the ignored fields in text with the follower's"""
+        for field in sorted(DEDUP_IGNORE_FIELDS):
+            old, new = str(leader.get(field) or "").strip(), str(follower.get(field) or "").strip()
+            if old and new and old != new:
+                # Whole identifiers only: REQ-1 must not match inside REQ-10
+                text = re.sub(rf"(?<!\w){re.escape(old)}(?![\w-])", lambda _: new, text)
+        return text
+
+    @classmethod
+    def fan_out(cls, entry: Dict[str, Any], idx: int, requirement: Dict[str, Any]):
+        result, error = entry["outcome"]
+        deduplicated_requirements_total.inc()
+        if error is not None:
+            return idx, requirement, None, error
+        output = requirement.copy()
+        output["Test_Case"] = cls.retarget(result["Test_Case"], entry["requirement"], requirement)
+        output["Repaired_Sections"] = list(result.get("Repaired_Sections", []))
+        output["Generated_At"] = result["Generated_At"]
+        output["deduplicated_from"] = entry["requirement"].get("REQUIREMENTS_ID")
+        return idx, requirement, output, None
+
+    def filter(self, indexed_requirements: Iterable[Tuple[int, Any]]) -> Iterator[Tuple[int, Any]]:
+        for idx, requirement in indexed_requirements:
+            key = self.key(requirement)
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None:
+                if key is not None:
+                    self._entries[key] = {"requirement": requirement, "followers": [], "outcome": None}
+                    self._leaders[idx] = key
+                yield idx, requirement
+            elif entry["outcome"] is None:
+                entry["followers"].append((idx, requirement))
+            else:
+                self.ready.append(self.fan_out(entry, idx, requirement))
+
+    def resolve(self, idx: int, result: Optional[Dict[str, Any]], error: Optional[Exception]):
+        """Record the outcome of a generated requirement and answer the duplicates waiting for it"""
+        key = self._leaders.pop(idx, None)
+        if key is None:
+            return []
+        entry = self._entries[key]
+        entry["outcome"] = (result, error)
+        followers, entry["followers"] = entry["followers"], []
+        return [self.fan_out(entry, follower_idx, follower) for follower_idx, follower in followers]
+
+
+def iter_generation_results(
+    requirements: Iterable[Dict[str, Any]],
+    model: str = None,
+    heartbeat: Optional[float] = None,
+    priority: str = "batch",
+    admitted: Optional[AdmissionTicket] = None,
+    cancel: Optional[CancelToken] = None
+) -> Iterator[Optional[Tuple[int, Dict[str, Any], Optional[Dict[str, Any]], Optional[Exception]]]]:
+    """
+    Generate test cases concurrently and yield them in completion order
+
+    Requirements are submitted lazily so that at most GENERATION_WORKERS are in
+    flight at once. Yields (index, requirement, result, error) tuples where exactly
+    one of result/error is set; index is the position in the original input.
+    Duplicate requirements are generated once (see BatchDeduplicator). With
+    PROMPT_PACK_SIZE > 1 requirements are grouped by iter_requirement_packs and
+    each pack occupies one slot.
+
+    With a heartbeat interval, None is also yielded after new requirements were
+    submitted and whenever that many seconds pass without a completion, so
+    streaming callers can report progress and keep the connection alive.
+    If the requirements iterable raises, in-flight work is still drained and
+    yielded before the exception is re-raised.
+
+    With an admission ticket, requirements are counted against it as they are
+    read and returned to the admission controller as they complete.
+
+    Once the cancellation token fires, running generations are abandoned and
+    the remaining requirements fail fast with GenerationCancelled. If the
+    caller stops iterating, requirements not yet started are dropped.
+    """
+    if admitted is not None:
+        yield from admitted.track(
+            iter_generation_results(admitted.track_input(requirements), model, heartbeat, priority, cancel=cancel)
+        )
+        return
+
+    pending = {}
+    source = enumerate(requirements)
+    dedup = None
+    if BATCH_DEDUP_ENABLED:
+        dedup = BatchDeduplicator()
+        source = dedup.filter(source)
+    if PROMPT_PACK_SIZE > 1:
+        source = enumerate(iter_requirement_packs(source, PROMPT_PACK_SIZE))
+    exhausted = False
+    source_error = None
+
+    try:
+        while True:
+            submitted = False
+            while not exhausted and len(pending) < GENERATION_WORKERS:
+                try:
+                    idx, item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                except Exception as e:
+                    exhausted = True
+                    source_error = e
+                    break
+                generation_queue_depth.inc()
+                if PROMPT_PACK_SIZE > 1:
+                    # item is a pack of (index, requirement) pairs
+                    future = generation_executor.submit(
+                        priority, generate_pack_with_model_limit, [requirement for _, requirement in item], model, priority, cancel
+                    )
+                    pending[future] = item
+                else:
+                    future = generation_executor.submit(priority, generate_with_model_limit, item, model, priority, cancel)
+                    pending[future] = [(idx, item)]
+                submitted = True
+
+            # Duplicates of requirements that already finished
+            while dedup is not None and dedup.ready:
+                yield dedup.ready.pop(0)
+
+            if not pending:
+                if source_error is not None:
+                    raise source_error
+                return
+
+            if heartbeat is not None and submitted:
+                yield None
+
+            done, _ = wait(pending, timeout=heartbeat, return_when=FIRST_COMPLETED)
+            if not done:
+                yield None
+                continue
+            for future in done:
+                items = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    outcomes = [(None, error)] * len(items)
+                elif PROMPT_PACK_SIZE > 1:
+                    outcomes = future.result()
+                else:
+                    outcomes = [(future.result(), None)]
+                for (idx, requirement), (result, item_error) in zip(items, outcomes):
+                    yield idx, requirement, result, item_error
+                    if dedup is not None:
+                        yield from dedup.resolve(idx, result, item_error)
+    finally:
+        if pending:
+            # The caller went away: drop what has not started, abandon the rest
+            if cancel is not None:
+                cancel.cancel()
+            dropped = [future for future in pending if future.cancel()]
+            generation_queue_depth.dec(len(dropped))
+            if dropped:
+                logger.info(f"Dropped {len(dropped)} queued generation(s) of an abandoned request")
+
+
+def requirement_label(requirement: Any, idx: int) -> str:
+    """REQUIREMENTS_ID of a requirement, or its position when missing"""
+    if isinstance(requirement, dict):
+        return requirement.get('REQUIREMENTS_ID', f'index_{idx}')
+    return f'index_{idx}'
+
+
+def run_generation_batch(
+    requirements: List[Dict[str, Any]],
+    model: str = None,
+    priority: str = "batch",
+    admitted: Optional[AdmissionTicket] = None,
+    cancel: Optional[CancelToken] = None
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Generate test cases for a list of requirements, returning (results, errors) ordered by index"""
+    results = []
+    errors = []
+
+    for idx, requirement, result, error in iter_generation_results(
+        requirements, model, priority=priority, admitted=admitted, cancel=cancel
+    ):
+        req_id = requirement_label(requirement, idx)
+        if error is None:
+            logger.info(f"Successfully generated test case for requirement {idx}: {req_id}")
+            results.append({
+                "index": idx,
+                "status": "success",
+                "data": result
+            })
+        else:
+            logger.error(f"Error processing requirement {idx} ({req_id}): {error}")
+            errors.append({
+                "index": idx,
+                "status": "failed",
+                "error": str(error)
+            })
+
+    results.sort(key=lambda item: item["index"])
+    errors.sort(key=lambda item: item["index"])
+    return results, errors
+
+
+def stream_generation_events(
+    requirements: Iterable[Any],
+    model: str = None,
+    stream_tokens: bool = False,
+    priority: str = "batch",
+    admitted: Optional[AdmissionTicket] = None,
+    cancel: Optional[CancelToken] = None,
+    **fields
+) -> Iterator[str]:
+    """
+    Server-Sent Events for a sequence of requirements
+
+    Emits 'start', then 'progress' when a requirement is picked up and 'result'
+    when it finishes, and finally 'complete' (or 'error' if the input turns out
+    to be invalid part-way through). Requirements run on the generation pool and
+    results arrive in completion order; with stream_tokens they run one at a
+    time and the generated text is relayed as 'delta' events. Extra keyword
+    fields (e.g. filename) are added to the start and complete events.
+    When the client disconnects, the cancellation token is fired so the
+    Ollama work still running for the stream is abandoned.
+    """
+    def event(payload: Dict[str, Any]) -> str:
+        return f"data: {json.dumps(payload)}\n\n"
+
+    total = len(requirements) if isinstance(requirements, list) else None
+    successful = 0
+    failed = 0
+
+    try:
+        # Send initial status
+        yield event({'type': 'start', **fields, 'total': total})
+
+        if stream_tokens:
+            indexed = enumerate(admitted.track_input(requirements) if admitted is not None else requirements)
+            dedup = None
+            if BATCH_DEDUP_ENABLED:
+                dedup = BatchDeduplicator()
+                indexed = dedup.filter(indexed)
+
+            def duplicate_events():
+                # Requirements run one at a time, so duplicates always find their result ready
+                nonlocal successful, failed
+                while dedup is not None and dedup.ready:
+                    idx, requirement, result, error = dedup.ready.pop(0)
+                    if admitted is not None:
+                        admitted.complete()
+                    if error is None:
+                        successful += 1
+                        yield event({'type': 'result', 'index': idx, 'status': 'success', 'data': result})
+                    else:
+                        failed += 1
+                        yield event({
+                            'type': 'result',
+                            'index': idx,
+                            'status': 'failed',
+                            'requirement_id': requirement_label(requirement, idx),
+                            'error': str(error)
+                        })
+
+            for idx, requirement in indexed:
+                yield from duplicate_events()
+                req_id = requirement_label(requirement, idx)
+                yield event({'type': 'progress', 'index': idx, 'requirement_id': req_id, 'status': 'processing'})
+                result = None
+                error = None
+                try:
+                    for kind, payload in stream_test_case_for_requirement(requirement, model, priority, cancel):
+                        if kind == "delta":
+                            yield event({'type': 'delta', 'index': idx, 'requirement_id': req_id, 'text': payload})
+                        else:
+                            result = payload
+                    successful += 1
+                    yield event({'type': 'result', 'index': idx, 'status': 'success', 'data': result})
+                except Exception as e:
+                    error = e
+                    failed += 1
+                    yield event({'type': 'result', 'index': idx, 'status': 'failed', 'requirement_id': req_id, 'error': str(e)})
+                if admitted is not None:
+                    admitted.complete()
+                if dedup is not None:
+                    dedup.resolve(idx, result, error)
+            yield from duplicate_events()
+        else:
+            submitted = []
+
+            def track_submitted():
+                for requirement in requirements:
+                    submitted.append(requirement)
+                    yield requirement
+
+            announced = 0
+            for item in iter_generation_results(track_submitted(), model, SSE_HEARTBEAT_SECONDS, priority, admitted, cancel):
+                # Send progress updates for requirements picked up by the pool
+                while announced < len(submitted):
+                    req_id = requirement_label(submitted[announced], announced)
+                    yield event({'type': 'progress', 'index': announced, 'requirement_id': req_id, 'status': 'processing'})
+                    announced += 1
+                if item is None:
+                    # SSE comment line keeps proxies from timing out idle streams
+                    yield ": keepalive\n\n"
+                    continue
+
+                idx, requirement, result, error = item
+                if error is None:
+                    successful += 1
+                    yield event({'type': 'result', 'index': idx, 'status': 'success', 'data': result})
+                else:
+                    failed += 1
+                    yield event({
+                        'type': 'result',
+                        'index': idx,
+                        'status': 'failed',
+                        'requirement_id': requirement_label(requirement, idx),
+                        'error': str(error)
+                    })
+
+        # Send completion status
+        yield event({'type': 'complete', **fields, 'total': successful + failed, 'successful': successful, 'failed': failed})
+
+    except GeneratorExit:
+        if cancel is not None:
+            cancel.cancel()
+        raise
+    except Exception as e:
+        yield event({'type': 'error', **stream_error_fields(e)})
+    finally:
+        if admitted is not None:
+            admitted.release()
+
+
+def stream_error_fields(error: Exception) -> Dict[str, Any]:
+    """Fields of the error event/line ending a stream; admission rejections add the status they would have had"""
+    fields: Dict[str, Any] = {'error': str(error)}
+    if isinstance(error, AdmissionRejected):
+        fields['status_code'] = error.status_code
+        if error.retry_after is not None:
+            fields['retry_after'] = error.retry_after
+    return fields
+
+
+def extract_requirements(file_data: Any) -> List[Any]:
+    """
+    Extract the requirements list from a parsed JSON document
+
+    Accepts a single requirement object, an array of requirement objects, or an
+    object with a "requirements" array. Raises ValueError for any other shape.
+    """
+    if isinstance(file_data, list):
+        return file_data
+    if isinstance(file_data, dict):
+        if "requirements" in file_data:
+            requirements = file_data["requirements"]
+            if not isinstance(requirements, list):
+                raise ValueError("'requirements' field must be an array")
+            return requirements
+        return [file_data]
+    raise ValueError("JSON must be an object or array")
+
+
+class RequirementStreamParser:
+    """
+    Incremental parser yielding requirement objects from a JSON byte stream
+
+    Understands the same shapes as extract_requirements (array, single object,
+    or object with a "requirements" array) but decodes one array element at a
+    time, so memory stays flat and callers can start generating on the first
+    requirement while the rest of the upload is still being read.
+    """
+
+    def __init__(self, stream, chunk_size: int = 64 * 1024, max_bytes: int = 0):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Read the next chunk; returns False at end of stream"""
+        if self._eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            self._buf = self._buf[self._pos:] + self._text_decoder.decode(b"", final=True)
+            self._pos = 0
+            return False
+        self.bytes_read += len(chunk)
+        if self.max_bytes and self.bytes_read > self.max_bytes:
+            raise ValueError(f"File too large (max {self.max_bytes // (1024 * 1024)}MB)")
+        # Drop consumed text so the buffer only holds the value being parsed
+        self._buf = self._buf[self._pos:] + self._text_decoder.decode(chunk)
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of stream)"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            found = repr(char) if char else "end of file"
+            raise ValueError(f"Invalid JSON file: expected one of {' '.join(chars)} but found {found}")
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        """Decode one complete JSON value, reading more data until it parses"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise ValueError(f"Invalid JSON file: {e}")
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buf) and not self._eof and isinstance(value, (int, float)):
+                if self._fill():
+                    continue
+            self._pos = end
+            return value
+
+    def _array(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
+
+    def __iter__(self) -> Iterator[Any]:
+        first = self._peek()
+        if first == "[":
+            yield from self._array()
+        elif first == "{":
+            self._pos += 1
+            fields = {}
+            streamed = False
+            if self._peek() == "}":
+                self._pos += 1
+            else:
+                while True:
+                    key = self._value()
+                    self._expect(":")
+                    if key == "requirements":
+                        if self._peek() != "[":
+                            raise ValueError("'requirements' field must be an array")
+                        streamed = True
+                        yield from self._array()
+                    else:
+                        fields[key] = self._value()
+                    if self._expect(",}") == "}":
+                        break
+            if not streamed:
+                # Single requirement object
+                yield fields
+        else:
+            raise ValueError("JSON must be an object or array")
+        if self._peek():
+            raise ValueError("Invalid JSON file: extra data after the JSON document")
+
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+NDJSON_EXTENSIONS = (".jsonl", ".ndjson")
+
+
+def iter_ndjson_requirements(stream, max_bytes: int = 0) -> Iterator[Any]:
+    """
+    Yield one requirement per line of an NDJSON (JSON Lines) byte stream
+
+    Blank lines are skipped. Only the current line is held in memory, so
+    arbitrarily large inputs can be processed as they arrive.
+    """
+    bytes_read = 0
+    for line_no, line in enumerate(stream, 1):
+        bytes_read += len(line)
+        if max_bytes and bytes_read > max_bytes:
+            raise ValueError(f"File too large (max {max_bytes // (1024 * 1024)}MB)")
+        if not line.strip():
+            continue
+        try:
+            requirement = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ValueError(f"Invalid JSON on line {line_no}: {e}")
+        yield requirement
+
+
+def is_ndjson_upload(filename: str) -> bool:
+    return filename.lower().endswith(NDJSON_EXTENSIONS)
+
+
+def wants_ndjson(ndjson_input: bool = False) -> bool:
+    """
+    Whether results should be streamed back as NDJSON
+
+    Negotiated from the Accept header; without one (or with */*) the output
+    format follows the input format.
+    """
+    offered = [NDJSON_MIMETYPE, "application/json"] if ndjson_input else ["application/json", NDJSON_MIMETYPE]
+    return request.accept_mimetypes.best_match(offered, default=offered[0]) == NDJSON_MIMETYPE
+
+
+def request_priority(default: str, data: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Priority class requested by the current request
+
+    Taken from the X-Priority header, else a "priority" field of the JSON body
+    (data), the query string or the form; raises ValueError for unknown classes.
+    """
+    value = request.headers.get("X-Priority")
+    if not value and isinstance(data, dict):
+        value = data.get("priority")
+    if not value:
+        value = request.args.get("priority") or request.form.get("priority")
+    return parse_priority(value, default)
+
+
+def request_cancel_token(data: Optional[Dict[str, Any]] = None) -> CancelToken:
+    """
+    Cancellation token for the current request
+
+    The deadline, in seconds from now, is taken from the X-Deadline header,
+    else a "deadline" field of the JSON body (data), the query string or the
+    form, else DEFAULT_DEADLINE_SECONDS; raises ValueError for invalid values.
+    """
+    value = request.headers.get("X-Deadline")
+    if not value and isinstance(data, dict):
+        value = data.get("deadline")
+    if not value:
+        value = request.args.get("deadline") or request.form.get("deadline")
+    if value is None or str(value).strip() == "":
+        return CancelToken(DEFAULT_DEADLINE_SECONDS or None)
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("deadline must be a number of seconds") from None
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError("deadline must be a positive number of seconds")
+    return CancelToken(seconds)
+
+
+def detach_upload_stream(file) -> Any:
+    """
+    Take ownership of an uploaded file's stream
+
+    Flask closes request.files as soon as the view returns, which is before a
+    streamed response is consumed; the caller must close the returned stream.
+    """
+    stream = file.stream
+    file.stream = io.BytesIO()
+    return stream
+
+
+def iter_streamed_requirements(requirements: Iterable[Any], source_name: str, stream=None) -> Iterator[Any]:
+    """
+    Pass through incrementally parsed requirements
+
+    Closes the detached upload stream once parsing ends, logs the count and
+    raises if the input contained no requirements at all.
+    """
+    count = 0
+    try:
+        for requirement in requirements:
+            count += 1
+            yield requirement
+    finally:
+        if stream is not None:
+            stream.close()
+    logger.info(f"Parsed {count} requirements from {source_name}")
+    if count == 0:
+        raise ValueError(f"No requirements found in {source_name}")
+
+
+def stream_ndjson_results(
+    requirements: Iterable[Any],
+    model: str = None,
+    priority: str = "batch",
+    admitted: Optional[AdmissionTicket] = None,
+    cancel: Optional[CancelToken] = None,
+    **fields
+) -> Iterator[str]:
+    """
+    NDJSON response body for a sequence of requirements
+
+    One line per requirement as soon as it completes ({"type": "result", ...}
+    with the same fields as the SSE 'result' event), then a {"type": "complete"}
+    summary line, or {"type": "error"} if the input turns out to be invalid
+    part-way through. Extra keyword fields are added to the summary line.
+    A client disconnect fires the cancellation token.
+    """
+    successful = 0
+    failed = 0
+    try:
+        for idx, requirement, result, error in iter_generation_results(
+            requirements, model, priority=priority, admitted=admitted, cancel=cancel
+        ):
+            if error is None:
+                successful += 1
+                line = {'type': 'result', 'index': idx, 'status': 'success', 'data': result}
+            else:
+                failed += 1
+                logger.error(f"Error processing requirement {idx} ({requirement_label(requirement, idx)}): {error}")
+                line = {
+                    'type': 'result',
+                    'index': idx,
+                    'status': 'failed',
+                    'requirement_id': requirement_label(requirement, idx),
+                    'error': str(error)
+                }
+            yield json.dumps(line) + "\n"
+
+        yield json.dumps({'type': 'complete', **fields, 'total': successful + failed, 'successful': successful, 'failed': failed}) + "\n"
+
+    except GeneratorExit:
+        if cancel is not None:
+            cancel.cancel()
+        raise
+    except Exception as e:
+        yield json.dumps({'type': 'error', **stream_error_fields(e)}) + "\n"
+
+
+def ndjson_response(
+    requirements: Iterable[Any],
+    model: str = None,
+    priority: str = "batch",
+    admitted: Optional[AdmissionTicket] = None,
+    cancel: Optional[CancelToken] = None,
+    **fields
+) -> Response:
+    response = Response(
+        stream_ndjson_results(requirements, model, priority, admitted, cancel, **fields),
+        mimetype=NDJSON_MIMETYPE,
+        headers={'Cache-Control': 'no-cache'}
+    )
+    return release_on_close(response, admitted)
+
+
+def release_on_close(response: Response, admitted: Optional[AdmissionTicket]) -> Response:
+    """Return admitted capacity even if the client goes away before the body is iterated"""
+    if admitted is not None:
+        response.call_on_close(admitted.release)
+    return response
+
+
+# ==================== Job Queue ====================
+class JobQueue:
+    """
+    Durable queue of batch generation jobs stored in SQLite
+
+    Every requirement of a job is stored as its own row and its result is written
+    as soon as it completes, so GET /jobs/<id> can report partial results and a
+    restarted server resumes only the unfinished items. Workers claim a job with
+    a lease; jobs whose lease expired (e.g. the server died) are claimed again.
+    Lease owners are "host:pid:boot:thread", so at startup the jobs of a dead
+    process on this host (or of an earlier boot of this pid) are requeued right
+    away instead of after the lease expires.
+    """
+
+    def __init__(self, db_path: Path, workers: int, poll_interval: float, lease_seconds: int):
+        self.db_path = db_path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.host = socket.gethostname()
+        self.boot_id = uuid.uuid4().hex[:12]
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _init_db(self) -> None:
+        if self._initialized:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        db = self._connect()
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT, filename TEXT, model TEXT, total INTEGER, "
+                "created_at TEXT, started_at TEXT, finished_at TEXT, lease_owner TEXT, lease_expires REAL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS job_items ("
+                "job_id TEXT, idx INTEGER, requirement TEXT, status TEXT, result TEXT, error TEXT, "
+                "PRIMARY KEY (job_id, idx))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            # Databases created before priority classes existed
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            if "priority" not in columns:
+                db.execute("ALTER TABLE jobs ADD COLUMN priority TEXT")
+        finally:
+            db.close()
+        self._initialized = True
+
+    def submit(self, requirements: List[Any], model: str = None, filename: str = None, priority: str = "background") -> str:
+        """Persist a new job and wake a worker; returns the job id"""
+        self._init_db()
+        job_id = uuid.uuid4().hex
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "INSERT INTO jobs (id, status, filename, model, priority, total, created_at) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, filename, model, priority, len(requirements), datetime.now().isoformat())
+            )
+            db.executemany(
+                "INSERT INTO job_items (job_id, idx, requirement, status) VALUES (?, ?, ?, 'queued')",
+                [(job_id, idx, json.dumps(requirement)) for idx, requirement in enumerate(requirements)]
+            )
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        logger.info(f"Queued job {job_id} with {len(requirements)} requirements")
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str, include_results: bool = True) -> Optional[Dict[str, Any]]:
+        """Return job status, progress counts and (partial) results, or None if unknown"""
+        self._init_db()
+        db = self._connect()
+        try:
+            job = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = {row["status"]: row["n"] for row in db.execute(
+                "SELECT status, COUNT(*) AS n FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)
+            )}
+            response = {
+                "job_id": job["id"],
+                "status": job["status"],
+                "filename": job["filename"],
+                "model": job["model"] or DEFAULT_MODEL,
+                "priority": job["priority"] or "background",
+                "total": job["total"],
+                "completed": counts.get("success", 0) + counts.get("failed", 0),
+                "successful": counts.get("success", 0),
+                "failed": counts.get("failed", 0),
+                "pending": counts.get("queued", 0),
+                "created_at": job["created_at"],
+                "started_at": job["started_at"],
+                "finished_at": job["finished_at"],
+            }
+            if include_results:
+                results = []
+                errors = []
+                for row in db.execute(
+                    "SELECT idx, status, result, error FROM job_items "
+                    "WHERE job_id = ? AND status != 'queued' ORDER BY idx", (job_id,)
+                ):
+                    if row["status"] == "success":
+                        results.append({"index": row["idx"], "status": "success", "data": json.loads(row["result"])})
+                    else:
+                        errors.append({"index": row["idx"], "status": "failed", "error": row["error"]})
+                response["results"] = results
+                response["errors"] = errors
+            return response
+        finally:
+            db.close()
+
+    def depth(self) -> Dict[str, int]:
+        """Number of queued/running jobs and pending requirements"""
+        self._init_db()
+        db = self._connect()
+        try:
+            jobs = {row["status"]: row["n"] for row in db.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs WHERE status IN ('queued', 'running') GROUP BY status"
+            )}
+            pending = db.execute(
+                "SELECT COUNT(*) FROM job_items WHERE status = 'queued'"
+            ).fetchone()[0]
+        finally:
+            db.close()
+        return {
+            "queued_jobs": jobs.get("queued", 0),
+            "running_jobs": jobs.get("running", 0),
+            "pending_requirements": pending,
+        }
+
+    def _claim(self, owner: str) -> Optional[sqlite3.Row]:
+        """Atomically take the oldest queued job (or one whose lease expired)"""
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            job = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY created_at LIMIT 1", (time.time(),)
+            ).fetchone()
+            if job is None:
+                db.execute("COMMIT")
+                return None
+            if job["status"] == "running":
+                logger.warning(f"Resuming job {job['id']} after its lease expired")
+            db.execute(
+                "UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?, "
+                "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (owner, time.time() + self.lease_seconds, datetime.now().isoformat(), job["id"])
+            )
+            db.execute("COMMIT")
+            return job
+        finally:
+            db.close()
+
+    def _record(self, job_id: str, owner: str, idx: int, result: Optional[Dict[str, Any]], error: Optional[Exception]) -> None:
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            if error is None:
+                db.execute(
+                    "UPDATE job_items SET status = 'success', result = ? WHERE job_id = ? AND idx = ?",
+                    (json.dumps(result), job_id, idx)
+                )
+            else:
+                db.execute(
+                    "UPDATE job_items SET status = 'failed', error = ? WHERE job_id = ? AND idx = ?",
+                    (str(error), job_id, idx)
+                )
+            # Every completed item renews the lease
+            db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+                (time.time() + self.lease_seconds, job_id, owner)
+            )
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def _finish(self, job_id: str, owner: str) -> None:
+        db = self._connect()
+        try:
+            db.execute(
+                "UPDATE jobs SET status = 'completed', finished_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND lease_owner = ?",
+                (datetime.now().isoformat(), job_id, owner)
+            )
+        finally:
+            db.close()
+
+    def _process(self, job: sqlite3.Row, owner: str) -> None:
+        job_id = job["id"]
+        db = self._connect()
+        try:
+            items = db.execute(
+                "SELECT idx, requirement FROM job_items WHERE job_id = ? AND status = 'queued' ORDER BY idx",
+                (job_id,)
+            ).fetchall()
+        finally:
+            db.close()
+
+        logger.info(f"Processing job {job_id}: {len(items)} of {job['total']} requirements pending")
+        positions = [item["idx"] for item in items]
+        requirements = (json.loads(item["requirement"]) for item in items)
+
+        priority = job["priority"] or "background"
+        for position, _, result, error in iter_generation_results(requirements, job["model"], priority=priority):
+            idx = positions[position]
+            if error is not None:
+                logger.error(f"Job {job_id}: requirement {idx} failed: {error}")
+            self._record(job_id, owner, idx, result, error)
+            admission.record_completion()
+
+        self._finish(job_id, owner)
+        logger.info(f"Job {job_id} completed")
+
+    def owner_token(self, worker: str) -> str:
+        return f"{self.host}:{os.getpid()}:{self.boot_id}:{worker}"
+
+    @staticmethod
+    def _process_alive(pid: int) -> bool:
+        if os.name == "nt":
+            # os.kill(pid, 0) would terminate the process on Windows; rely on the lease
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _owner_alive(self, owner: Optional[str]) -> bool:
+        """Whether a lease owner may still be running (unknown formats and other hosts count as alive)"""
+        parts = (owner or "").split(":", 3)
+        if len(parts) != 4 or parts[0] != self.host or not parts[1].isdigit():
+            return True
+        pid, boot_id = int(parts[1]), parts[2]
+        if pid == os.getpid():
+            return boot_id == self.boot_id
+        return self._process_alive(pid)
+
+    def reclaim_orphaned_jobs(self) -> int:
+        """Requeue running jobs whose lease owner is a process on this host that no longer exists"""
+        self._init_db()
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            orphaned = [
+                row["id"] for row in db.execute("SELECT id, lease_owner FROM jobs WHERE status = 'running'")
+                if not self._owner_alive(row["lease_owner"])
+            ]
+            db.executemany(
+                "UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires = NULL WHERE id = ?",
+                [(job_id,) for job_id in orphaned]
+            )
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        for job_id in orphaned:
+            logger.warning(f"Requeued job {job_id}: its worker process is gone")
+        return len(orphaned)
+
+    def _worker_loop(self) -> None:
+        owner = self.owner_token(threading.current_thread().name)
+        while True:
+            try:
+                job = self._claim(owner)
+                if job is None:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+                self._process(job, owner)
+            except Exception as e:
+                logger.error(f"Job worker error: {e}", exc_info=True)
+                time.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        """Start the background workers (idempotent)"""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._init_db()
+            self.reclaim_orphaned_jobs()
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Started {self.workers} job worker(s) on {self.db_path}")
 
-Please generate a comprehensive test case that includes:
-1. Test Case Title: A clear, concise title
-2. Objective: What this test case verifies
-3. References: Requirement ID/Title; related SRS/TRD/QA Manual sections
-4. Preconditions: Any setup required before test execution (equipment, configuration, model, battery type, protocol, safety)
-5. Test Steps: Detailed numbered steps with actions and expected results (use observable outputs, telemetry, indicators, logs)
-6. Expected Result: The final expected state/output with specific pass/fail criteria
-7. Postconditions: Any cleanup or state verification after test
-8. Test Data: Specific values, ranges, or parameters used (cover both 10A/20A, VRLA/LiFePO4 if relevant)
-9. Edge Cases: Any edge cases, boundary conditions, or negative scenarios tested (e.g., transient events, comms loss, hot-swap, self-test timing)
-10. Observability: What to check via GUI/EtherNet/IP/Modbus, LED states, event logs, alarms, PC shutdown sequencing
-11. Traceability: Requirement-to-Test mapping notes
 
-Format the response as a clear, structured text that describes the test case in detail.
-Do NOT use markdown formatting or code blocks.
-Do NOT include any explanation or preamble - just the test case content."""
+job_queue = JobQueue(JOBS_DB_FILE, JOB_WORKERS, JOB_POLL_INTERVAL, JOB_LEASE_SECONDS)
 
-    return prompt
 
-#call the ollama api to generate the test case and return the generated text 
-def call_ollama_generate(prompt: str, system_prompt: str, model: str = None) -> str:
-    """Call Ollama API to generate test case"""
-    model = model or DEFAULT_MODEL
-    
-    try:
-        url = f"{OLLAMA_BASE_URL}/api/generate"
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "system": system_prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "top_k": 40,
-                "top_p": 0.9
-            }
-        }
-        if debug_mode:
-            print(f"Calling Ollama API with model: {model}")
-            print(f"Payload: {json.dumps(payload, indent=2)}")
-        logger.info(f"Calling Ollama API with model: {model}")
-        response = requests.post(url, json=payload, timeout=OLLAMA_TIMEOUT)
-        response.raise_for_status()
-        
-        data = response.json()
-        generated_text = data.get("response", "").strip()
-        
-        if debug_mode:
-            print(f"Generated text: {generated_text}")
-        logger.info("Test case generated successfully")
-        return generated_text
-        
-    except requests.exceptions.Timeout:
-        raise Exception(f"Ollama API timeout after {OLLAMA_TIMEOUT} seconds")
-    except requests.exceptions.ConnectionError:
-        raise Exception(f"Could not connect to Ollama at {OLLAMA_BASE_URL}")
-    except Exception as e:
-        raise Exception(f"Ollama API error: {str(e)}")
+# Gauges read from the components at scrape time
+Gauge("testcase_generations_in_flight", "Generations currently running on each Ollama backend", ("backend",),
+      callback=lambda: {(url, ): b.generations_in_flight for url, b in list(ollama_transport.backends.items())})
+Gauge("testcase_backend_circuit_open", "Circuit breaker state per backend (0 closed, 0.5 half-open, 1 open)", ("backend",),
+      callback=lambda: {(url, ): {"closed": 0, "half_open": 0.5, "open": 1}[b.circuit] for url, b in list(ollama_transport.backends.items())})
+Gauge("testcase_concurrency_limit", "Adaptive concurrency limit per backend and model", ("backend", "model"),
+      callback=lambda: {(url, model): limit.limit for url, b in list(ollama_transport.backends.items()) for model, limit in list(b.limits.items())})
+Gauge("testcase_concurrency_baseline_seconds_per_token", "Baseline latency per generated token of the adaptive limit", ("backend", "model"),
+      callback=lambda: {(url, model): limit.baseline for url, b in list(ollama_transport.backends.items())
+                        for model, limit in list(b.limits.items()) if limit.baseline is not None})
+Gauge("testcase_ollama_retry_budget", "Retries currently allowed by the retry budget",
+      callback=lambda: {(): retry_budget.stats()["balance"]})
+Gauge("testcase_ollama_connections_in_use", "Pooled HTTP connections in use per backend", ("backend",),
+      callback=lambda: {(url, ): b.in_flight for url, b in list(ollama_transport.backends.items())})
+Gauge("testcase_job_queue_depth", "Jobs and requirements waiting in the job queue", ("kind",),
+      callback=lambda: {(kind, ): value for kind, value in job_queue.depth().items()})
+Counter("testcase_result_cache_lookups_total", "Result cache lookups by outcome", ("result",),
+      callback=lambda: {(name, ): result_cache.stats()[name] for name in ("memory_hits", "disk_hits", "misses")})
+Gauge("testcase_result_cache_hit_ratio", "Share of result cache lookups served from the cache",
+      callback=lambda: {(): result_cache.stats()["hit_ratio"]})
+Gauge("testcase_single_flight_in_flight", "Distinct generations in flight that identical requests can join",
+      callback=lambda: {(): generation_flights.stats()["in_flight"]})
+Counter("testcase_single_flight_shared_total", "Requests that waited for an identical in-flight generation instead of calling Ollama",
+      callback=lambda: {(): generation_flights.shared})
+Gauge("testcase_scheduler_waiting", "Generations waiting for a scheduler slot, by priority class", ("priority",),
+      callback=lambda: {(priority, ): n for priority, n in generation_scheduler.stats()["waiting"].items()})
+Gauge("testcase_scheduler_busy_slots", "Scheduler slots currently running a generation",
+      callback=lambda: {(): generation_scheduler.stats()["busy"]})
+Gauge("testcase_admission_in_flight_requirements", "Admitted requirements of synchronous and streaming requests not completed yet",
+      callback=lambda: {(): admission.stats()["in_flight_requirements"]})
+Gauge("testcase_requirement_throughput", "Requirements completed per second over the throughput window",
+      callback=lambda: {(): admission.throughput()})
 
-def validate_requirement(data: Dict[str, Any]) -> bool:
-    """Validate that the requirement has required fields"""
-    required_fields = ["REQUIREMENTS_ID", "DESCRIPTION", "CATEGORY"]
-    return all(field in data for field in required_fields)
 
-#consolidate the prompt, call to ollama, and return the test case
-#output is an array or results with test cases
-def generate_test_case_for_requirement(requirement: Dict[str, Any], model: str = None) -> Dict[str, Any]:
-    """Generate a test case for a single requirement"""
-    
-    if not validate_requirement(requirement):
-        raise ValueError("Requirement missing required fields: REQUIREMENTS_ID, DESCRIPTION, CATEGORY")
-    
-    # Build prompts
-    system_prompt       = build_system_prompt()
-    generation_prompt   = build_generation_prompt(requirement)
-    
-    # Generate test case using Ollama
-    test_case_content = call_ollama_generate(generation_prompt, system_prompt, model)
-    
-    # Create output with test case
-    output = requirement.copy()
-    output["Test_Case"] = test_case_content
-    output["Generated_At"] = datetime.now().isoformat()
-    
-    return output
+def start_background_services() -> None:
+    """Start the background threads of the server"""
+    model_warmup.start()
+    backend_monitor.start()
+    job_queue.start()
 
 
 # ==================== API Endpoints ====================
+@app.before_request
+def start_request_timer():
+    request.environ["testcase.started"] = time.monotonic()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = request.environ.get("testcase.started")
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    http_requests_total.inc(route=route, method=request.method, status=response.status_code)
+    if started is not None:
+        http_request_duration.observe(time.monotonic() - started, route=route, method=request.method)
+    return response
+
+
+#prometheus text exposition of the server metrics
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 #just show the local OLLAMA API is active
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    try:
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
-        if response.status_code == 200:
-            return jsonify({
-                "status": "healthy",
-                "ollama": "connected",
-                "timestamp": datetime.now().isoformat()
-            }), 200
-    except:
-        return jsonify({
-            "status": "unhealthy",
-            "ollama": "disconnected",
-            "timestamp": datetime.now().isoformat()
-        }), 503
-    
+    """Health check endpoint (served from the background backend status snapshot)"""
+    snapshot = backend_monitor.snapshot()
+    healthy = snapshot["connected"]
     return jsonify({
-        "status": "unhealthy",
-        "ollama": "disconnected",
+        "status": "healthy" if healthy else "unhealthy",
+        "ollama": "connected" if healthy else "disconnected",
+        "backends": {
+            url: "connected" if status["connected"] else "disconnected"
+            for url, status in snapshot["backends"].items()
+        },
+        "warmup": model_warmup.state,
+        "warmup_failed": model_warmup.failures(),
+        "age_seconds": snapshot["age_seconds"],
         "timestamp": datetime.now().isoformat()
-    }), 503
+    }), 200 if healthy else 503
+
+#liveness: the process is up and serving requests; never touches Ollama
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness probe"""
+    return jsonify({"status": "alive"}), 200
+
+#readiness: at least one backend answered in the latest status snapshot and the models are warm
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe"""
+    snapshot = backend_monitor.snapshot()
+    warm = model_warmup.ready
+    ready = snapshot["connected"] and warm
+    return jsonify({
+        "status": "ready" if ready else "not_ready",
+        "warmup": model_warmup.state,
+        "warmup_failed": model_warmup.failures(),
+        "age_seconds": snapshot["age_seconds"]
+    }), 200 if ready else 503
 
 #list all the models of ollama available on the system server
 @app.route('/models', methods=['GET'])
 def list_models():
-    """List available Ollama models"""
-    try:
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        models = [model['name'] for model in data.get('models', [])]
-        return jsonify({
-            "models": models,
-            "default_model": DEFAULT_MODEL
-        }), 200
-    except Exception as e:
+    """List available Ollama models (union over all backends)"""
+    snapshot = backend_monitor.snapshot()
+    if not snapshot["connected"]:
         return jsonify({
-            "error": str(e),
-            "default_model": DEFAULT_MODEL
+            "error": "Could not connect to any Ollama backend",
+            "default_model": DEFAULT_MODEL,
+            "age_seconds": snapshot["age_seconds"]
         }), 503
+    return jsonify({
+        "models": snapshot["models"],
+        "loaded_models": {
+            url: status["loaded_models"] for url, status in snapshot["backends"].items()
+        },
+        "default_model": DEFAULT_MODEL,
+        "age_seconds": snapshot["age_seconds"]
+    }), 200
+
+#report pool usage of the shared Ollama transport
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Runtime statistics of the server components"""
+    return jsonify({
+        "transport": ollama_transport.stats(),
+        "cache": result_cache.stats(),
+        "single_flight": generation_flights.stats(),
+        "scheduler": generation_scheduler.stats(),
+        "generation_pool": generation_executor.stats(),
+        "admission": admission.stats(),
+        "retry_budget": retry_budget.stats(),
+        "hedging": hedge_policy.stats(),
+        "warmup": model_warmup.stats(),
+        "jobs": job_queue.depth(),
+        "prompt_templates": prompt_templates.describe(),
+        "timestamp": datetime.now().isoformat()
+    }), 200
 
 #create an automatic route to home page as a list of available models
 @app.route('/', methods=['GET'])
 def home():
     """Home page"""
 
-    #get list of models from ollama
-    response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=10)
-    data = response.json()
-    models = [model['name'] for model in data.get('models', [])]
+    #get list of models from the cached backend status (empty while Ollama is down)
+    models = backend_monitor.snapshot()["models"]
 
     return jsonify({
         "message": "Welcome to the Test Case API",
         "available_routes": [
             {"route": "/health", "method": "GET"},
+            {"route": "/health/live", "method": "GET"},
+            {"route": "/health/ready", "method": "GET"},
             {"route": "/models", "method": "GET"},
             {"route": "/generate", "method": "POST"},
             {"route": "/generate/batch", "method": "POST"},
+            {"route": "/jobs", "method": "POST"},
+            {"route": "/jobs/<job_id>", "method": "GET"},
+            {"route": "/stats", "method": "GET"},
+            {"route": "/metrics", "method": "GET"},
+            {"route": "/admin/warmup", "method": "POST"},
             {"route": f"/{models}", "method": "GET"},
         ],
     }), 200
@@ -309,8 +4494,15 @@ def generate_single():
         "VERIFICATION_PLAN": "...",
         "VALIDATION_CRITERIA": "...",
         "Test_Case": "",
-        "model": "optional-model-name"
+        "model": "optional-model-name",
+        "priority": "interactive",
+        "deadline": 60
     }
+
+    "priority" (or the X-Priority header) selects the scheduling class:
+    interactive (default), batch or background. "deadline" (or the X-Deadline
+    header) is the number of seconds after which generation is abandoned with
+    a 504.
     """
     try:
         data = request.get_json()
@@ -318,8 +4510,12 @@ def generate_single():
         if not data:
             return jsonify({"error": "No JSON body provided"}), 400
         
-        # Extract optional model parameter
+        # Extract optional model and priority parameters
         model = data.pop("model", None)
+        priority = request_priority("interactive", data)
+        cancel = request_cancel_token(data)
+        data.pop("priority", None)
+        data.pop("deadline", None)
         
         # Validate requirement
         if not validate_requirement(data):
@@ -329,10 +4525,17 @@ def generate_single():
             }), 400
         
         # Generate test case
-        result = generate_test_case_for_requirement(data, model)
+        admission.admit_backends(model)
+        with admission.admit(1) as admitted:
+            result = generate_test_case_for_requirement(data, model, priority, cancel)
+            admitted.complete()
         
         return jsonify(result), 200
         
+    except (AdmissionRejected, OllamaUnavailable):
+        raise
+    except GenerationCancelled as e:
+        return jsonify({"error": str(e)}), 504
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
@@ -352,43 +4555,59 @@ def generate_batch():
             {requirement object 2},
             ...
         ],
-        "model": "optional-model-name"
+        "model": "optional-model-name",
+        "priority": "batch"
     }
+
+    "priority" (or the X-Priority header) selects the scheduling class:
+    interactive, batch (default) or background. With "deadline" (or the
+    X-Deadline header) requirements still unfinished after that many seconds
+    fail with "Deadline exceeded".
+
+    NDJSON: with Content-Type application/x-ndjson the body is one requirement
+    object per line (model in the query string). Results are then streamed
+    back one JSON object per line as each requirement completes, followed by
+    a summary line. JSON bodies get the same NDJSON output with
+    Accept: application/x-ndjson.
     """
     try:
-        data = request.get_json()
-        
-        if not data or "requirements" not in data:
-            return jsonify({"error": "No 'requirements' array in JSON body"}), 400
-        
-        requirements = data.get("requirements", [])
-        model = data.get("model", None)
-        
-        if not isinstance(requirements, list):
-            return jsonify({"error": "'requirements' must be an array"}), 400
-        
+        if request.mimetype == NDJSON_MIMETYPE:
+            model = request.args.get('model', None)
+            priority = request_priority("batch")
+            cancel = request_cancel_token()
+            requirements = iter_streamed_requirements(
+                iter_ndjson_requirements(request.stream, MAX_STREAM_FILE_SIZE_MB * 1024 * 1024),
+                "request body"
+            )
+            if wants_ndjson(ndjson_input=True):
+                admission.admit_backends(model)
+                return ndjson_response(requirements, model, priority, admission.admit(), cancel)
+            requirements = list(requirements)
+        else:
+            data = request.get_json()
+
+            if not data or "requirements" not in data:
+                return jsonify({"error": "No 'requirements' array in JSON body"}), 400
+
+            requirements = data.get("requirements", [])
+            model = data.get("model", None)
+            priority = request_priority("batch", data)
+            cancel = request_cancel_token(data)
+
+            if not isinstance(requirements, list):
+                return jsonify({"error": "'requirements' must be an array"}), 400
+
         if len(requirements) == 0:
             return jsonify({"error": "requirements array is empty"}), 400
-        
-        # Generate test cases for each requirement
-        results = []
-        errors = []
-        
-        for idx, requirement in enumerate(requirements):
-            try:
-                result = generate_test_case_for_requirement(requirement, model)
-                results.append({
-                    "index": idx,
-                    "status": "success",
-                    "data": result
-                })
-            except Exception as e:
-                logger.error(f"Error processing requirement {idx}: {e}")
-                errors.append({
-                    "index": idx,
-                    "status": "failed",
-                    "error": str(e)
-                })
+
+        admission.admit_backends(model)
+        admitted = admission.admit(len(requirements))
+        if wants_ndjson():
+            return ndjson_response(requirements, model, priority, admitted, cancel)
+
+        # Generate test cases concurrently (results keyed by original index)
+        with admitted:
+            results, errors = run_generation_batch(requirements, model, priority, admitted, cancel)
         
         return jsonify({
             "total": len(requirements),
@@ -398,6 +4617,10 @@ def generate_batch():
             "errors": errors
         }), 200 if len(errors) == 0 else 207
         
+    except AdmissionRejected:
+        raise
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error in batch generation: {e}")
         return jsonify({"error": str(e)}), 500
@@ -415,8 +4638,16 @@ def generate_stream():
             {requirement object 2},
             ...
         ],
-        "model": "optional-model-name"
+        "model": "optional-model-name",
+        "stream_tokens": false,
+        "deadline": 300
     }
+
+    With "stream_tokens": true each requirement's text is relayed as it is
+    generated through 'delta' events, followed by the usual 'result' event.
+    Closing the connection abandons the Ollama work of the stream; requirements
+    unfinished after "deadline" (or X-Deadline) seconds fail with
+    "Deadline exceeded".
     """
     
     # Get request data before the generator function
@@ -431,6 +4662,9 @@ def generate_stream():
         
         requirements = data.get("requirements", [])
         model = data.get("model", None)
+        priority = request_priority("batch", data)
+        cancel = request_cancel_token(data)
+        stream_tokens = str(data.get("stream_tokens", STREAM_TOKENS_DEFAULT)).lower() == "true"
         
         if not isinstance(requirements, list):
             return Response(
@@ -443,53 +4677,19 @@ def generate_stream():
                 f"data: {json.dumps({'error': 'requirements array is empty'})}\n\n",
                 mimetype='text/event-stream'
             )
+
+        admission.admit_backends(model)
+        admitted = admission.admit(len(requirements))
+    except AdmissionRejected:
+        raise
     except Exception as e:
         return Response(
             f"data: {json.dumps({'error': str(e)})}\n\n",
             mimetype='text/event-stream'
         )
 
-    def generate_events():
-        try:
-            # Send initial status
-            yield f"data: {json.dumps({'type': 'start', 'total': len(requirements)})}\n\n"
-            
-            successful = 0
-            failed = 0
-            
-            for idx, requirement in enumerate(requirements):
-                req_id = requirement.get("REQUIREMENTS_ID", f"index_{idx}")
-                
-                try:
-                    # Send progress update
-                    yield f"data: {json.dumps({'type': 'progress', 'index': idx, 'requirement_id': req_id, 'status': 'processing'})}\n\n"
-                    
-                    # Generate test case
-                    result = generate_test_case_for_requirement(requirement, model)
-                    successful += 1
-                    
-                    # Send result
-                    yield f"data: {json.dumps({'type': 'result', 'index': idx, 'status': 'success', 'data': result})}\n\n"
-                    
-                except Exception as e:
-                    failed += 1
-                    error_result = {
-                        'type': 'result',
-                        'index': idx,
-                        'status': 'failed',
-                        'requirement_id': req_id,
-                        'error': str(e)
-                    }
-                    yield f"data: {json.dumps(error_result)}\n\n"
-            
-            # Send completion status
-            yield f"data: {json.dumps({'type': 'complete', 'total': len(requirements), 'successful': successful, 'failed': failed})}\n\n"
-            
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
-    
-    return Response(
-        generate_events(),
+    return release_on_close(Response(
+        stream_generation_events(requirements, model, stream_tokens, priority, admitted, cancel),
         mimetype='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
@@ -497,7 +4697,7 @@ def generate_stream():
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Headers': 'Cache-Control'
         }
-    )
+    ), admitted)
 
 @app.route('/generate/file', methods=['POST'])
 def generate_from_file():
@@ -517,6 +4717,10 @@ def generate_from_file():
     1. A single requirement object
     2. An array of requirement objects
     3. An object with a "requirements" key containing an array
+    or be a .jsonl/.ndjson file with one requirement object per line.
+
+    NDJSON uploads (or Accept: application/x-ndjson) get their results streamed
+    back one JSON object per line as each requirement completes.
     """
     try:
         if 'file' not in request.files:
@@ -525,6 +4729,8 @@ def generate_from_file():
         
         file = request.files['file']
         model = request.form.get('model', None)
+        priority = request_priority("batch")
+        cancel = request_cancel_token()
 
         logger.info(f"Processing file upload: {file.filename}, model: {model or 'default'}")
 
@@ -537,9 +4743,9 @@ def generate_from_file():
             logger.warning("Empty filename in file upload")
             return jsonify({"error": "No selected file"}), 400
         
-        if not file.filename.endswith('.json'):
+        if not file.filename.endswith('.json') and not is_ndjson_upload(file.filename):
             logger.warning(f"Invalid file type uploaded: {file.filename}")
-            return jsonify({"error": "File must be a JSON file"}), 400
+            return jsonify({"error": "File must be a JSON or NDJSON (.jsonl/.ndjson) file"}), 400
         
         # Check file size
         file.seek(0, os.SEEK_END)
@@ -552,15 +4758,34 @@ def generate_from_file():
             }), 413
         
         file.seek(0)
+
+        # NDJSON output: parse incrementally and send one line per completed requirement
+        ndjson_input = is_ndjson_upload(file.filename)
+        if wants_ndjson(ndjson_input):
+            logger.info(f"Streaming NDJSON results for {file.filename}")
+            admission.admit_backends(model)
+            admitted = admission.admit()
+            stream = detach_upload_stream(file)
+            parsed = iter_ndjson_requirements(stream) if ndjson_input else RequirementStreamParser(stream)
+            return ndjson_response(
+                iter_streamed_requirements(parsed, file.filename, stream), model, priority, admitted, cancel,
+                filename=file.filename
+            )
         
         # Read and parse JSON
         try:
-            content = file.read().decode('utf-8')
-            file_data = json.loads(content)
+            if ndjson_input:
+                file_data = list(iter_ndjson_requirements(file.stream))
+            else:
+                content = file.read().decode('utf-8')
+                file_data = json.loads(content)
             logger.info("Successfully parsed JSON file")
         except json.JSONDecodeError as e:
             logger.error(f"JSON parsing error: {str(e)}")
             return jsonify({"error": f"Invalid JSON file: {str(e)}"}), 400
+        except ValueError as e:
+            logger.error(f"NDJSON parsing error: {str(e)}")
+            return jsonify({"error": str(e)}), 400
         
         # Handle different JSON structures
         requirements = []
@@ -588,44 +4813,18 @@ def generate_from_file():
         if len(requirements) == 0:
             logger.warning("No requirements found in uploaded file")
             return jsonify({"error": "No requirements found in file"}), 400
-        
-        # Generate test cases
-        results = []
-        errors = []
 
-        logger.info(f"Starting test case generation for {len(requirements)} requirements")
+        admission.admit_backends(model)
+        admitted = admission.admit(len(requirements))
+        
+        logger.info(f"Starting test case generation for {len(requirements)} requirements ({GENERATION_WORKERS} workers)")
         
         if debug_mode:
             print(f"Processing {len(requirements)} requirements from file")
         
-        for idx, requirement in enumerate(requirements):
-            req_id = requirement.get('REQUIREMENTS_ID', f'index_{idx}')
-            logger.info(f"Processing requirement {idx}: {req_id}")
-            
-            if debug_mode:
-                print(f"Processing requirement {idx}: {requirement.get('REQUIREMENTS_ID', 'N/A')}")
-            try:
-                result = generate_test_case_for_requirement(requirement, model)
-                logger.info(f"Successfully generated test case for requirement {idx}: {req_id}")
-                
-                if debug_mode:
-                    print(f"Generated test case for requirement {idx}")
-                    print(f"Generated test case: {result}")
-                results.append({
-                    "index": idx,
-                    "status": "success",
-                    "data": result
-                })
-                if debug_mode:
-                    print(f"Successfully processed requirement {idx}")  
-
-            except Exception as e:
-                logger.error(f"Failed to generate test case for requirement {idx} ({req_id}): {str(e)}")
-                errors.append({
-                    "index": idx,
-                    "status": "failed",
-                    "error": str(e)
-                })
+        # Generate test cases concurrently (results keyed by original index)
+        with admitted:
+            results, errors = run_generation_batch(requirements, model, priority, admitted, cancel)
         
         logger.info(f"Completed processing {len(requirements)} requirements. Success: {len(results)}, Failed: {len(errors)}")
         
@@ -644,6 +4843,10 @@ def generate_from_file():
         logger.info(f"Returning response with status code {status_code}")
         return jsonify(response_data), status_code
         
+    except AdmissionRejected:
+        raise
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Unexpected error in generate_from_file: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
@@ -653,128 +4856,86 @@ def generate_from_file():
 def generate_from_file_stream():
     """
     Generate test cases from an uploaded JSON file with streaming response
+
+    The file is parsed incrementally (limit via MAX_STREAM_FILE_SIZE_MB,
+    unlimited by default). The file can be a multipart "file" part (.json, or
+    .jsonl/.ndjson with one requirement per line), or the raw request body with
+    Content-Type application/json or application/x-ndjson; in that case model,
+    stream_tokens and filename are taken from the query string. Only the raw
+    body is streamed: generation starts on the first requirement while the rest
+    is still being sent, and memory does not grow with file size. A multipart
+    part is read in full by Werkzeug (into a temporary file once it is large)
+    before this view runs. The 'start' event has "total": null because the
+    count is only known once the whole file was read.
+
+    Set the form field stream_tokens=true to receive 'delta' events with the
+    text of each requirement as it is generated. Closing the connection or
+    passing the deadline (X-Deadline) abandons the remaining Ollama work.
     """
     
     # Get request data before the generator function
+    upload = None
     try:
-        if 'file' not in request.files:
+        if 'file' in request.files:
+            file = request.files['file']
+            model = request.form.get('model', None)
+            stream_tokens = str(request.form.get('stream_tokens', STREAM_TOKENS_DEFAULT)).lower() == "true"
+            priority = request_priority("batch")
+            cancel = request_cancel_token()
+            
+            if file.filename == '':
+                return Response(
+                    f"data: {json.dumps({'type': 'error', 'error': 'No selected file'})}\n\n",
+                    mimetype='text/event-stream'
+                )
+            
+            if not file.filename.endswith('.json') and not is_ndjson_upload(file.filename):
+                return Response(
+                    f"data: {json.dumps({'type': 'error', 'error': 'File must be a JSON or NDJSON (.jsonl/.ndjson) file'})}\n\n",
+                    mimetype='text/event-stream'
+                )
+            
+            source = upload = detach_upload_stream(file)
+            filename = file.filename
+            ndjson_input = is_ndjson_upload(filename)
+        elif request.mimetype in ('application/json', NDJSON_MIMETYPE):
+            # Raw body upload: read straight from the socket as the client sends it
+            model = request.args.get('model', None)
+            stream_tokens = str(request.args.get('stream_tokens', STREAM_TOKENS_DEFAULT)).lower() == "true"
+            priority = request_priority("batch")
+            cancel = request_cancel_token()
+            source = request.stream
+            filename = request.args.get('filename', 'request body')
+            ndjson_input = request.mimetype == NDJSON_MIMETYPE
+        else:
             return Response(
                 f"data: {json.dumps({'type': 'error', 'error': 'No file part in request'})}\n\n",
                 mimetype='text/event-stream'
             )
-        
-        file = request.files['file']
-        model = request.form.get('model', None)
-        
-        if file.filename == '':
-            return Response(
-                f"data: {json.dumps({'type': 'error', 'error': 'No selected file'})}\n\n",
-                mimetype='text/event-stream'
-            )
-        
-        if not file.filename.endswith('.json'):
-            return Response(
-                f"data: {json.dumps({'type': 'error', 'error': 'File must be a JSON file'})}\n\n",
-                mimetype='text/event-stream'
-            )
 
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        if file_size > MAX_FILE_BYTES:
-            return Response(
-                f"data: {json.dumps({'type': 'error', 'error': f'File too large (max {MAX_FILE_SIZE_MB}MB)'})}\n\n",
-                mimetype='text/event-stream'
-            )
-        
-        file.seek(0)
-        
-        # Read and parse JSON
-        try:
-            content = file.read().decode('utf-8')
-            file_data = json.loads(content)
-        except json.JSONDecodeError as e:
-            return Response(
-                f"data: {json.dumps({'type': 'error', 'error': f'Invalid JSON file: {str(e)}'})}\n\n",
-                mimetype='text/event-stream'
-            )
-        
-        # Handle different JSON structures
-        requirements = []
-        if isinstance(file_data, list):
-            requirements = file_data
-        elif isinstance(file_data, dict):
-            if "requirements" in file_data:
-                requirements = file_data["requirements"]
-                if not isinstance(requirements, list):
-                    return Response(
-                        f"data: {json.dumps({'type': 'error', 'error': 'requirements field must be an array'})}\n\n",
-                        mimetype='text/event-stream'
-                    )
-            else:
-                requirements = [file_data]
+        max_bytes = MAX_STREAM_FILE_SIZE_MB * 1024 * 1024
+        if ndjson_input:
+            parsed = iter_ndjson_requirements(source, max_bytes)
         else:
-            return Response(
-                f"data: {json.dumps({'type': 'error', 'error': 'JSON must be an object or array'})}\n\n",
-                mimetype='text/event-stream'
-            )
-        
-        if len(requirements) == 0:
-            return Response(
-                f"data: {json.dumps({'type': 'error', 'error': 'No requirements found in file'})}\n\n",
-                mimetype='text/event-stream'
-            )
-        
-        # Store filename for use in generator
-        filename = file.filename
+            parsed = RequirementStreamParser(source, max_bytes=max_bytes)
+        requirements = iter_streamed_requirements(parsed, filename, upload)
+        admission.admit_backends(model)
+        admitted = admission.admit()
 
+    except AdmissionRejected:
+        if upload is not None:
+            upload.close()
+        raise
     except Exception as e:
+        if upload is not None:
+            upload.close()
         return Response(
             f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n",
             mimetype='text/event-stream'
         )
 
-    def generate_file_events():
-        try:
-            # Send initial status
-            yield f"data: {json.dumps({'type': 'start', 'filename': filename, 'total': len(requirements)})}\n\n"
-            
-            successful = 0
-            failed = 0
-            
-            for idx, requirement in enumerate(requirements):
-                req_id = requirement.get('REQUIREMENTS_ID', f'index_{idx}')
-                
-                try:
-                    # Send progress update
-                    yield f"data: {json.dumps({'type': 'progress', 'index': idx, 'requirement_id': req_id, 'status': 'processing'})}\n\n"
-                    
-                    # Generate test case
-                    result = generate_test_case_for_requirement(requirement, model)
-                    successful += 1
-                    
-                    # Send result
-                    yield f"data: {json.dumps({'type': 'result', 'index': idx, 'status': 'success', 'data': result})}\n\n"
-                    
-                except Exception as e:
-                    failed += 1
-                    error_result = {
-                        'type': 'result',
-                        'index': idx,
-                        'status': 'failed',
-                        'requirement_id': req_id,
-                        'error': str(e)
-                    }
-                    yield f"data: {json.dumps(error_result)}\n\n"
-            
-            # Send completion status
-            yield f"data: {json.dumps({'type': 'complete', 'filename': filename, 'total': len(requirements), 'successful': successful, 'failed': failed})}\n\n"
-            
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
-    
-    return Response(
-        generate_file_events(),
+    return release_on_close(Response(
+        stream_generation_events(requirements, model, stream_tokens, priority, admitted, cancel, filename=filename),
         mimetype='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
@@ -782,7 +4943,101 @@ def generate_from_file_stream():
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Headers': 'Cache-Control'
         }
-    )
+    ), admitted)
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a batch generation job and return its id immediately
+
+    Accepts the same payloads as /generate/batch (JSON body with a
+    "requirements" array and optional "model", or an application/x-ndjson
+    body) and /generate/file (multipart upload with a "file" part and
+    optional "model" field).
+    Jobs run with background priority unless "priority" (body, form field,
+    query string or X-Priority header) asks for batch or interactive.
+    Poll GET /jobs/<job_id> for progress and results.
+    """
+    try:
+        filename = None
+        data = None
+        if 'file' in request.files:
+            file = request.files['file']
+            model = request.form.get('model', None)
+            filename = file.filename
+
+            if file.filename == '':
+                return jsonify({"error": "No selected file"}), 400
+            if not file.filename.endswith('.json') and not is_ndjson_upload(file.filename):
+                return jsonify({"error": "File must be a JSON or NDJSON (.jsonl/.ndjson) file"}), 400
+
+            file.seek(0, os.SEEK_END)
+            if file.tell() > MAX_FILE_BYTES:
+                return jsonify({"error": f"File too large (max {MAX_FILE_SIZE_MB}MB)"}), 413
+            file.seek(0)
+
+            try:
+                if is_ndjson_upload(file.filename):
+                    requirements = list(iter_ndjson_requirements(file.stream))
+                else:
+                    requirements = extract_requirements(json.loads(file.read().decode('utf-8')))
+            except json.JSONDecodeError as e:
+                return jsonify({"error": f"Invalid JSON file: {str(e)}"}), 400
+        elif request.mimetype == NDJSON_MIMETYPE:
+            model = request.args.get('model', None)
+            requirements = list(iter_ndjson_requirements(request.stream, MAX_FILE_BYTES))
+        else:
+            data = request.get_json(silent=True)
+            if not data or "requirements" not in data:
+                return jsonify({"error": "No 'requirements' array in JSON body or 'file' part in request"}), 400
+            requirements = data.get("requirements", [])
+            model = data.get("model", None)
+            if not isinstance(requirements, list):
+                return jsonify({"error": "'requirements' must be an array"}), 400
+
+        if len(requirements) == 0:
+            return jsonify({"error": "requirements array is empty"}), 400
+
+        priority = request_priority("background", data)
+        admission.admit_queued(len(requirements), job_queue.depth()["pending_requirements"])
+
+        job_queue.start()
+        job_id = job_queue.submit(requirements, model, filename, priority)
+
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "priority": priority,
+            "total": len(requirements),
+            "status_url": f"/jobs/{job_id}"
+        }), 202
+
+    except AdmissionRejected:
+        raise
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error queuing job: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Report progress of a job
+
+    Results completed so far are included unless ?results=false is given.
+    """
+    try:
+        include_results = request.args.get('results', 'true').lower() != 'false'
+        job = job_queue.get(job_id, include_results)
+        if job is None:
+            return jsonify({"error": f"Job not found: {job_id}"}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        logger.error(f"Error reading job {job_id}: {e}")
+        return jsonify({"error": str(e)}), 500
 
 
 @app.route('/instructions', methods=['GET'])
@@ -813,14 +5068,13 @@ def update_instructions():
         if not instructions:
             return jsonify({"error": "Instructions cannot be empty"}), 400
         
-        # Create instructions directory if it doesn't exist
-        SYSTEM_INSTRUCTION_FILE.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Write instructions to file
-        with open(SYSTEM_INSTRUCTION_FILE, 'w', encoding='utf-8') as f:
-            f.write(instructions)
+        # Write instructions to file (temp file + rename) and refresh the in-memory copy
+        instructions_store.update(instructions)
         
         logger.info(f"System instructions updated: {SYSTEM_INSTRUCTION_FILE}")
+
+        # Cached results were generated with the previous system prompt
+        result_cache.invalidate_system_prompt(build_system_prompt())
         
         return jsonify({
             "status": "success",
@@ -833,6 +5087,66 @@ def update_instructions():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/cache', methods=['DELETE'])
+def clear_cache():
+    """Drop all cached test case results"""
+    try:
+        result_cache.clear()
+        logger.info("Result cache cleared")
+        return jsonify({
+            "status": "success",
+            "message": "Result cache cleared"
+        }), 200
+    except Exception as e:
+        logger.error(f"Error clearing result cache: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+#preload models on the backends, e.g. after pulling a new model
+@app.route('/admin/warmup', methods=['POST'])
+def warmup_models():
+    """
+    Load models on the backends with an empty prompt and a long keep_alive
+
+    Optional JSON body:
+    {
+        "models": ["llama3:latest"],
+        "backends": ["http://node1:11434"]
+    }
+
+    Defaults to WARMUP_MODELS on every backend. Answers once every load
+    finished; 200 if all succeeded, 502 otherwise.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        models = data.get("models") or WARMUP_MODELS
+        backends = data.get("backends")
+        if isinstance(models, str):
+            models = [models]
+        if not isinstance(models, list) or not all(isinstance(m, str) and m for m in models):
+            return jsonify({"error": "models must be a list of model names"}), 400
+        if not models:
+            return jsonify({"error": "No models to warm up (set WARMUP_MODELS or pass models)"}), 400
+        if backends is not None:
+            if not isinstance(backends, list):
+                return jsonify({"error": "backends must be a list of backend URLs"}), 400
+            backends = [str(url).rstrip("/") for url in backends]
+            unknown = [url for url in backends if url not in ollama_transport.backends]
+            if unknown:
+                return jsonify({"error": f"Unknown backend(s): {', '.join(unknown)}"}), 400
+
+        results = model_warmup.run(models, backends)
+        failed = sum(1 for per_model in results.values() for result in per_model.values() if result["status"] != "loaded")
+        return jsonify({
+            "status": "success" if not failed else "partial",
+            "failed": failed,
+            "backends": results,
+            "timestamp": datetime.now().isoformat()
+        }), 200 if not failed else 502
+    except Exception as e:
+        logger.error(f"Error warming up models: {e}")
+        return jsonify({"error": str(e)}), 500
+
 # ==================== Error Handlers ====================
 
 @app.errorhandler(404)
@@ -845,6 +5159,22 @@ def internal_error(error):
     return jsonify({"error": "Internal server error"}), 500
 
 
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    body = {"error": str(error)}
+    headers = {}
+    if error.retry_after is not None:
+        body["retry_after"] = error.retry_after
+        headers["Retry-After"] = str(error.retry_after)
+    return jsonify(body), error.status_code, headers
+
+
+@app.errorhandler(OllamaUnavailable)
+def ollama_unavailable(error):
+    retry_after = retry_after_seconds(error.retry_after)
+    return jsonify({"error": str(error), "retry_after": retry_after}), 503, {"Retry-After": str(retry_after)}
+
+
 # ==================== Main ====================
 
 if __name__ == '__main__':
@@ -863,5 +5193,9 @@ if __name__ == '__main__':
     logger.info(f"Default Model: {DEFAULT_MODEL}")
     logger.info(f"System Instructions File: {SYSTEM_INSTRUCTION_FILE}")
 
+    # With the reloader active only the serving child process runs background work
+    if not debug_mode or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
+
     # Run Flask app
     app.run(host=host, port=port, debug=debug_mode)
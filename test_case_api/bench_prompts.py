@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+#####################################################################
+#                       E M E R S O N   S O L A H D                 #
+#                   Prompt Rendering Microbenchmark                 #
+#####################################################################
+"""
+Measure the cost of building generation prompts per requirement, comparing
+like with like:
+- legacy: the previous build_generation_prompt (string += per field)
+- template: the precompiled prompt template registry used by app.py
+each with debug output off, and with DEBUG_MODE output (sent to a buffer)
+
+Usage:
+    python bench_prompts.py [requirements.json] [--repeat N]
+"""
+
+import argparse, io, json, os, sys, timeit
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import List, Dict, Any
+
+# Importing the app must not print per-field debug output or need a server
+os.environ["DEBUG_MODE"] = ""
+sys.path.insert(0, str(Path(__file__).parent))
+import app  # noqa: E402
+
+
+def legacy_build_generation_prompt(requirement: Dict[str, Any], debug: bool = False) -> str:
+    """The previous implementation, kept here as the baseline"""
+    prompt = """Based on the following requirement specification, generate a detailed system-level integration test case (black-box testing approach).
+
+""" + app.PRODUCT_CONTEXT + """REQUIREMENT DETAILS:
+"""
+
+    for key, value in requirement.items():
+        if key != "Test_Case" and value:
+            prompt += f"\n{key}: {value}"
+
+        if debug:
+            print(f". Added to prompt: {key}: {value}")
+            print(f"Current prompt state:\n{prompt}")
+
+    prompt += "\n\n" + app.TEST_CASE_SECTIONS + "\n\n" + app.OUTPUT_FORMAT_RULES
+
+    return prompt
+
+
+def load_requirements(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return app.extract_requirements(json.load(f))
+
+
+def large_requirement(fields: int = 200, size: int = 500) -> Dict[str, Any]:
+    """A synthetic requirement record with many long fields"""
+    requirement = {"REQUIREMENTS_ID": "REQ-BENCH-01", "DESCRIPTION": "x" * size, "CATEGORY": "Functional"}
+    for i in range(fields):
+        requirement[f"FIELD_{i:03d}"] = f"value {i} " + "y" * size
+    return requirement
+
+
+def time_per_call(func, requirements: List[Dict[str, Any]], repeat: int) -> float:
+    """Best-of-5 microseconds per requirement"""
+    def run():
+        for requirement in requirements:
+            func(requirement)
+    best = min(timeit.repeat(run, number=repeat, repeat=5))
+    return best / (repeat * len(requirements)) * 1e6
+
+
+def speedup(baseline: float, measured: float) -> str:
+    ratio = baseline / measured
+    return f"{ratio:.1f}x faster" if ratio >= 1 else f"{1 / ratio:.1f}x slower"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generation prompt rendering")
+    parser.add_argument("file", nargs="?", default=str(Path(__file__).parent / "samples" / "batch_requirements.json"))
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    template = app.prompt_templates.get()
+    sink = io.StringIO()
+
+    def legacy_debug(requirement):
+        sink.seek(0)
+        sink.truncate()
+        with redirect_stdout(sink):
+            legacy_build_generation_prompt(requirement, debug=True)
+
+    def template_debug(requirement):
+        sink.seek(0)
+        sink.truncate()
+        app.debug_mode = True
+        try:
+            with redirect_stdout(sink):
+                template.render(requirement)
+        finally:
+            app.debug_mode = ""
+
+    cases = [
+        (f"{Path(args.file).name}", load_requirements(args.file), args.repeat),
+        ("large record (200 fields x 500 chars)", [large_requirement()], max(1, args.repeat // 20)),
+    ]
+
+    print("=" * 80)
+    print("PROMPT RENDERING COST PER REQUIREMENT (microseconds, best of 5)")
+    print("=" * 80)
+    for name, requirements, repeat in cases:
+        # Sanity check: both implementations produce the same prompt
+        for requirement in requirements:
+            assert legacy_build_generation_prompt(requirement) == template.render(requirement)
+
+        legacy = time_per_call(legacy_build_generation_prompt, requirements, repeat)
+        rendered = time_per_call(template.render, requirements, repeat)
+        legacy_dbg = time_per_call(legacy_debug, requirements, max(1, repeat // 10))
+        rendered_dbg = time_per_call(template_debug, requirements, max(1, repeat // 10))
+
+        print(f"\n{name}: {len(requirements)} requirement(s)")
+        print("  debug output off")
+        print(f"    legacy (+= per field):      {legacy:10.1f} us")
+        print(f"    template render (one join): {rendered:10.1f} us  ({speedup(legacy, rendered)})")
+        print("  debug output on")
+        print(f"    legacy (+= per field):      {legacy_dbg:10.1f} us")
+        print(f"    template render (one join): {rendered_dbg:10.1f} us  ({speedup(legacy_dbg, rendered_dbg)})")
+    print()
+
+
+if __name__ == "__main__":
+    main()
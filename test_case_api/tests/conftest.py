@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# app.py reads its configuration at import time: point every store at a scratch
+# directory and every backend at a closed port before it is imported.
+_scratch = Path(tempfile.mkdtemp(prefix="test_case_api-"))
+os.environ.setdefault("JOBS_DB_FILE", str(_scratch / "jobs.sqlite3"))
+os.environ.setdefault("RESULT_CACHE_FILE", str(_scratch / "results.sqlite3"))
+os.environ.setdefault("RESULT_CACHE_ENABLED", "False")
+os.environ.setdefault("OLLAMA_BASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("WARMUP_MODELS", "")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+import requests
+
+import app
+
+
+def limit(initial=2.0, minimum=1.0, maximum=8.0):
+    return app.AdaptiveLimit(initial, minimum, maximum, tolerance=1.5, backoff=0.5)
+
+
+def test_fast_saturated_successes_raise_limit_additively():
+    aimd = limit()
+    for _ in range(2):
+        aimd.on_success(started=time.monotonic(), seconds_per_token=0.02, saturated=True)
+
+    # +1/limit per success: 2 -> 2.5 -> 2.9
+    assert aimd.limit == pytest.approx(2.9)
+    assert aimd.capacity == 2
+    assert aimd.increases == 2
+
+
+def test_unsaturated_successes_leave_limit_alone():
+    aimd = limit()
+    aimd.on_success(started=time.monotonic(), seconds_per_token=0.02, saturated=False)
+
+    assert aimd.limit == 2.0
+    assert aimd.baseline == 0.02
+
+
+def test_slow_success_decreases_limit_multiplicatively():
+    aimd = limit(initial=6.0)
+    aimd.on_success(started=time.monotonic(), seconds_per_token=0.02, saturated=True)
+    before = aimd.limit
+
+    aimd.on_success(started=time.monotonic(), seconds_per_token=0.05, saturated=True)
+
+    assert aimd.limit == pytest.approx(before * 0.5)
+    assert aimd.decreases == 1
+
+
+def test_one_decrease_per_congestion_episode():
+    aimd = limit(initial=8.0)
+    aimd.on_overload(started=time.monotonic())
+    # Calls that were already running when the limit dropped do not drop it again
+    aimd.on_overload(started=aimd.last_decrease - 1)
+    assert aimd.limit == 4.0
+
+    aimd.on_overload(started=aimd.last_decrease)
+    assert aimd.limit == 2.0
+
+
+def test_limit_stays_within_bounds():
+    aimd = limit(initial=1.5, minimum=1.0, maximum=2.0)
+    for _ in range(3):
+        aimd.on_overload(started=time.monotonic())
+    assert aimd.limit == 1.0
+
+    for _ in range(10):
+        aimd.on_success(started=time.monotonic(), seconds_per_token=0.01, saturated=True)
+    assert aimd.limit == 2.0
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"models": [{"name": "llama3"}]}
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    monkeypatch.setattr(app, "CONCURRENCY_ADAPTIVE", True)
+    monkeypatch.setattr(app, "CONCURRENCY_INITIAL_LIMIT", 2.0)
+    monkeypatch.setattr(app, "CONCURRENCY_MAX_LIMIT", 8.0)
+    monkeypatch.setattr(app, "CONCURRENCY_BACKOFF", 0.5)
+    transport = app.OllamaTransport(
+        [("http://a:11434", 1.0), ("http://b:11434", 1.0)], pool_size=4, connect_timeout=1, read_timeout=1
+    )
+    monkeypatch.setattr(transport, "request", lambda *args, **kwargs: FakeResponse())
+    for backend in transport.backends.values():
+        transport.probe(backend)
+    return transport
+
+
+def test_route_feeds_token_latency_and_timeouts_into_the_limit(transport):
+    with transport.route("llama3", usage={"eval_count": 100, "load_duration": 0}) as backend:
+        pass
+    aimd = backend.limits["llama3"]
+    # One call in flight is half of a limit of 2: saturated, so the limit grew
+    assert aimd.limit == 2.5
+    assert aimd.baseline is not None
+
+    others = tuple(url for url in transport.backends if url != backend.url)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        with transport.route("llama3", exclude=others):
+            raise requests.exceptions.ReadTimeout("slow")
+    assert aimd.limit == 1.25
+
+
+def test_capacity_sums_backend_limits(transport):
+    assert transport.capacity("llama3") == 4
+    for url in transport.backends:
+        transport.backends[url].limit_for("llama3").limit = 3.7
+
+    assert transport.capacity("llama3") == 6
+
+    transport.backends["http://b:11434"].circuit = "half_open"
+    # A half-open backend takes a single trial generation
+    assert transport.capacity("llama3") == 4
+
+
+def test_routing_prefers_backend_below_its_limit(transport):
+    a, b = transport.backends["http://a:11434"], transport.backends["http://b:11434"]
+    a.limit_for("llama3").limit = 1.0
+    b.limit_for("llama3").limit = 4.0
+    with transport.route("llama3") as first:
+        with transport.route("llama3") as second:
+            with transport.route("llama3") as third:
+                pass
+
+    assert {first.url, second.url} == {a.url, b.url}
+    assert third is b
@@ -0,0 +1,106 @@
+import pytest
+
+import app
+
+
+def controller(max_in_flight=4, max_queued=10, max_per_request=6):
+    return app.AdmissionController(max_in_flight, max_queued, max_per_request, window_seconds=60, default_retry_after=7)
+
+
+def test_request_over_per_request_limit_is_413():
+    with pytest.raises(app.AdmissionRejected) as rejected:
+        controller().admit(7)
+
+    assert rejected.value.status_code == 413
+    assert rejected.value.retry_after is None
+
+
+def test_in_flight_cap_rejects_with_retry_after():
+    admission = controller()
+    admission.admit(3)
+
+    with pytest.raises(app.AdmissionRejected) as rejected:
+        admission.admit(2)
+
+    assert rejected.value.status_code == 429
+    # Nothing completed yet: the default
+    assert rejected.value.retry_after == 7
+    assert admission.rejected == 1
+
+
+def test_idle_server_admits_an_oversized_request():
+    admission = controller(max_in_flight=2)
+
+    ticket = admission.admit(5)
+
+    assert admission.stats()["in_flight_requirements"] == 5
+    ticket.release()
+    assert admission.stats()["in_flight_requirements"] == 0
+
+
+def test_completions_free_capacity():
+    admission = controller()
+    ticket = admission.admit(4)
+    ticket.complete()
+    ticket.complete()
+
+    admission.admit(2)
+
+    assert admission.stats()["in_flight_requirements"] == 4
+
+
+def test_job_queue_cap():
+    admission = controller()
+    admission.admit_queued(4, pending=6)
+
+    with pytest.raises(app.AdmissionRejected) as rejected:
+        admission.admit_queued(5, pending=6)
+
+    assert rejected.value.status_code == 429
+
+
+def test_streamed_input_stops_at_per_request_limit():
+    ticket = controller(max_in_flight=0).admit()
+
+    with pytest.raises(app.AdmissionRejected) as rejected:
+        list(ticket.track_input(range(10)))
+
+    assert rejected.value.status_code == 413
+    assert ticket.seen == 7
+
+
+def test_streamed_input_is_checked_against_in_flight_cap():
+    admission = controller()
+    other = admission.admit(2)
+    ticket = admission.admit()
+    read = ticket.track_input(range(5))
+
+    assert [next(read), next(read)] == [0, 1]
+    with pytest.raises(app.AdmissionRejected) as rejected:
+        next(read)
+
+    assert rejected.value.status_code == 429
+    assert admission.stats()["in_flight_requirements"] == 4
+    ticket.release()
+    other.release()
+    assert admission.stats()["in_flight_requirements"] == 0
+
+
+def test_streamed_input_with_nothing_outstanding_may_exceed_cap():
+    admission = controller(max_in_flight=2)
+    ticket = admission.admit()
+    read = ticket.track_input(range(5))
+    # Other requests filled the server after this one was admitted
+    admission._reserve(2)
+
+    # Each requirement completes before the next one is read
+    for expected in range(5):
+        assert next(read) == expected
+        ticket.complete()
+
+
+def test_stream_error_fields_carry_status():
+    fields = app.stream_error_fields(app.AdmissionRejected("Server busy", 429, 12))
+
+    assert fields == {"error": "Server busy", "status_code": 429, "retry_after": 12}
+    assert app.stream_error_fields(ValueError("bad line")) == {"error": "bad line"}
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def all_circuits_open(monkeypatch):
+    backend = next(iter(app.ollama_transport.backends.values()))
+    monkeypatch.setattr(backend, "circuit", "open")
+    monkeypatch.setattr(backend, "ejected_until", time.time() + 11.5)
+    return backend
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+REQUIREMENT = {"REQUIREMENTS_ID": "REQ-1", "DESCRIPTION": "Brake", "CATEGORY": "Safety"}
+
+
+def assert_unavailable(response):
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "12"
+    assert response.get_json()["retry_after"] == 12
+
+
+def test_generate_fails_fast_with_retry_after(all_circuits_open, client):
+    assert_unavailable(client.post("/generate", json=REQUIREMENT))
+
+
+def test_batch_fails_fast_with_retry_after(all_circuits_open, client):
+    assert_unavailable(client.post("/generate/batch", json={"requirements": [REQUIREMENT]}))
+
+
+def test_stream_fails_fast_with_retry_after(all_circuits_open, client):
+    assert_unavailable(client.post("/generate/stream", json={"requirements": [REQUIREMENT]}))
+
+
+def test_generation_refused_by_open_circuits_maps_to_503(all_circuits_open, client, monkeypatch):
+    # The circuits opened after the request was admitted
+    monkeypatch.setattr(app.admission, "admit_backends", lambda model: None)
+    monkeypatch.setattr(app, "OLLAMA_RETRY_ATTEMPTS", 0)
+
+    assert_unavailable(client.post("/generate", json=REQUIREMENT))
+
+
+def test_unavailable_for_reports_soonest_reopen(all_circuits_open):
+    assert 11 < app.ollama_transport.unavailable_for("llama3") <= 11.5
+    assert not app.ollama_transport.can_route("llama3")
@@ -0,0 +1,32 @@
+import app
+
+
+def requirement(requirement_id, parent_id="SYS-1"):
+    return {
+        "REQUIREMENTS_ID": requirement_id,
+        "PARENT_ID": parent_id,
+        "DESCRIPTION": "The brake shall engage within 100 ms",
+        "CATEGORY": "Safety",
+    }
+
+
+def test_follower_output_names_its_own_ids():
+    dedup = app.BatchDeduplicator()
+    leader, follower = requirement("REQ-1"), requirement("REQ-12", "SYS-2")
+    assert list(dedup.filter([(0, leader), (1, follower)])) == [(0, leader)]
+
+    result = {
+        "Test_Case": "Test Case ID: TC-REQ-1\nTraceability: REQ-1 (parent SYS-1)\nRelated: REQ-10",
+        "Generated_At": "2026-01-01T00:00:00",
+    }
+    [(idx, _, output, error)] = dedup.resolve(0, result, None)
+
+    assert (idx, error) == (1, None)
+    assert output["REQUIREMENTS_ID"] == "REQ-12"
+    assert output["deduplicated_from"] == "REQ-1"
+    assert "REQ-1 " not in output["Test_Case"] and "SYS-1" not in output["Test_Case"]
+    assert output["Test_Case"] == "Test Case ID: TC-REQ-12\nTraceability: REQ-12 (parent SYS-2)\nRelated: REQ-10"
+
+
+def test_followers_are_keyed_without_their_ids():
+    assert app.BatchDeduplicator.key(requirement("REQ-1")) == app.BatchDeduplicator.key(requirement("REQ-2", "SYS-9"))
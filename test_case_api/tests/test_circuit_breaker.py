@@ -0,0 +1,143 @@
+import pytest
+import requests
+
+import app
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    monkeypatch.setattr(app, "BACKEND_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(app, "BACKEND_EJECT_SECONDS", 30)
+    transport = app.OllamaTransport([("http://ollama-a:11434", 1.0)], pool_size=2, connect_timeout=1, read_timeout=1)
+    transport.tags_ok = True
+
+    def fake_request(method, path, base_url=None, timeout=None, **kwargs):
+        if path == "/api/tags" and not transport.tags_ok:
+            raise requests.exceptions.ReadTimeout("slow /api/tags")
+        return FakeResponse({"models": [{"name": "llama3"}]})
+
+    monkeypatch.setattr(transport, "request", fake_request)
+    # Known model list, so routing does not start background probes
+    transport.probe(next(iter(transport.backends.values())))
+    return transport
+
+
+def backend_of(transport):
+    return next(iter(transport.backends.values()))
+
+
+def fail_generation(transport):
+    with pytest.raises(requests.exceptions.ConnectionError):
+        with transport.route("llama3"):
+            raise requests.exceptions.ConnectionError("refused")
+
+
+def test_single_failed_probe_keeps_circuit_closed(transport):
+    backend = backend_of(transport)
+    transport.tags_ok = False
+
+    assert transport.probe(backend) is False
+
+    assert backend.circuit == "closed"
+    assert backend.consecutive_failures == 1
+    assert transport.can_route("llama3")
+
+
+def test_probe_failures_count_toward_threshold(transport):
+    backend = backend_of(transport)
+    transport.tags_ok = False
+
+    transport.probe(backend)
+    fail_generation(transport)
+    assert backend.circuit == "closed"
+    transport.probe(backend)
+
+    assert backend.circuit == "open"
+    assert not transport.can_route("llama3")
+
+
+def test_successful_generation_resets_probe_failures(transport):
+    backend = backend_of(transport)
+    transport.tags_ok = False
+    transport.probe(backend)
+    transport.probe(backend)
+
+    with transport.route("llama3"):
+        pass
+
+    assert backend.consecutive_failures == 0
+    transport.probe(backend)
+    assert backend.circuit == "closed"
+
+
+def test_open_circuit_half_opens_on_probe_and_closes_on_trial(transport):
+    backend = backend_of(transport)
+    for _ in range(3):
+        fail_generation(transport)
+    assert backend.circuit == "open"
+
+    assert transport.probe(backend)
+    assert backend.circuit == "half_open"
+    with transport.route("llama3"):
+        pass
+    assert backend.circuit == "closed"
+
+
+def test_failed_trial_reopens_circuit(transport):
+    backend = backend_of(transport)
+    for _ in range(3):
+        fail_generation(transport)
+    transport.probe(backend)
+
+    fail_generation(transport)
+
+    assert backend.circuit == "open"
+
+
+def test_failed_reprobe_after_ejection_ejects_again(transport):
+    backend = backend_of(transport)
+    for _ in range(3):
+        fail_generation(transport)
+    backend.ejected_until = 0.0
+    transport.tags_ok = False
+
+    transport.probe(backend)
+
+    assert backend.circuit == "open"
+    assert backend.ejected_until > 0.0
+
+
+def test_status_poll_failure_keeps_backend_connected(transport):
+    monitor = app.BackendStatusMonitor(transport, interval=60)
+    monitor.refresh()
+    transport.tags_ok = False
+
+    monitor.refresh()
+
+    snapshot = monitor.snapshot()
+    assert snapshot["connected"]
+    assert snapshot["backends"]["http://ollama-a:11434"]["last_probe"] == "failed"
+    assert snapshot["models"] == ["llama3"]
+
+
+def test_stale_status_snapshot_is_served_without_polling(transport, monkeypatch):
+    monitor = app.BackendStatusMonitor(transport, interval=1)
+    monitor.refresh()
+    monitor._refreshed_at -= 3600
+    monkeypatch.setattr(monitor, "refresh", lambda: pytest.fail("snapshot() polled Ollama inline"))
+
+    snapshot = monitor.snapshot()
+
+    assert snapshot["connected"]
+    assert snapshot["age_seconds"] >= 3600
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+import app
+
+
+def policy(**overrides):
+    settings = {"percentile": 90, "budget_percent": 10, "min_samples": 5, "window": 10, **overrides}
+    return app.HedgePolicy(**settings)
+
+
+def test_no_delay_until_enough_samples():
+    hedges = policy()
+    for seconds in (1, 2, 3, 4):
+        hedges.observe("llama3", seconds)
+    assert hedges.delay("llama3") is None
+
+    hedges.observe("llama3", 5)
+    assert hedges.delay("llama3") == 5
+
+
+def test_delay_is_percentile_of_recent_window():
+    hedges = policy(percentile=80, window=10)
+    for seconds in [100] * 10 + list(range(1, 11)):
+        hedges.observe("llama3", seconds)
+
+    # The old 100 s samples fell out of the window; p80 of 1..10 is 8
+    assert hedges.delay("llama3") == 8
+    assert hedges.delay("mistral") is None
+
+
+def test_each_kind_of_call_has_its_own_window():
+    hedges = policy(min_samples=2)
+    for seconds in (1, 2):
+        hedges.observe("llama3", seconds)
+    for seconds in (30, 40):
+        hedges.observe("llama3", seconds, "packed")
+
+    # Long packed prompts do not push the hedge delay of single requirements up
+    assert hedges.delay("llama3") == 2
+    assert hedges.delay("llama3", "packed") == 40
+    assert hedges.delay("llama3", "repair") is None
+    assert hedges.stats()["delay_seconds"] == {"llama3": {"single": 2, "packed": 40}}
+
+
+def test_budget_caps_hedge_rate():
+    hedges = policy(budget_percent=10)
+    for _ in range(20):
+        hedges.record_call()
+
+    granted = [hedges.try_hedge() for _ in range(5)]
+
+    assert granted == [True, True, False, False, False]
+    assert hedges.stats()["budget_denied_total"] == 3
+
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    """Fake streaming attempts: the primary takes primary_seconds unless cancelled, a hedge answers at once"""
+    calls = []
+    timing = {"primary_seconds": 5}
+
+    def fake_stream(prompt, system_prompt, model=None, priority="interactive", cancel=None, placement=None, kind="single"):
+        name = "hedge" if placement["exclude"] else "primary"
+        placement["backend"] = f"http://{name}:11434"
+        placement["started"] = time.monotonic()
+        calls.append((name, cancel))
+        if name == "primary":
+            done = time.monotonic() + timing["primary_seconds"]
+            while not cancel.cancelled and time.monotonic() < done:
+                time.sleep(0.01)
+            if cancel.cancelled:
+                raise app.GenerationCancelled(cancel.reason)
+        yield f"{name} text"
+
+    hedges = policy(min_samples=1, budget_percent=100)
+    hedges.observe("llama3", 0.05)
+    monkeypatch.setattr(app, "hedge_policy", hedges)
+    monkeypatch.setattr(app, "stream_ollama_generate_once", fake_stream)
+    monkeypatch.setattr(app.ollama_transport, "can_route", lambda model, exclude=(): True)
+    return calls, timing
+
+
+def test_slow_primary_is_hedged_and_cancelled(fake_backends):
+    calls, _ = fake_backends
+
+    text = app.hedged_generate_once("prompt", "system", "llama3")
+
+    assert text == "hedge text"
+    assert [name for name, _ in calls] == ["primary", "hedge"]
+    # The losing primary is cancelled so Ollama stops generating it
+    assert calls[0][1].cancelled
+    assert app.hedge_policy.wins == 1
+
+
+def test_no_hedge_without_budget(fake_backends, monkeypatch):
+    calls, timing = fake_backends
+    timing["primary_seconds"] = 0.3
+    monkeypatch.setattr(app.hedge_policy, "budget_percent", 0)
+
+    text = app.hedged_generate_once("prompt", "system", "llama3")
+
+    assert text == "primary text"
+    assert [name for name, _ in calls] == ["primary"]
+    assert app.hedge_policy.denied == 1
+
+
+def test_no_hedge_without_another_backend(fake_backends, monkeypatch):
+    calls, timing = fake_backends
+    timing["primary_seconds"] = 0.3
+    monkeypatch.setattr(app.ollama_transport, "can_route", lambda model, exclude=(): False)
+
+    assert app.hedged_generate_once("prompt", "system", "llama3") == "primary text"
+    assert [name for name, _ in calls] == ["primary"]
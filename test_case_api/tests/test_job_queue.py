@@ -0,0 +1,65 @@
+import subprocess
+import sys
+import time
+
+import app
+
+
+def make_queue(tmp_path):
+    queue = app.JobQueue(tmp_path / "jobs.sqlite3", workers=1, poll_interval=0.1, lease_seconds=600)
+    queue._init_db()
+    return queue
+
+
+def insert_running(queue, job_id, owner):
+    db = queue._connect()
+    try:
+        db.execute(
+            "INSERT INTO jobs (id, status, lease_owner, lease_expires) VALUES (?, 'running', ?, ?)",
+            (job_id, owner, time.time() + 600)
+        )
+    finally:
+        db.close()
+
+
+def job_row(queue, job_id):
+    db = queue._connect()
+    try:
+        return db.execute("SELECT status, lease_owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        db.close()
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_startup_requeues_jobs_of_dead_workers(tmp_path):
+    queue = make_queue(tmp_path)
+    insert_running(queue, "dead", f"{queue.host}:{dead_pid()}:0123456789ab:job-worker-0")
+    insert_running(queue, "previous-boot", queue.owner_token("job-worker-0").replace(queue.boot_id, "0123456789ab"))
+    insert_running(queue, "live", queue.owner_token("job-worker-0"))
+    insert_running(queue, "other-host", f"{queue.host}-elsewhere:1:0123456789ab:job-worker-0")
+    insert_running(queue, "legacy", "1234-job-worker-0")
+
+    assert queue.reclaim_orphaned_jobs() == 2
+
+    assert tuple(job_row(queue, "dead")) == ("queued", None)
+    assert tuple(job_row(queue, "previous-boot")) == ("queued", None)
+    for job_id in ("live", "other-host", "legacy"):
+        assert job_row(queue, job_id)["status"] == "running"
+
+
+def test_requeued_job_is_claimed_without_waiting_for_the_lease(tmp_path):
+    queue = make_queue(tmp_path)
+    insert_running(queue, "dead", f"{queue.host}:{dead_pid()}:0123456789ab:job-worker-0")
+    owner = queue.owner_token("job-worker-0")
+    assert queue._claim(owner) is None
+
+    queue.reclaim_orphaned_jobs()
+
+    claimed = queue._claim(owner)
+    assert claimed is not None
+    assert job_row(queue, "dead")["lease_owner"] == owner
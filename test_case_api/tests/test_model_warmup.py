@@ -0,0 +1,90 @@
+import requests
+
+import app
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"load_duration": 2_000_000_000}
+
+
+class FakeTransport:
+    """Two backends; loads fail while the model is listed in broken[url]"""
+
+    def __init__(self):
+        self.backends = {"http://a:11434": None, "http://b:11434": None}
+        self.broken = {"http://a:11434": {"llama3"}, "http://b:11434": {"llama3"}}
+        self.loads = []
+
+    def post(self, path, base_url=None, json=None, timeout=None):
+        self.loads.append((base_url, json["model"]))
+        if json["model"] in self.broken[base_url]:
+            raise requests.exceptions.HTTPError("404 Client Error: model not found")
+        return FakeResponse()
+
+
+def make_warmup(transport):
+    warmup = app.ModelWarmup(transport, ["llama3", "mistral"], "24h", 30, retry_backoff=5, retry_backoff_max=12)
+    warmup._completed = True
+    return warmup
+
+
+def test_failed_model_keeps_instance_not_ready():
+    warmup = make_warmup(FakeTransport())
+
+    warmup.run()
+
+    assert not warmup.ready
+    assert warmup.state == "failed"
+    assert set(warmup.failures()) == {"llama3"}
+    assert set(warmup.failures()["llama3"]) == {"http://a:11434", "http://b:11434"}
+    assert "model not found" in warmup.failures()["llama3"]["http://a:11434"]
+
+
+def test_model_loaded_on_one_backend_is_enough():
+    transport = FakeTransport()
+    transport.broken["http://b:11434"] = set()
+    warmup = make_warmup(transport)
+
+    warmup.run()
+
+    assert warmup.ready
+    assert warmup.state == "done"
+    assert warmup.failures() == {}
+
+
+def test_missing_models_are_retried_with_backoff_until_loaded():
+    transport = FakeTransport()
+    warmup = make_warmup(transport)
+    warmup.run()
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 3:
+            transport.broken["http://a:11434"] = set()
+
+    warmup._retry_missing(sleep)
+
+    assert sleeps == [5, 10, 12]
+    assert warmup.ready
+    # Only the missing model is retried
+    assert transport.loads[4:] == [(url, "llama3") for _ in range(3) for url in ("http://a:11434", "http://b:11434")]
+
+
+def test_health_lists_failed_models(monkeypatch):
+    warmup = make_warmup(FakeTransport())
+    warmup.run()
+    monkeypatch.setattr(app, "model_warmup", warmup)
+    client = app.app.test_client()
+
+    health = client.get("/health").get_json()
+    ready = client.get("/health/ready")
+
+    assert health["warmup"] == "failed"
+    assert list(health["warmup_failed"]) == ["llama3"]
+    assert ready.status_code == 503
+    assert ready.get_json()["warmup_failed"] == health["warmup_failed"]
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+import app
+
+REQUIREMENTS = [
+    {"REQUIREMENTS_ID": "REQ-1", "DESCRIPTION": "Output shall stay within 5%", "CATEGORY": "Power"},
+    {"REQUIREMENTS_ID": "REQ-2", "DESCRIPTION": "Alarm relay shall open on battery fault", "CATEGORY": "Alarms"},
+]
+
+
+def full_test_case(tag, skip=()):
+    sections = app.prompt_templates.get().sections
+    return "\n".join(f"{number}. {name}: {tag} {name}" for number, name, _ in sections if name not in skip)
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = app.ResultCache(tmp_path / "results.sqlite3", 16, 16, 3600)
+    monkeypatch.setattr(app, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(app, "result_cache", cache)
+    monkeypatch.setattr(app, "SECTION_REPAIR_ENABLED", True)
+    return cache
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    """Fake generation: answers packed, single and repair prompts; records the prompts"""
+    prompts = []
+    last = app.prompt_templates.get().sections[-1][1]
+
+    def fake_generate(prompt, system_prompt, model=None, priority="interactive", cancel=None, kind="single"):
+        prompts.append(prompt)
+        if prompt.startswith("The test case below"):
+            assert kind == "repair"
+            return f"11. {last}: repaired {last}"
+        if "### BEGIN TEST CASE" in prompt:
+            assert kind == "packed"
+            return "\n".join(
+                f"### BEGIN TEST CASE {r['REQUIREMENTS_ID']} ###\n{full_test_case('packed')}\n### END TEST CASE {r['REQUIREMENTS_ID']} ###"
+                for r in REQUIREMENTS if r["REQUIREMENTS_ID"] in prompt
+            )
+        assert kind == "single"
+        return full_test_case("single")
+
+    monkeypatch.setattr(app, "call_ollama_generate", fake_generate)
+    return prompts
+
+
+def cache_key(requirement):
+    return app.ResultCache.make_key(
+        app.DEFAULT_MODEL, app.build_system_prompt(), app.build_generation_prompt(requirement), app.GENERATION_OPTIONS
+    )
+
+
+def test_cached_test_case_missing_a_section_is_repaired(cache, ollama):
+    last = app.prompt_templates.get().sections[-1][1]
+    cache.put(cache_key(REQUIREMENTS[0]), full_test_case("cached", skip=(last,)), app.build_system_prompt())
+
+    outcomes = app.generate_packed_test_cases([dict(r) for r in REQUIREMENTS])
+
+    (first, error), _ = outcomes
+    assert error is None
+    assert first["Repaired_Sections"] == [last]
+    assert f"repaired {last}" in first["Test_Case"]
+    # The repaired text replaces the incomplete cache entry
+    assert f"repaired {last}" in cache.get(cache_key(REQUIREMENTS[0]))
+
+
+def test_requirement_in_flight_elsewhere_is_not_packed(cache, ollama):
+    key = cache_key(REQUIREMENTS[0])
+    call, leader = app.generation_flights.begin(key)
+    assert leader
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(
+        outcomes=app.generate_packed_test_cases([dict(r) for r in REQUIREMENTS])
+    ))
+    worker.start()
+    deadline = time.monotonic() + 5
+    while call.waiters == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    app.generation_flights.finish(key, call, full_test_case("shared"))
+    worker.join(5)
+
+    (first, _), (second, _) = result["outcomes"]
+    assert "shared" in first["Test_Case"]
+    assert "single" in second["Test_Case"]
+    assert not any("### BEGIN TEST CASE" in prompt for prompt in ollama)
+
+
+def test_identical_request_waits_for_packed_call(cache, ollama, monkeypatch):
+    packed_started, release = threading.Event(), threading.Event()
+    fake_generate = app.call_ollama_generate
+
+    def slow_generate(prompt, *args, **kwargs):
+        if "### BEGIN TEST CASE" in prompt:
+            packed_started.set()
+            release.wait(5)
+        return fake_generate(prompt, *args, **kwargs)
+
+    monkeypatch.setattr(app, "call_ollama_generate", slow_generate)
+    packer = threading.Thread(target=app.generate_packed_test_cases, args=([dict(r) for r in REQUIREMENTS],))
+    packer.start()
+    assert packed_started.wait(5)
+    single = {}
+    waiter = threading.Thread(target=lambda: single.update(result=app.generate_test_case_for_requirement(dict(REQUIREMENTS[1]))))
+    waiter.start()
+    release.set()
+    packer.join(5)
+    waiter.join(5)
+
+    assert "packed" in single["result"]["Test_Case"]
+    assert sum("### BEGIN TEST CASE" in prompt for prompt in ollama) == 1
+    assert len(ollama) == 1
@@ -0,0 +1,170 @@
+import threading
+import time
+from concurrent.futures import wait
+
+import pytest
+
+import app
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def wait_for(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def queue_call(scheduler, granted, name, priority, model=None, cancel=None):
+    """Acquire a slot on a thread; name is appended to granted when it gets one"""
+    def run():
+        try:
+            scheduler.acquire(app.PriorityTicket(priority), cancel, model)
+        except app.GenerationCancelled:
+            granted.append(f"{name} cancelled")
+            return
+        granted.append(name)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def waiting(scheduler):
+    return sum(scheduler.stats()["waiting"].values())
+
+
+def test_interactive_overtakes_queued_batch(clock):
+    scheduler = app.GenerationScheduler(1, aging_seconds=30, clock=clock)
+    scheduler.acquire(app.PriorityTicket("batch"))
+    granted = []
+    queue_call(scheduler, granted, "background", "background")
+    wait_for(lambda: waiting(scheduler) == 1)
+    queue_call(scheduler, granted, "interactive", "interactive")
+    wait_for(lambda: waiting(scheduler) == 2)
+
+    scheduler.release()
+    wait_for(lambda: granted)
+
+    assert granted == ["interactive"]
+
+
+def test_aged_background_call_is_not_starved(clock):
+    scheduler = app.GenerationScheduler(1, aging_seconds=5, clock=clock)
+    scheduler.acquire(app.PriorityTicket("batch"))
+    granted = []
+    queue_call(scheduler, granted, "background", "background")
+    wait_for(lambda: waiting(scheduler) == 1)
+    # Two classes of aging plus a bit: rank 2 - 12/5 = -0.4
+    clock.now += 12
+    queue_call(scheduler, granted, "interactive", "interactive")
+    wait_for(lambda: waiting(scheduler) == 2)
+
+    scheduler.release()
+    wait_for(lambda: granted)
+    scheduler.release()
+    wait_for(lambda: len(granted) == 2)
+
+    assert granted == ["background", "interactive"]
+
+
+def test_model_capacity_lets_other_models_through(clock):
+    capacity = {"llama3": 1, "mistral": None}
+    scheduler = app.GenerationScheduler(4, aging_seconds=30, capacity=capacity.get, clock=clock)
+    scheduler.acquire(app.PriorityTicket("batch"), model="llama3")
+    granted = []
+    queue_call(scheduler, granted, "llama3", "interactive", model="llama3")
+    wait_for(lambda: waiting(scheduler) == 1)
+    queue_call(scheduler, granted, "mistral", "background", model="mistral")
+    wait_for(lambda: granted == ["mistral"])
+
+    # Capacity grown without a release (e.g. the adaptive limit went up) is picked up by polling
+    capacity["llama3"] = 2
+    clock.now += app.CANCEL_POLL_INTERVAL
+    wait_for(lambda: len(granted) == 2)
+
+    assert granted == ["mistral", "llama3"]
+    assert scheduler.stats()["busy_by_model"] == {"llama3": 2, "mistral": 1}
+
+
+def test_cancelled_waiter_leaves_the_queue(clock):
+    scheduler = app.GenerationScheduler(1, aging_seconds=30, clock=clock)
+    scheduler.acquire(app.PriorityTicket("batch"))
+    granted = []
+    cancel = app.CancelToken()
+    queue_call(scheduler, granted, "batch", "batch", cancel=cancel)
+    wait_for(lambda: waiting(scheduler) == 1)
+
+    cancel.cancel()
+    clock.now += app.CANCEL_POLL_INTERVAL
+    wait_for(lambda: granted)
+
+    assert granted == ["batch cancelled"]
+    assert waiting(scheduler) == 0
+    scheduler.release()
+    assert scheduler.stats()["busy"] == 0
+
+
+def occupy_worker(executor, started, release):
+    """Occupy the executor's only worker with a background task until release is set"""
+    def blocker():
+        started.append("job 0")
+        release.wait(5)
+    return executor.submit("background", blocker)
+
+
+def test_batch_request_overtakes_job_backlog_in_pool(clock):
+    executor = app.PriorityExecutor(1, aging_seconds=30, clock=clock)
+    started, release = [], threading.Event()
+    futures = [occupy_worker(executor, started, release)]
+    wait_for(lambda: started)
+    futures += [executor.submit("background", started.append, f"job {n}") for n in (1, 2)]
+    futures.append(executor.submit("batch", started.append, "batch"))
+    assert executor.stats()["queued"] == {"interactive": 0, "batch": 1, "background": 2}
+
+    release.set()
+    wait(futures, timeout=5)
+
+    assert started == ["job 0", "batch", "job 1", "job 2"]
+
+
+def test_aged_job_backlog_is_not_starved_in_pool(clock):
+    executor = app.PriorityExecutor(1, aging_seconds=5, clock=clock)
+    started, release = [], threading.Event()
+    futures = [occupy_worker(executor, started, release)]
+    wait_for(lambda: started)
+    futures.append(executor.submit("background", started.append, "job 1"))
+    clock.now += 12
+    futures.append(executor.submit("batch", started.append, "batch"))
+
+    release.set()
+    wait(futures, timeout=5)
+
+    assert started == ["job 0", "job 1", "batch"]
+
+
+def test_cancelled_queued_task_is_skipped(clock):
+    executor = app.PriorityExecutor(1, aging_seconds=30, clock=clock)
+    started, release = [], threading.Event()
+    blocker = occupy_worker(executor, started, release)
+    wait_for(lambda: started)
+    dropped = executor.submit("batch", started.append, "dropped")
+    kept = executor.submit("background", started.append, "kept")
+
+    assert dropped.cancel()
+    release.set()
+    wait([blocker, kept], timeout=5)
+
+    assert started == ["job 0", "kept"]
+    assert kept.result() is None
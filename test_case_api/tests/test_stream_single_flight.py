@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+import app
+
+REQUIREMENT = {"REQUIREMENTS_ID": "REQ-7", "DESCRIPTION": "Output shall stay within 5%", "CATEGORY": "Power"}
+
+
+@pytest.fixture
+def generations(monkeypatch):
+    """Fake Ollama stream; records each generation started by this process"""
+    started = []
+
+    def fake_stream(prompt, system_prompt, model=None, priority="interactive", cancel=None):
+        started.append(prompt)
+        yield "fresh "
+        yield "text"
+
+    monkeypatch.setattr(app, "stream_ollama_generate", fake_stream)
+    monkeypatch.setattr(app, "SECTION_REPAIR_ENABLED", False)
+    return started
+
+
+def lead_elsewhere():
+    """Become the single-flight leader of REQUIREMENT, as another request would"""
+    key = app.ResultCache.make_key(
+        app.DEFAULT_MODEL, app.build_system_prompt(), app.build_generation_prompt(REQUIREMENT), app.GENERATION_OPTIONS
+    )
+    call, leader = app.generation_flights.begin(key)
+    assert leader
+    return key, call
+
+
+def follow(key, call, **finish):
+    """Stream REQUIREMENT while another leader holds it, then end that leader's call"""
+    events = []
+    follower = threading.Thread(target=lambda: events.extend(app.stream_test_case_for_requirement(REQUIREMENT)))
+    follower.start()
+    deadline = time.monotonic() + 5
+    while call.waiters == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    app.generation_flights.finish(key, call, **finish)
+    follower.join(5)
+    assert not follower.is_alive()
+    return events
+
+
+def test_follower_takes_over_when_leader_is_cancelled(generations):
+    key, call = lead_elsewhere()
+
+    # A streaming leader whose client went away finishes with GeneratorExit
+    events = follow(key, call, error=GeneratorExit())
+
+    assert len(generations) == 1
+    assert events[-1][0] == "result"
+    assert events[-1][1]["Test_Case"] == "fresh text"
+
+
+def test_follower_restarts_once_when_leader_fails(generations):
+    key, call = lead_elsewhere()
+
+    events = follow(key, call, error=app.OllamaError("stream broke after relaying text", retryable=True))
+
+    assert len(generations) == 1
+    assert events[-1][1]["Test_Case"] == "fresh text"
+
+
+def test_follower_relays_leader_result(generations):
+    key, call = lead_elsewhere()
+
+    events = follow(key, call, value="shared text")
+
+    assert generations == []
+    assert events == [("delta", "shared text"), ("result", events[-1][1])]
+    assert events[-1][1]["Test_Case"] == "shared text"
+
+
+def test_cancelled_follower_stops_counting_as_waiter(generations):
+    key, call = lead_elsewhere()
+    cancel = app.CancelToken()
+    cancel.cancel()
+
+    with pytest.raises(app.GenerationCancelled):
+        list(app.stream_test_case_for_requirement(REQUIREMENT, cancel=cancel))
+
+    assert call.waiters == 0
+    assert app.generation_flights.stats()["waiting"] == 0
+    app.generation_flights.finish(key, call, value="shared text")
+
+
+def wait_until(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class CountingSemaphore(threading.BoundedSemaphore):
+    """A model slot that counts acquire attempts, including blocked ones"""
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.attempts = 0
+
+    def acquire(self, *args, **kwargs):
+        self.attempts += 1
+        return super().acquire(*args, **kwargs)
+
+    __enter__ = acquire
+
+
+def test_stream_and_pool_worker_do_not_deadlock_on_model_slot(generations, monkeypatch):
+    semaphore = CountingSemaphore(1)
+    monkeypatch.setitem(app._model_semaphores, app.DEFAULT_MODEL, semaphore)
+    monkeypatch.setattr(app, "call_ollama_generate", lambda *args, **kwargs: "pool text")
+    # The pool worker takes the only slot, then pauses before joining generation_flights
+    gate = threading.Event()
+    generate = app.generate_test_case_for_requirement
+
+    def gated_generate(*args, **kwargs):
+        gate.wait(5)
+        return generate(*args, **kwargs)
+
+    monkeypatch.setattr(app, "generate_test_case_for_requirement", gated_generate)
+    results = {}
+    app.generation_queue_depth.inc()
+    worker = threading.Thread(
+        target=lambda: results.update(pool=app.generate_with_model_limit(dict(REQUIREMENT))), daemon=True
+    )
+    worker.start()
+    wait_until(lambda: semaphore.attempts == 1)
+    stream = threading.Thread(
+        target=lambda: results.update(stream=list(app.stream_test_case_for_requirement(REQUIREMENT))), daemon=True
+    )
+    stream.start()
+    # The stream is now blocked on the slot (or, before the fix, led the key and then blocked)
+    wait_until(lambda: semaphore.attempts == 2)
+    gate.set()
+
+    worker.join(5)
+    stream.join(5)
+
+    assert not worker.is_alive() and not stream.is_alive()
+    assert results["pool"]["Test_Case"] == "pool text"
+    assert results["stream"][-1][0] == "result"